@@ -1,16 +1,19 @@
+import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense
 from tensorflow.keras import optimizers
 from tensorflow.keras.models import load_model
 import re
 import numpy as np
-import random
-import math
 import os
 import glob
+from collections import OrderedDict
 
 
-from hex.StateManager import StateManager
+from hex.StateEncoder import StateEncoder
+from hex.NumpyANET import NumpyANET
+from hex.ReplayBuffer import ReplayBuffer
+from hex.CaseStore import CaseStore
 
 
 class ANET:
@@ -29,22 +32,48 @@ class ANET:
         learning_rate=0.01,
         batch_size=32,
         optimizer=optimizers.SGD,
-        activation_function="relu"
+        activation_function="relu",
+        prediction_cache_size=0,
+        prioritized_replay=False,
+        deduplicate_replay=False,
+        data_pipeline=False,
+        validation_refresh_interval=10,
     ):
         self.size_of_board = size_of_board
         self.max_size_buffer = max_size_buffer
         self.buffer_batch_size = buffer_batch_size
         self.epochs = epochs
         self.verbose = verbose
-        self.replay_buffer = []
         self.replay_buffer_cutoff_rate = replay_buffer_cutoff_rate
         # Input shape: Adding one to give information of current player. Multiply by two to get binary data
         self.input_shape = ((self.size_of_board ** 2) * 2 + 10,)
+        self.replay_buffer = ReplayBuffer(
+            self.input_shape[0],
+            self.size_of_board ** 2,
+            max_size_buffer,
+            replay_buffer_cutoff_rate,
+            prioritized=prioritized_replay,
+            deduplicate=deduplicate_replay,
+        )
 
         # If model is loaded from file, this field indicates number of episodes ran before saving
         self.episode_number = episode_number
         self.save_directory = save_directory
         self.batch_size = batch_size
+        # Optional LRU cache of predictions keyed by state, emptied whenever training changes the weights
+        self.prediction_cache_size = prediction_cache_size
+        self.prediction_cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+        # If set, every generated case is also appended to this CaseStore
+        self.case_store = None
+        # With the data pipeline, the cases are fed to fit through tf.data with prefetching, and the validation
+        # cases are a fixed sample of the replay buffer, replaced every validation_refresh_interval training rounds
+        self.data_pipeline = data_pipeline
+        self.validation_refresh_interval = validation_refresh_interval
+        self.validation_dataset = None
+        self.rounds_since_validation_refresh = 0
 
         if model is None:
             # Deleting current models in directory
@@ -94,7 +123,16 @@ class ANET:
             self.model = model
 
     @staticmethod
-    def train_network_from_cases(cases_directory, anet_parameters):
+    def train_network_from_cases(cases_directory, anet_parameters, batch_size=32):
+        """
+        Trains a new network on the cases in the directory: a CaseStore, streamed from its shards, or else the
+        first pair of x and y files of a replay buffer saved before the case store
+        :return: a tuple: (`anet`, `history`)
+        """
+        if CaseStore.exists(cases_directory):
+            return ANET.train_network_from_case_store(
+                CaseStore.load(cases_directory), anet_parameters, batch_size
+            )
         x_path = [
             filename
             for filename in os.listdir(cases_directory)
@@ -115,46 +153,228 @@ class ANET:
         )
         return anet, history
 
+    @staticmethod
+    def train_network_from_case_store(
+        case_store: CaseStore, anet_parameters, batch_size=32, validation_split=0.2
+    ):
+        """
+        Trains a new network on the cases of the store, read shard by shard so they need not fit in memory
+        :return: a tuple: (`anet`, `history`)
+        """
+        anet = ANET(case_store.manifest["board_size"], **anet_parameters)
+        if anet.data_pipeline:
+            history = anet.model.fit(
+                ANET.make_case_store_dataset(
+                    case_store, batch_size, validation_split
+                ).prefetch(tf.data.AUTOTUNE),
+                epochs=anet.epochs,
+                verbose=anet.verbose,
+                # The validation cases are read from the shards once
+                validation_data=ANET.make_case_store_dataset(
+                    case_store, batch_size, validation_split, validation=True
+                ).cache(),
+            )
+            return anet, history
+        history = anet.model.fit(
+            case_store.generate_batches(batch_size, validation_split),
+            steps_per_epoch=case_store.get_number_of_batches(
+                batch_size, validation_split
+            ),
+            epochs=anet.epochs,
+            verbose=anet.verbose,
+            validation_data=case_store.generate_batches(
+                batch_size, validation_split, validation=True
+            ),
+            validation_steps=case_store.get_number_of_batches(
+                batch_size, validation_split, validation=True
+            ),
+        )
+        return anet, history
+
     @staticmethod
     def convert_state_to_network_format(state: str):
-        board_str, player_str = StateManager.extract_state(state)
-        board_nn_representation = [int(player_str == "1")] * 5 + [
-            int(player_str == "2")
-        ] * 5
-        for cell_value in board_str:
-            board_nn_representation.append(int(cell_value == "1"))
-            board_nn_representation.append(int(cell_value == "2"))
-        return board_nn_representation
+        return StateEncoder.convert_state_to_network_format(state)
 
     @staticmethod
     def predict_and_normalize(model: Sequential, state: str) -> np.array:
-        input_data = np.array([ANET.convert_state_to_network_format(state)])
+        input_data = StateEncoder.convert_states_to_network_format([state])
         net_distribution_tensor = model(input_data)[0]
-        net_distribution = []
-        # Filter out taken cells in the board
-        for index, share_of_distribution in np.ndenumerate(net_distribution_tensor):
-            if StateManager.index_cell_is_occupied(index[0], state):
-                net_distribution.append(0.0)
-            else:
-                net_distribution.append(float(share_of_distribution))
-        # Normalize
-        return np.array(net_distribution) / sum(net_distribution)
+        return StateEncoder.mask_and_normalize(net_distribution_tensor, state)
 
     def predict(self, state):
-        return ANET.predict_and_normalize(self.model, state)
+        if self.prediction_cache_size <= 0:
+            return ANET.predict_and_normalize(self.model, state)
+        distribution = self.get_cached_prediction(state)
+        if distribution is None:
+            distribution = ANET.predict_and_normalize(self.model, state)
+            self.cache_prediction(state, distribution)
+        return distribution.copy()
+
+    def predict_batch(self, states: [str]) -> np.ndarray:
+        """
+        Predicts the distributions of many states with one call of the model. With the prediction cache, only the
+        states that are not in it are given to the model.
+        :param states: list of string representations of states
+        :return: np.array with the normalized distribution over the open cells of each state
+        """
+        distributions = np.zeros((len(states), self.size_of_board ** 2))
+        missing = []
+        for i, state in enumerate(states):
+            distribution = (
+                self.get_cached_prediction(state)
+                if self.prediction_cache_size > 0
+                else None
+            )
+            if distribution is None:
+                missing.append(i)
+            else:
+                distributions[i] = distribution
+        if missing:
+            missing_states = [states[i] for i in missing]
+            input_data = StateEncoder.convert_states_to_network_format(missing_states)
+            distributions[missing] = StateEncoder.mask_and_normalize_batch(
+                np.array(self.model(input_data)), missing_states
+            )
+            if self.prediction_cache_size > 0:
+                for i in missing:
+                    self.cache_prediction(states[i], distributions[i].copy())
+        return distributions
+
+    def get_cached_prediction(self, state: str):
+        """
+        :return: the cached distribution of the state, None if it is not in the cache
+        """
+        distribution = self.prediction_cache.get(state)
+        if distribution is None:
+            self.cache_misses += 1
+        else:
+            self.cache_hits += 1
+            self.prediction_cache.move_to_end(state)
+        return distribution
+
+    def cache_prediction(self, state: str, distribution: np.ndarray) -> None:
+        self.prediction_cache[state] = distribution
+        if len(self.prediction_cache) > self.prediction_cache_size:
+            self.prediction_cache.popitem(last=False)
+            self.cache_evictions += 1
+
+    def clear_prediction_cache(self) -> None:
+        self.prediction_cache.clear()
+
+    def get_prediction_cache_stats(self) -> dict:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "size": len(self.prediction_cache),
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "evictions": self.cache_evictions,
+            "hit_rate": self.cache_hits / lookups if lookups else 0.0,
+        }
 
     def train(self):
-        x, y = self._get_random_mini_batch()
+        sample_weight = None
+        if self.replay_buffer.prioritized:
+            x, y, slots, sample_weight = self.replay_buffer.sample_prioritized(
+                self.buffer_batch_size
+            )
+        else:
+            x, y = self._get_random_mini_batch()
         if self.verbose == 2:
             print("Size of replay buffer:", len(self.replay_buffer))
-        return self.model.fit(
-            x,
-            y,
-            batch_size=self.batch_size,
-            epochs=self.epochs,
-            verbose=self.verbose,
-            validation_data=self._get_random_mini_batch(),
+            if self.prediction_cache_size > 0:
+                print("Prediction cache:", self.get_prediction_cache_stats())
+            if self.replay_buffer.deduplicate:
+                print(
+                    "Replay deduplication:",
+                    self.replay_buffer.get_deduplication_stats(),
+                )
+        if self.data_pipeline:
+            history = self.model.fit(
+                ANET.make_dataset(x, y, self.batch_size, sample_weight, shuffle=True),
+                epochs=self.epochs,
+                verbose=self.verbose,
+                validation_data=self.get_validation_dataset(),
+            )
+        else:
+            history = self.model.fit(
+                x,
+                y,
+                batch_size=self.batch_size,
+                epochs=self.epochs,
+                verbose=self.verbose,
+                validation_data=self._get_random_mini_batch(),
+                sample_weight=sample_weight,
+            )
+        if self.replay_buffer.prioritized:
+            self.replay_buffer.update_priorities(slots, self.get_case_losses(x, y))
+        # The cached predictions are from the old weights
+        self.clear_prediction_cache()
+        return history
+
+    @staticmethod
+    def make_dataset(
+        x: np.ndarray, y: np.ndarray, batch_size: int, sample_weight=None, shuffle=False
+    ) -> tf.data.Dataset:
+        """
+        :return: dataset of the cases in batches, prepared on a background thread while the model trains
+        """
+        tensors = (x, y) if sample_weight is None else (x, y, sample_weight)
+        dataset = tf.data.Dataset.from_tensor_slices(tensors)
+        if shuffle:
+            dataset = dataset.shuffle(len(x), reshuffle_each_iteration=True)
+        return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+    @staticmethod
+    def make_case_store_dataset(
+        case_store: CaseStore, batch_size: int, validation_split: float, validation=False
+    ) -> tf.data.Dataset:
+        """
+        :return: dataset of the batches of CaseStore.generate_batches, one pass over the store per epoch
+        """
+        input_size = StateEncoder.get_input_size(case_store.manifest["board_size"])
+        output_size = case_store.manifest["board_size"] ** 2
+        dataset = tf.data.Dataset.from_generator(
+            lambda: case_store.generate_batches(
+                batch_size, validation_split, validation=validation, repeat=False
+            ),
+            output_signature=(
+                tf.TensorSpec(shape=(None, input_size), dtype=tf.float32),
+                tf.TensorSpec(shape=(None, output_size), dtype=tf.float32),
+            ),
         )
+        # With a known number of batches, fit knows where the epochs end
+        return dataset.apply(
+            tf.data.experimental.assert_cardinality(
+                case_store.get_number_of_batches(
+                    batch_size, validation_split, validation=validation
+                )
+            )
+        )
+
+    def get_validation_dataset(self) -> tf.data.Dataset:
+        """
+        :return: the validation cases, sampled from the replay buffer again every validation_refresh_interval calls
+        """
+        if (
+            self.validation_dataset is None
+            or self.rounds_since_validation_refresh >= self.validation_refresh_interval
+        ):
+            x, y = self._get_random_mini_batch()
+            self.validation_dataset = (
+                tf.data.Dataset.from_tensor_slices((x, y))
+                .batch(self.batch_size)
+                .cache()
+            )
+            self.rounds_since_validation_refresh = 0
+        self.rounds_since_validation_refresh += 1
+        return self.validation_dataset
+
+    def get_case_losses(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """
+        :return: the categorical cross entropy of the model on each case
+        """
+        predictions = np.clip(np.array(self.model(x)), 1e-7, 1.0)
+        return -np.sum(y * np.log(predictions), axis=1)
 
     def save_model(self, episode_number):
         self.episode_number = episode_number
@@ -162,6 +382,23 @@ class ANET:
             os.mkdir(self.save_directory)
         self.model.save(f"{self.save_directory}/model_{episode_number}.h5")
 
+    def to_numpy(self) -> NumpyANET:
+        """
+        :return: inference only copy of the current weights of the model
+        """
+        return NumpyANET.from_keras_model(self.model, self.episode_number)
+
+    def export_numpy_model(self, path=None) -> str:
+        """
+        Saves the weights of the model for inference with NumpyANET
+        :param path: path of the .npz file, next to the saved Keras model if not given
+        :return: the path of the file
+        """
+        if path is None:
+            path = f"{self.save_directory}/model_{self.episode_number}.npz"
+        self.to_numpy().save(path)
+        return path
+
     @staticmethod
     def infer_board_size_from_model(model: Sequential) -> int:
         """
@@ -169,7 +406,7 @@ class ANET:
         :param model: Sequential model
         :return: size of board for the model
         """
-        return int(math.sqrt((model.input_shape[1] - 10) / 2))
+        return StateEncoder.infer_board_size(model.input_shape[1])
 
     @staticmethod
     def load_model(model_path: str):
@@ -199,8 +436,10 @@ class ANET:
 
     @staticmethod
     def delete_models(path_to_models: str):
-        # Get list of paths to all saved models
-        all_models = glob.glob(f"{path_to_models}/*.h5")
+        # Get list of paths to all saved models, and their exports for NumpyANET
+        all_models = glob.glob(f"{path_to_models}/*.h5") + glob.glob(
+            f"{path_to_models}/*.npz"
+        )
         for path_to_model in all_models:
             # Remove file
             os.remove(path_to_model)
@@ -213,87 +452,30 @@ class ANET:
         :return: Random sample of size self.buffer_batch_size from the the replay buffer.
         If the replay buffer is smaller than the batch size it will return the whole replay buffer
         """
-        if len(self.replay_buffer) < self.buffer_batch_size:
-            batch = self.replay_buffer.copy()
-        else:
-            batch = random.sample(self.replay_buffer, self.buffer_batch_size)
-        x = []
-        y = []
-        for case in batch:
-            x.append(case[0])  # Add state as x
-            y.append(case[1])  # Add distribution as y
-        return np.array(x), np.array(y)
+        return self.replay_buffer.sample(self.buffer_batch_size)
 
     def add_case(self, state, distribution_of_visit_counts):
-        generated_cases = self.gen_cases(state, distribution_of_visit_counts)
-        for case in generated_cases:
-            state = case[0]
-            distribution_of_visit_counts = case[1]
-            self.replay_buffer.append(
-                (
-                    ANET.convert_state_to_network_format(state),
-                    distribution_of_visit_counts,
-                )
-            )
-            if len(self.replay_buffer) > self.max_size_buffer:
-                index = random.randint(
-                    1, math.floor(self.max_size_buffer * self.replay_buffer_cutoff_rate)
-                )
-                del self.replay_buffer[index]
+        network_inputs, distributions = self.gen_cases(
+            StateEncoder.convert_states_to_network_format([state]),
+            np.array([distribution_of_visit_counts]),
+        )
+        for network_input, distribution in zip(network_inputs, distributions):
+            self.replay_buffer.add(network_input, distribution)
+        if self.case_store is not None:
+            self.case_store.add(network_inputs, distributions)
 
-    def gen_cases(self, state, dist):
+    def gen_cases(
+        self, network_inputs: np.ndarray, distributions: np.ndarray
+    ) -> (np.ndarray, np.ndarray):
         """
-        Flips the board 180 deg to create another training case.
-        :param state:
-        :param distribution_of_visit_counts:
-        :return:
+        Flips the boards 180 deg and transposes them with the colors swapped to create more training cases.
+        :param network_inputs: encoded states, one per row
+        :param distributions: distributions of visit counts, one per row
+        :return: a tuple: (`network_inputs`, `distributions`) with four cases for each case
         """
-        generated_cases = [(state, dist)]
-
-        # reverse both board rep of state string and distribution
-        state_180 = "".join(reversed(state[:-2])) + state[-2:]
-        dist_180 = dist[::-1]
-        tuple = (state_180, dist_180)
-        generated_cases.append(tuple)
-
-        # swith row and cols for case rot 90
-        board_90 = np.zeros(self.size_of_board ** 2, dtype=int)
-        dist_90 = np.zeros(self.size_of_board ** 2)
-        for row in range(0, self.size_of_board):
-            for col in range(0, self.size_of_board):
-                flatten_position_board = row * self.size_of_board + col
-                flatten_position_new_board = col * self.size_of_board + row
-                if state[flatten_position_board] == "0":
-                    board_90[flatten_position_new_board] = state[flatten_position_board]
-                else:
-                    board_90[flatten_position_new_board] = (
-                        "1" if state[flatten_position_board] == "2" else "2"
-                    )
-                dist_90[flatten_position_new_board] = dist[flatten_position_board]
-
-        player_str = "1" if state[-1] == "2" else "2"
-        state_90 = "".join(board_90.astype(str)) + ":" + player_str
-
-        tuple = (state_90, list(dist_90))
-        generated_cases.append(tuple)
-
-        # reverse both board rep of state string and distribution for the state_90
-        state_270 = "".join(reversed(state_90[:-2])) + state_90[-2:]
-        dist_270 = dist_90[::-1]
-        tuple = (state_270, list(dist_270))
-        generated_cases.append(tuple)
-
+        generated_cases = StateEncoder.generate_symmetric_cases(
+            network_inputs, distributions
+        )
         if self.verbose == 2:
             print(generated_cases)
         return generated_cases
-
-    def save_buffer_to_file(self, num_episodes, k, simulations, cases_directory="cases"):
-        x = []
-        y = []
-        for case in self.replay_buffer:
-            x.append(case[0])  # Add state as x
-            y.append(case[1])  # Add distribution as y
-        if not os.path.exists(cases_directory):
-            os.mkdir(cases_directory)
-        np.save(f"{cases_directory}/x_{k}x{k}_{num_episodes}_sim:{simulations}", np.array(x))
-        np.save(f"{cases_directory}/y_{k}x{k}_{num_episodes}_sim:{simulations}", np.array(y))
@@ -0,0 +1,195 @@
+import json
+import math
+import os
+import numpy as np
+
+
+class CaseStore:
+    """
+    CASE STORE
+    Append only store of training cases on disk, for training offline on more cases than fit in memory. The cases
+    are kept in memory until there are shard_size of them, and then written as a pair of .npy files that are never
+    rewritten. A manifest.json in the directory lists the board size, the number of simulations per move and the
+    shards with the range of games their cases are from. Training reads the shards memory mapped, one at a time,
+    through generate_batches.
+    """
+
+    MANIFEST_FILENAME = "manifest.json"
+
+    def __init__(
+        self, directory: str, board_size: int, simulations=None, shard_size=10000
+    ):
+        """
+        Opens the store in the directory, continuing it if it has a manifest
+        :param directory: directory of the manifest and the shards
+        :param board_size: size of the board of the cases
+        :param simulations: number of simulations per move in the searches the cases are from, checked against the
+            manifest of an existing store
+        :param shard_size: number of cases in a shard
+        """
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, CaseStore.MANIFEST_FILENAME)
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as file:
+                self.manifest = json.load(file)
+            if self.manifest["board_size"] != board_size:
+                raise ValueError(
+                    f"The cases in {directory} are from a {self.manifest['board_size']}x"
+                    f"{self.manifest['board_size']} board, not {board_size}x{board_size}"
+                )
+            if simulations is not None and self.manifest["simulations"] != simulations:
+                raise ValueError(
+                    f"The cases in {directory} are from searches with {self.manifest['simulations']} simulations "
+                    f"per move, not {simulations}"
+                )
+        else:
+            self.manifest = {
+                "board_size": board_size,
+                "simulations": simulations,
+                "shard_size": shard_size,
+                "shards": [],
+            }
+        self.shard_size = self.manifest["shard_size"]
+        self.pending_inputs = []
+        self.pending_targets = []
+        self.pending_games = []
+        self.game_number = 0
+
+    @staticmethod
+    def load(directory: str) -> "CaseStore":
+        """
+        Opens an existing store, with the board size from its manifest
+        """
+        with open(os.path.join(directory, CaseStore.MANIFEST_FILENAME)) as file:
+            manifest = json.load(file)
+        return CaseStore(directory, manifest["board_size"])
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, CaseStore.MANIFEST_FILENAME))
+
+    def __len__(self) -> int:
+        """
+        :return: the number of cases in the written shards
+        """
+        return sum(shard["number_of_cases"] for shard in self.manifest["shards"])
+
+    def start_game(self, game_number: int) -> None:
+        """
+        :param game_number: the game the cases added from now on are from
+        """
+        self.game_number = game_number
+
+    def add(self, network_inputs: np.ndarray, distributions: np.ndarray) -> None:
+        """
+        Adds cases, writing shards when shard_size cases are pending
+        :param network_inputs: encoded states, one per row
+        :param distributions: target distributions, one per row
+        """
+        self.pending_inputs.extend(np.asarray(network_inputs, dtype=np.float32))
+        self.pending_targets.extend(np.asarray(distributions, dtype=np.float32))
+        self.pending_games.extend([self.game_number] * len(network_inputs))
+        while len(self.pending_inputs) >= self.shard_size:
+            self.write_shard(self.shard_size)
+
+    def flush(self) -> None:
+        """
+        Writes the pending cases as a shard, smaller than shard_size
+        """
+        if self.pending_inputs:
+            self.write_shard(len(self.pending_inputs))
+
+    def write_shard(self, number_of_cases: int) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        shard_index = len(self.manifest["shards"])
+        shard = {
+            "x": f"x_{shard_index:05d}.npy",
+            "y": f"y_{shard_index:05d}.npy",
+            "number_of_cases": number_of_cases,
+            "first_game": self.pending_games[0],
+            "last_game": self.pending_games[number_of_cases - 1],
+        }
+        np.save(
+            os.path.join(self.directory, shard["x"]),
+            np.array(self.pending_inputs[:number_of_cases]),
+        )
+        np.save(
+            os.path.join(self.directory, shard["y"]),
+            np.array(self.pending_targets[:number_of_cases]),
+        )
+        del self.pending_inputs[:number_of_cases]
+        del self.pending_targets[:number_of_cases]
+        del self.pending_games[:number_of_cases]
+        self.manifest["shards"].append(shard)
+        # The manifest is replaced in one step, so it never lists a shard that is not written
+        temporary_path = self.manifest_path + ".tmp"
+        with open(temporary_path, "w") as file:
+            json.dump(self.manifest, file, indent=2)
+        os.replace(temporary_path, self.manifest_path)
+
+    def get_shard(self, shard_index: int) -> (np.ndarray, np.ndarray):
+        """
+        :return: a tuple: (`inputs`, `targets`) of the shard, memory mapped
+        """
+        shard = self.manifest["shards"][shard_index]
+        return (
+            np.load(os.path.join(self.directory, shard["x"]), mmap_mode="r"),
+            np.load(os.path.join(self.directory, shard["y"]), mmap_mode="r"),
+        )
+
+    @staticmethod
+    def get_rows(
+        number_of_cases: int, validation_split: float, validation: bool
+    ) -> np.ndarray:
+        """
+        The last validation_split of the cases of each shard are for validation
+        :return: the rows of a shard in the training or the validation part
+        """
+        cut = number_of_cases - int(number_of_cases * validation_split)
+        return np.arange(cut, number_of_cases) if validation else np.arange(cut)
+
+    def get_number_of_batches(
+        self, batch_size: int, validation_split=0.0, validation=False
+    ) -> int:
+        """
+        :return: the number of batches in one pass of generate_batches
+        """
+        return sum(
+            math.ceil(
+                len(
+                    CaseStore.get_rows(
+                        shard["number_of_cases"], validation_split, validation
+                    )
+                )
+                / batch_size
+            )
+            for shard in self.manifest["shards"]
+        )
+
+    def generate_batches(
+        self, batch_size: int, validation_split=0.0, validation=False, repeat=True
+    ):
+        """
+        Generator of batches for model.fit, reading one shard at a time. The training part is shuffled: the shards
+        in a random order, and the cases within each shard.
+        :param batch_size: number of cases in a batch, the last batch of a shard may be smaller
+        :param validation_split: share of the cases of each shard held out for validation
+        :param validation: if true, the batches are from the validation part, in order
+        :param repeat: if true, the passes over the store go on for as many epochs as model.fit needs
+        :return: generator of (`inputs`, `targets`) tuples
+        """
+        while True:
+            shard_indices = np.arange(len(self.manifest["shards"]))
+            if not validation:
+                np.random.shuffle(shard_indices)
+            for shard_index in shard_indices:
+                x, y = self.get_shard(shard_index)
+                rows = CaseStore.get_rows(len(x), validation_split, validation)
+                if not validation:
+                    np.random.shuffle(rows)
+                for start in range(0, len(rows), batch_size):
+                    # Sorted rows read the memory mapped file in order
+                    batch = np.sort(rows[start : start + batch_size])
+                    yield np.asarray(x[batch]), np.asarray(y[batch])
+            if not repeat:
+                return
@@ -4,10 +4,23 @@ import numpy as np
 import math
 import matplotlib.pyplot as plt
 import os
+import queue
+import tempfile
+import multiprocessing
 
 from hex.StateManager import StateManager
 from hex.ANET import ANET
 from hex.MCTS import MCTS
+from hex.RolloutPolicy import RolloutPolicy
+from hex.SearchStatistics import SearchStatistics
+from hex.SimulationBudget import SimulationBudget
+from hex.CaseStore import CaseStore
+from hex.SelfPlayWorker import (
+    run_self_play_worker,
+    publish_weights,
+    play_pool_game,
+    play_game_steps,
+)
 from libs.helpers import print_loader, Timer
 
 
@@ -36,6 +49,16 @@ class GameSimulator:
         save_interval=10,
         actor_net_parameters=None,
         mcts_parameters=None,
+        search_statistics_path=None,
+        simulation_budget_parameters=None,
+        rollout_policy_parameters=None,
+        numpy_rollouts=False,
+        cases_directory=None,
+        shard_size=10000,
+        async_workers=0,
+        publish_interval=5,
+        num_workers=0,
+        lockstep_games=0,
     ):
         self.number_of_episodes_to_play = g
         self.starting_player_option = p
@@ -44,6 +67,9 @@ class GameSimulator:
         self.state_manager = None
         self.current_state = None
         self.winner_stats = np.zeros((2, 2))
+        # Average training and validation loss of each training round of the run
+        self.loss = []
+        self.val_loss = []
         self.mcts_parameters = mcts_parameters if mcts_parameters else {}
         if actor_net_parameters:
             self.actor_net_parameters = actor_net_parameters
@@ -51,9 +77,86 @@ class GameSimulator:
         else:
             self.actor_network = ANET(k)
         self.save_interval = save_interval
+        # If given, statistics of the search are appended to this JSON lines file after every game
+        self.search_statistics_path = search_statistics_path
+        self.search_statistics = SearchStatistics() if search_statistics_path else None
+        # If given, the simulations per move are decided by a budget for each game, see SimulationBudget
+        self.simulation_budget_parameters = simulation_budget_parameters
+        self.simulation_budget = (
+            SimulationBudget(**simulation_budget_parameters)
+            if simulation_budget_parameters
+            else None
+        )
+        # If given, the roll-outs use a small policy distilled from the actor net after each training round
+        self.rollout_policy = (
+            RolloutPolicy(k, **rollout_policy_parameters)
+            if rollout_policy_parameters is not None
+            else None
+        )
+        # Without a rollout policy, the roll-outs can use a NumPy copy of the actor net, taken before each game
+        self.numpy_rollouts = numpy_rollouts
+        # If given, all the training cases are appended to a CaseStore in this directory for training offline
+        self.case_store = (
+            CaseStore(
+                cases_directory,
+                k,
+                simulations=self.simulation_budget.simulations_per_game
+                if self.simulation_budget
+                else self.mcts_parameters.get("number_of_simulations"),
+                shard_size=shard_size,
+            )
+            if cases_directory
+            else None
+        )
+        self.actor_network.case_store = self.case_store
+        # Asynchronous mode: this many processes play the games with the latest published weights while this
+        # process trains, publishing the weights every publish_interval training steps. 0 plays and trains in turns
+        self.async_workers = async_workers
+        self.publish_interval = publish_interval
+        # Worker pool: rounds of num_workers games are played at the same time in other processes with the current
+        # weights, and the actor net is trained once for each game as in run. 0 plays the games in this process
+        self.num_workers = num_workers
+        # Lockstep: rounds of lockstep_games games advanced together in this process, with the roll-out steps of
+        # all of them that need the network predicted in one batch. 0 plays one game at a time
+        self.lockstep_games = lockstep_games
+        modes = [
+            name
+            for name, value in [
+                ("async_workers", async_workers),
+                ("num_workers", num_workers),
+                ("lockstep_games", lockstep_games),
+            ]
+            if value > 0
+        ]
+        if len(modes) > 1:
+            raise ValueError(f"Only one of {' and '.join(modes)} can be given")
+        if async_workers > 0 or num_workers > 0:
+            # The games are played in other processes
+            GameSimulator.check_options_of_mode(
+                "asynchronous mode" if async_workers > 0 else "the worker pool",
+                rollout_policy_parameters=rollout_policy_parameters is not None,
+                numpy_rollouts=numpy_rollouts,
+                search_statistics_path=search_statistics_path is not None,
+            )
+        if lockstep_games > 0:
+            GameSimulator.check_options_of_mode(
+                "lockstep mode",
+                search_statistics_path=search_statistics_path is not None,
+            )
         if print_parameters:
             self.print_all_parameters()
 
+    @staticmethod
+    def check_options_of_mode(mode: str, **options) -> None:
+        """
+        Raises an error if options that are not used in a mode are given
+        :param mode: name of the mode, for the error message
+        :param options: whether each option the mode does not use is given, by name
+        """
+        given_options = [name for name, given in options.items() if given]
+        if given_options:
+            raise ValueError(f"{', '.join(given_options)} cannot be used in {mode}")
+
     def print_all_parameters(self):
         print("===================================")
         print("            PARAMETERS             ")
@@ -81,18 +184,10 @@ class GameSimulator:
             )
             print("===================================")
 
-    def print_start_state(self, i, timer):
+    def print_start_state(self, i):
         if self.verbose:
             print(f"--- Starting game {i} ---")
             print(f"Start state: {self.state_manager.pretty_state_string()}")
-        else:
-            print_loader(
-                i,
-                self.number_of_episodes_to_play,
-                10,
-                timer,
-                self.number_of_episodes_to_play,
-            )
 
     def print_action(self, action: str):
         if self.verbose:
@@ -110,6 +205,14 @@ class GameSimulator:
                 f"Player {2 if self.state_manager.current_player() == 1 else 1} wins the game"
             )
 
+    def print_budget_summary(self, summary: dict):
+        if self.verbose:
+            print(
+                f"Used {summary['simulations']} simulations in {summary['moves']} moves, "
+                f"at most {summary['max_simulations_per_move']} in one move. "
+                f"{summary['stopped_early']} searches stopped early"
+            )
+
     def print_run_summary(self):
         print("\n------------- SUMMARY -------------")
         header = ["winning player \ starting player", "1", "2"]
@@ -143,30 +246,343 @@ class GameSimulator:
         plt.savefig(f"loss_graphs/{id}.png")
 
     def update_winner_stats(self, starting_player: int) -> None:
-        second_index = starting_player - 1
         winning_player = 1 if self.state_manager.current_player() == 2 else 2
+        self.add_winner(starting_player, winning_player)
+
+    def add_winner(self, starting_player: int, winning_player: int) -> None:
+        second_index = starting_player - 1
         first_index = winning_player - 1
         self.winner_stats[first_index][second_index] += 1
 
+    def get_rollout_net(self):
+        if self.rollout_policy:
+            return self.rollout_policy
+        return self.actor_network.to_numpy() if self.numpy_rollouts else None
+
+    def start_run(self) -> None:
+        """
+        Saves the untrained actor net and starts the loss history of the run, in every mode
+        """
+        self.actor_network.save_model(episode_number=0)
+        self.loss = []
+        self.val_loss = []
+
+    def train_actor_network(self) -> None:
+        """
+        Trains the actor net on the replay buffer, and distills the rollout policy from it
+        """
+        history = self.actor_network.train()
+        self.loss.append(np.average(history.history["loss"]))
+        self.val_loss.append(np.average(history.history["val_loss"]))
+        if self.rollout_policy:
+            distillation_loss = self.rollout_policy.distill(self.actor_network)
+            if self.verbose:
+                print(f"Rollout policy distillation loss: {distillation_loss:.4f}")
+
+    def finish_game(self, game_number: int, timer: Timer, train=True) -> None:
+        """
+        Done after each game in every mode: trains the actor net, shows the progress, and saves the loss graph and
+        the model every save_interval games
+        :param game_number: number of the game, or of games finished when they do not finish in order
+        :param timer: timer started before the game, or the round of games
+        :param train: if false, the actor net is trained elsewhere, as in the asynchronous mode
+        """
+        if train:
+            self.train_actor_network()
+        if game_number % self.save_interval == 0:
+            self.save_loss_graph(self.loss, self.val_loss, game_number)
+            self.actor_network.save_model(episode_number=game_number)
+        timer.stop()
+        # The summary follows the last game
+        if not self.verbose and game_number < self.number_of_episodes_to_play:
+            print_loader(
+                game_number + 1,
+                self.number_of_episodes_to_play,
+                10,
+                timer,
+                self.number_of_episodes_to_play,
+            )
+
+    def finish_run(self) -> None:
+        """
+        Writes the pending cases of the case store and prints the summary of the run, in every mode
+        """
+        if self.case_store is not None:
+            self.case_store.flush()
+        self.print_run_summary()
+
+    def get_starting_players(self) -> [int]:
+        """
+        :return: the starting player of each game, as run chooses them
+        """
+        starting_player = StartingPlayerOptions.get_starting_player(
+            self.starting_player_option
+        )
+        starting_players = []
+        for i in range(self.number_of_episodes_to_play):
+            starting_players.append(starting_player)
+            if self.starting_player_option == StartingPlayerOptions.ALTERNATING:
+                starting_player = StateManager.get_opposite_player(starting_player)
+        return starting_players
+
+    def run_asynchronously(self):
+        """
+        Plays the games in self.async_workers processes while this process trains the actor net continuously on
+        the cases they send. The workers play with NumPy copies of the latest weights published by this process,
+        so the rollout policy, the NumPy roll-outs and the search statistics cannot be used in this mode.
+        """
+        context = multiprocessing.get_context("spawn")
+        weights_directory = tempfile.TemporaryDirectory()
+        weights_path = os.path.join(weights_directory.name, "actor_net.npz")
+        published_version = context.Value("i", 0)
+        publish_weights(self.actor_network.to_numpy(), weights_path, published_version)
+        self.start_run()
+        game_counter = context.Value("i", 0)
+        results = context.Queue()
+        # The workers take the games through the counter, so they must agree on the starting player of each game
+        starting_players = self.get_starting_players()
+        workers = [
+            context.Process(
+                target=run_self_play_worker,
+                args=(
+                    weights_path,
+                    published_version,
+                    game_counter,
+                    starting_players,
+                    self.k,
+                    self.mcts_parameters,
+                    self.simulation_budget_parameters,
+                    results,
+                    random.randrange(2 ** 32),
+                ),
+                daemon=True,
+            )
+            for i in range(self.async_workers)
+        ]
+        for worker in workers:
+            worker.start()
+        games_played = 0
+        training_steps = 0
+        finished_workers = 0
+        timer = Timer(start=True)
+        while finished_workers < len(workers):
+            # Waiting for games only when there are no cases to train on
+            try:
+                result = results.get(
+                    block=len(self.actor_network.replay_buffer) == 0, timeout=1
+                )
+            except queue.Empty:
+                result = False
+            while result is not False:
+                if result is None:
+                    finished_workers += 1
+                else:
+                    games_played += 1
+                    self.add_game_result(*result)
+                    self.finish_game(games_played, timer, train=False)
+                    timer.start()
+                try:
+                    result = results.get_nowait()
+                except queue.Empty:
+                    result = False
+            if finished_workers == len(workers):
+                break
+            GameSimulator.check_workers(workers)
+            if len(self.actor_network.replay_buffer) == 0:
+                continue
+            self.train_actor_network()
+            training_steps += 1
+            if training_steps % self.publish_interval == 0:
+                publish_weights(
+                    self.actor_network.to_numpy(), weights_path, published_version
+                )
+        for worker in workers:
+            worker.join()
+        weights_directory.cleanup()
+        if self.verbose:
+            print(f"{training_steps} training steps during {games_played} games")
+        self.finish_run()
+
+    @staticmethod
+    def check_workers(workers: [multiprocessing.Process]) -> None:
+        """
+        Stops the self play processes and raises an error if one of them stopped with an error
+        """
+        for worker in workers:
+            if worker.exitcode not in (None, 0):
+                for other_worker in workers:
+                    other_worker.terminate()
+                raise RuntimeError(
+                    f"Self play process {worker.name} stopped with exit code {worker.exitcode}"
+                )
+
+    def run_with_worker_pool(self):
+        """
+        Plays the games in rounds of self.num_workers games at the same time in a process pool, each worker with a
+        NumPy copy of the weights at the start of the round. The cases and the winners are added in the order of
+        the games, training the actor net after each of them as run does. The rollout policy, the NumPy roll-outs
+        and the search statistics cannot be used in this mode.
+        """
+        context = multiprocessing.get_context("spawn")
+        weights_directory = tempfile.TemporaryDirectory()
+        weights_path = os.path.join(weights_directory.name, "actor_net.npz")
+        self.start_run()
+        starting_players = self.get_starting_players()
+        timer = Timer()
+        with context.Pool(self.num_workers) as pool:
+            for first_game in range(
+                1, self.number_of_episodes_to_play + 1, self.num_workers
+            ):
+                timer.start()
+                publish_weights(self.actor_network.to_numpy(), weights_path)
+                last_game = min(
+                    first_game + self.num_workers - 1, self.number_of_episodes_to_play
+                )
+                game_numbers = range(first_game, last_game + 1)
+                results = pool.starmap(
+                    play_pool_game,
+                    [
+                        (
+                            weights_path,
+                            i,
+                            self.number_of_episodes_to_play,
+                            self.k,
+                            starting_players[i - 1],
+                            self.mcts_parameters,
+                            self.simulation_budget_parameters,
+                            random.randrange(2 ** 32),
+                        )
+                        for i in game_numbers
+                    ],
+                )
+                for result in results:
+                    self.add_game_result(*result)
+                    self.finish_game(result[0], timer)
+        weights_directory.cleanup()
+        self.finish_run()
+
+    def run_lockstep(self):
+        """
+        Plays the games in rounds of self.lockstep_games games, advanced together in this process: the roll-out
+        steps of all the games that need the network are predicted with one predict_batch call. The actor net is
+        trained once for each game after the round, and the rollout policy distilled, as run does. The search
+        statistics cannot be used in this mode, and a simulation budget is made for each game.
+        """
+        self.start_run()
+        starting_players = self.get_starting_players()
+        timer = Timer()
+        for first_game in range(
+            1, self.number_of_episodes_to_play + 1, self.lockstep_games
+        ):
+            timer.start()
+            last_game = min(
+                first_game + self.lockstep_games - 1, self.number_of_episodes_to_play
+            )
+            rollout_net = self.get_rollout_net()
+            games = {
+                i: play_game_steps(
+                    i,
+                    self.number_of_episodes_to_play,
+                    self.k,
+                    starting_players[i - 1],
+                    self.actor_network,
+                    self.mcts_parameters,
+                    SimulationBudget(**self.simulation_budget_parameters)
+                    if self.simulation_budget_parameters
+                    else None,
+                    rollout_net,
+                )
+                for i in range(first_game, last_game + 1)
+            }
+            winners = self.play_in_lockstep(
+                games, self.actor_network if rollout_net is None else rollout_net
+            )
+            for i in range(first_game, last_game + 1):
+                self.add_winner(starting_players[i - 1], winners[i])
+                if self.verbose:
+                    print(f"Player {winners[i]} wins game {i}")
+                self.finish_game(i, timer)
+        self.finish_run()
+
+    def play_in_lockstep(self, games: dict, net) -> dict:
+        """
+        Advances the games until they end, answering the states they yield with one predict_batch call per step
+        :param games: generators from play_game_steps by game number
+        :param net: the net predicting the yielded states
+        :return: the winner of each game by game number
+        """
+        winners = {}
+        distributions = {game_number: None for game_number in games}
+        number_of_batches = 0
+        number_of_predictions = 0
+        while distributions:
+            requests = {}
+            for game_number, distribution in distributions.items():
+                # The cases added by the search are from this game
+                if self.case_store is not None:
+                    self.case_store.start_game(game_number)
+                try:
+                    requests[game_number] = games[game_number].send(distribution)
+                except StopIteration as stop:
+                    winners[game_number] = stop.value
+            if not requests:
+                break
+            distributions = dict(
+                zip(requests, net.predict_batch(list(requests.values())))
+            )
+            number_of_batches += 1
+            number_of_predictions += len(requests)
+        if self.verbose and number_of_batches:
+            print(
+                f"{number_of_predictions} predictions in {number_of_batches} batches, "
+                f"{number_of_predictions / number_of_batches:.1f} on average"
+            )
+        return winners
+
+    def add_game_result(
+        self, game_number: int, starting_player: int, winning_player: int, cases
+    ) -> None:
+        """
+        Adds the cases and the winner of a game played by a self play worker
+        """
+        if self.case_store is not None:
+            self.case_store.start_game(game_number)
+        for state, distribution in cases:
+            self.actor_network.add_case(state, distribution)
+        self.add_winner(starting_player, winning_player)
+        if self.verbose:
+            print(f"Player {winning_player} wins game {game_number}")
+
     def run(self):
+        if self.async_workers > 0:
+            return self.run_asynchronously()
+        if self.num_workers > 0:
+            return self.run_with_worker_pool()
+        if self.lockstep_games > 0:
+            return self.run_lockstep()
         starting_player = StartingPlayerOptions.get_starting_player(
             self.starting_player_option
         )
-        self.actor_network.save_model(episode_number=0)
-        loss = []
-        val_loss = []
+        self.start_run()
         timer = Timer()
         for i in range(1, self.number_of_episodes_to_play + 1):
             self.state_manager = StateManager(self.k, starting_player)
-            self.print_start_state(i, timer)
+            self.print_start_state(i)
             timer.start()
+            if self.case_store is not None:
+                self.case_store.start_game(i)
             mcts = MCTS(
                 self.state_manager,
                 self.actor_network,
                 random_simulation_rate=math.tanh(i / self.number_of_episodes_to_play)
                 * 1.2,
+                search_statistics=self.search_statistics,
+                simulation_budget=self.simulation_budget,
+                rollout_net=self.get_rollout_net(),
                 **self.mcts_parameters,
             )
+            if self.simulation_budget:
+                self.simulation_budget.start_game()
             while not self.state_manager.is_end_state():
                 action = mcts.run(
                     self.state_manager.get_state(), i / self.number_of_episodes_to_play
@@ -175,17 +591,11 @@ class GameSimulator:
                 self.print_action(action)
             self.update_winner_stats(starting_player)
             self.print_winner_of_batch_game()
-            history = self.actor_network.train()
-            loss.append(np.average(history.history["loss"]))
-            val_loss.append(np.average(history.history["val_loss"]))
+            if self.search_statistics:
+                self.search_statistics.dump_game(self.search_statistics_path, i)
+            if self.simulation_budget:
+                self.print_budget_summary(self.simulation_budget.end_game())
             if self.starting_player_option == StartingPlayerOptions.ALTERNATING:
                 starting_player = StateManager.get_opposite_player(starting_player)
-            if i % self.save_interval == 0:
-                self.save_loss_graph(loss, val_loss, i)
-                self.actor_network.save_model(episode_number=i)
-            timer.stop()
-            if i % 50 == 0:
-                self.actor_network.save_buffer_to_file(
-                    i, self.k, self.mcts_parameters["number_of_simulations"]
-                )
-        self.print_run_summary()
+            self.finish_game(i, timer)
+        self.finish_run()
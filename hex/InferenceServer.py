@@ -0,0 +1,173 @@
+import multiprocessing
+import time
+from collections import Counter
+from multiprocessing.connection import wait
+import numpy as np
+
+from hex.NumpyANET import NumpyANET
+from hex.SelfPlayWorker import CaseCollector
+from hex.StateEncoder import StateEncoder
+
+
+class InferenceClient(CaseCollector):
+    """
+    INFERENCE CLIENT
+    Actor net for searches in any process, with the predictions of an InferenceServer. The states are encoded here
+    and sent through a pipe, and the outputs of the network are masked here. The training cases given to add_case
+    are kept to be sent to the learner, see CaseCollector. A client must be used by one thread at a time.
+    """
+
+    def __init__(self, connection):
+        super().__init__()
+        self.connection = connection
+
+    def predict(self, state: str) -> np.ndarray:
+        return self.predict_batch([state])[0]
+
+    def predict_batch(self, states: [str]) -> np.ndarray:
+        """
+        :param states: list of string representations of states
+        :return: np.array with the normalized distribution over the open cells of each state
+        """
+        self.connection.send(
+            ("predict", StateEncoder.convert_states_to_network_format(states))
+        )
+        return StateEncoder.mask_and_normalize_batch(self.connection.recv(), states)
+
+    def get_stats(self) -> dict:
+        """
+        :return: the statistics of the server, see InferenceServer.summarize_stats
+        """
+        self.connection.send(("stats",))
+        return self.connection.recv()
+
+    def close(self) -> None:
+        self.connection.send(("close",))
+        self.connection.close()
+
+
+class InferenceServer:
+    """
+    INFERENCE SERVER
+    One process holding the network for many searches, in this process or in workers, each with an InferenceClient
+    connected by its own pipe. Requests are batched dynamically: a batch is evaluated when every open client is
+    waiting for a prediction, when it has max_batch_size states, or when its oldest request has waited max_latency
+    seconds. The server keeps a histogram of the batch sizes and the time requests wait in the queue.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        number_of_clients: int,
+        max_batch_size=64,
+        max_latency=0.002,
+    ):
+        """
+        Starts the server process
+        :param model_path: a Keras model saved by ANET.save_model, or a .npz file exported for NumpyANET
+        :param number_of_clients: number of clients, one for each search that uses the server at the same time
+        :param max_batch_size: number of states at which a batch is evaluated without waiting for more requests
+        :param max_latency: seconds a request may wait for more requests to batch with
+        """
+        context = multiprocessing.get_context("spawn")
+        pipes = [context.Pipe() for i in range(number_of_clients)]
+        self.clients = [
+            InferenceClient(client_end) for server_end, client_end in pipes
+        ]
+        self.process = context.Process(
+            target=InferenceServer.serve,
+            args=(
+                model_path,
+                [server_end for server_end, client_end in pipes],
+                max_batch_size,
+                max_latency,
+            ),
+            daemon=True,
+        )
+        self.process.start()
+
+    def stop(self) -> None:
+        """
+        Closes the clients that are still open, which stops the server when they are the last ones
+        """
+        for client in self.clients:
+            if not client.connection.closed:
+                client.close()
+        self.process.join()
+
+    @staticmethod
+    def load_network(model_path: str):
+        """
+        :return: function from inputs in the network format to the outputs of the network
+        """
+        if model_path.endswith(".npz"):
+            return NumpyANET.load(model_path).forward
+        from tensorflow.keras.models import load_model
+
+        model = load_model(model_path)
+        return lambda x: np.array(model(x))
+
+    @staticmethod
+    def summarize_stats(batch_sizes: Counter, queue_latencies: [float]) -> dict:
+        """
+        :return: dict with the number of batches and predictions, the histogram of the batch sizes in states, and
+            the mean, median, 95th percentile and maximum of the seconds requests waited before their batch started
+        """
+        latencies = np.array(queue_latencies) if queue_latencies else np.zeros(1)
+        return {
+            "batches": sum(batch_sizes.values()),
+            "predictions": sum(size * count for size, count in batch_sizes.items()),
+            "batch_size_histogram": dict(sorted(batch_sizes.items())),
+            "queue_latency_mean": float(latencies.mean()),
+            "queue_latency_median": float(np.median(latencies)),
+            "queue_latency_p95": float(np.percentile(latencies, 95)),
+            "queue_latency_max": float(latencies.max()),
+        }
+
+    @staticmethod
+    def serve(
+        model_path: str, connections, max_batch_size: int, max_latency: float
+    ):
+        """
+        Target of the server process: answers the requests of the clients until all of them are closed
+        """
+        network = InferenceServer.load_network(model_path)
+        open_connections = list(connections)
+        # Requests waiting for a batch: (`connection`, `inputs`, `time received`)
+        queue = []
+        batch_sizes = Counter()
+        queue_latencies = []
+        while open_connections:
+            timeout = None
+            if queue:
+                timeout = max(0.0, queue[0][2] + max_latency - time.perf_counter())
+            for connection in wait(open_connections, timeout):
+                try:
+                    message = connection.recv()
+                except EOFError:
+                    message = ("close",)
+                if message[0] == "predict":
+                    queue.append((connection, message[1], time.perf_counter()))
+                elif message[0] == "stats":
+                    connection.send(
+                        InferenceServer.summarize_stats(batch_sizes, queue_latencies)
+                    )
+                else:
+                    open_connections.remove(connection)
+            if not queue:
+                continue
+            number_of_states = sum(len(request[1]) for request in queue)
+            now = time.perf_counter()
+            if (
+                len(queue) == len(open_connections)
+                or number_of_states >= max_batch_size
+                or now - queue[0][2] >= max_latency
+            ):
+                outputs = network(np.concatenate([request[1] for request in queue]))
+                batch_sizes[number_of_states] += 1
+                start = 0
+                for connection, inputs, received in queue:
+                    queue_latencies.append(now - received)
+                    connection.send(outputs[start : start + len(inputs)])
+                    start += len(inputs)
+                queue = []
@@ -2,7 +2,10 @@ import networkx as nx
 import matplotlib.pyplot as plt
 import random
 import math
+import threading
 import numpy as np
+from contextlib import nullcontext
+from functools import lru_cache
 
 from hex.StateManager import StateManager
 
@@ -17,6 +20,18 @@ class MCTS:
         number_of_simulations=10,
         verbose=False,
         random_simulation_rate=0.2,
+        max_pondering_simulations=None,
+        opening_book=None,
+        opening_book_min_visits=1,
+        prune_dead_cells=False,
+        progressive_widening=False,
+        widening_constant=1.0,
+        widening_exponent=0.5,
+        widening_prior="heuristic",
+        search_statistics=None,
+        simulation_budget=None,
+        leaf_rollouts=1,
+        rollout_net=None,
     ):
         self.state_manager = StateManager(
             state_manager.board_size, state_manager.current_player()
@@ -31,37 +46,236 @@ class MCTS:
         self.number_of_simulations = number_of_simulations
         self.verbose = verbose
         self.random_simulation_rate = random_simulation_rate
+        # Pondering: background search from the root while the opponent is thinking
+        self.max_pondering_simulations = max_pondering_simulations
+        self.pondering_thread = None
+        self.pondering_stop_event = threading.Event()
+        self.pondering_error = None
+        self.number_of_pondering_simulations = 0
+        # Opening book consulted before searching, and the minimum number of visits of an entry to trust it
+        self.opening_book = opening_book
+        self.opening_book_min_visits = opening_book_min_visits
+        # Leaving out children for dead cells, and counters to measure the reduction of the tree
+        self.prune_dead_cells = prune_dead_cells
+        self.number_of_expanded_children = 0
+        self.number_of_pruned_children = 0
+        # Progressive widening: a node with n visits has at most ceil(widening_constant * (n + 1) ** widening_exponent)
+        # children, introduced in order of the prior: "heuristic" (closest to the center first) or "actor_net"
+        self.progressive_widening = progressive_widening
+        self.widening_constant = widening_constant
+        self.widening_exponent = widening_exponent
+        if widening_prior not in ("heuristic", "actor_net"):
+            raise ValueError(f"Unknown widening prior: {widening_prior}")
+        self.widening_prior = widening_prior
+        # Optional SearchStatistics object collecting counters and timers for the phases of the search
+        self.search_statistics = search_statistics
+        self.last_rollout_length = 0
+        # Optional SimulationBudget deciding the number of simulations per move instead of number_of_simulations
+        self.simulation_budget = simulation_budget
+        # Leaf parallelism: number of random roll-outs from each leaf, evaluated in one vectorized pass and
+        # backpropagated as the average reward with this weight
+        if leaf_rollouts < 1:
+            raise ValueError(f"leaf_rollouts must be at least 1, got {leaf_rollouts}")
+        self.leaf_rollouts = leaf_rollouts
+        # Optional cheaper policy with the predict method of the actor net, used instead of it in the roll-outs
+        self.rollout_net = rollout_net
 
     def run(self, root_state: str, progress: float):
         """
         Main method: Runs the monte carlo tree search algorithm, tree traversal -> rollout -> backprop, m times.
-        Then finds the greedy best move from root state of the current tree
+        Then finds the greedy best action from root state of the current tree
         :param root_state: state to run the algorithm from -> root node
         :return: the greedy best action from root node of the current tree
         """
-        self.tree.cut_tree_with_new_root_node(root_state)
-        self.state_manager.set_state_manager(self.tree.root_state)
-        for i in range(self.number_of_simulations):
-            rollout_state = self.traverse_tree(self.tree.root_state, depth=0)
-            simulation_reward = self.simulate(rollout_state)
-            self.backpropagate(rollout_state, simulation_reward)
+        return MCTS.answer_predictions(
+            self.run_steps(root_state, progress), self.get_rollout_net()
+        )
+
+    def run_steps(self, root_state: str, progress: float):
+        """
+        Generator version of run, for searches that share network calls: yields each state the roll-outs need the
+        prediction of, and takes the distribution with send. See answer_predictions.
+        :return: the chosen action, as the value of the StopIteration
+        """
+        self.stop_pondering()
+        with self.measure("cut_tree_with_new_root_node"):
+            self.tree.cut_tree_with_new_root_node(root_state)
+        with self.measure("set_state_manager"):
             self.state_manager.set_state_manager(self.tree.root_state)
+        distribution = self.get_opening_book_distribution(self.tree.root_state)
+        if distribution is None:
+            if self.simulation_budget is None:
+                for i in range(self.number_of_simulations):
+                    yield from self.run_simulation_steps()
+            else:
+                yield from self.run_budgeted_simulation_steps()
+            distribution = self.get_distribution(self.tree.root_state)
+        elif self.verbose:
+            print("opening book hit")
+        if self.search_statistics is not None:
+            self.search_statistics.end_move(tree_size=len(self.tree.get_nodes()))
+        return self.choose_action(distribution, progress)
 
-        distribution = self.get_distribution(self.tree.root_state)
+    def choose_action(self, distribution: np.ndarray, progress: float) -> str:
+        """
+        Adds the root distribution as a training case and chooses the action to play from it
+        :param distribution: normalized distribution of visits for the root state
+        :param progress: share of the episodes played, the higher the more likely the greedy action is chosen
+        :return: the chosen action from the root state
+        """
         self.actor_net.add_case(self.tree.root_state, distribution.copy())
         if random.random() > math.tanh(progress):
             chosen_action = self.choose_action_stochastically(
-                np.array(distribution), self.tree.root_state
+                distribution, self.tree.root_state
             )
         else:
             chosen_action = self.epsilon_greedy_action_from_distribution(
-                np.array(distribution), self.tree.root_state, epsilon=0.0
+                distribution, self.tree.root_state, epsilon=0.0
             )
         if self.verbose:
             print("distribution", distribution)
             print("chosen_action", chosen_action)
         return chosen_action
 
+    @staticmethod
+    def answer_predictions(steps, net):
+        """
+        Runs a generator of search steps, answering the states it yields with the predictions of the net
+        :param steps: generator from run_steps or the other *_steps methods
+        :param net: the actor net or a rollout net
+        :return: the value the generator returns
+        """
+        try:
+            state = next(steps)
+            while True:
+                state = steps.send(net.predict(state))
+        except StopIteration as stop:
+            return stop.value
+
+    def run_simulation(self) -> None:
+        """
+        One iteration of the algorithm from the current root: tree traversal -> rollout -> backprop.
+        Expects the state manager to be set to the root state, and leaves it there.
+        """
+        MCTS.answer_predictions(self.run_simulation_steps(), self.get_rollout_net())
+
+    def run_simulation_steps(self):
+        """
+        Generator version of run_simulation, see run_steps
+        """
+        with self.measure("traverse_tree"):
+            rollout_state = self.traverse_tree(self.tree.root_state, depth=0)
+        if self.leaf_rollouts > 1:
+            with self.measure("simulate_leaf_parallel"):
+                simulation_reward = self.simulate_leaf_parallel(rollout_state)
+        else:
+            simulation_reward = yield from self.simulate_steps(rollout_state)
+        with self.measure("backpropagate"):
+            self.backpropagate(
+                rollout_state, simulation_reward, weight=self.leaf_rollouts
+            )
+        if self.search_statistics is not None:
+            self.search_statistics.record_simulation(
+                StateManager.get_number_of_pieces(rollout_state)
+                - StateManager.get_number_of_pieces(self.tree.root_state),
+                self.last_rollout_length,
+            )
+        with self.measure("set_state_manager"):
+            self.state_manager.set_state_manager(self.tree.root_state)
+
+    def run_budgeted_simulation_steps(self):
+        """
+        Runs simulations from the root in batches until the allowance from the simulation budget is used,
+        or the budget finds that the root distribution has converged. A generator, see run_steps
+        """
+        root_state = self.tree.root_state
+        number_of_moves = len(StateManager.get_open_cell_indices(root_state))
+        allowance = self.simulation_budget.allocate(root_state)
+        number_of_simulations = 0
+        reason = ""
+        while not reason:
+            batch_size = min(
+                self.simulation_budget.batch_size, allowance - number_of_simulations
+            )
+            for i in range(batch_size):
+                yield from self.run_simulation_steps()
+            number_of_simulations += batch_size
+            if number_of_simulations >= allowance:
+                break
+            # Every simulation adds leaf_rollouts visits
+            reason = self.simulation_budget.has_converged(
+                self.get_visit_counts(root_state) // self.leaf_rollouts,
+                allowance - number_of_simulations,
+                number_of_moves,
+            )
+        self.simulation_budget.spend(
+            root_state, allowance, number_of_simulations, reason
+        )
+
+    def measure(self, phase: str):
+        """
+        :param phase: name of the phase of the search
+        :return: context manager timing the phase, if search statistics are collected
+        """
+        if self.search_statistics is None:
+            return nullcontext()
+        return self.search_statistics.measure(phase)
+
+    # PONDERING METHODS
+    def start_pondering(self, state: str) -> None:
+        """
+        Starts searching from the input state in a background thread, typically the state after our own move while
+        we wait for the opponent. The next call to run (or stop_pondering) stops the search, and run re-roots the
+        tree at the state after the opponent's move keeping the visits gathered for that sub tree.
+        :param state: state to ponder from
+        """
+        self.stop_pondering()
+        self.tree.cut_tree_with_new_root_node(state)
+        self.state_manager.set_state_manager(self.tree.root_state)
+        if self.state_manager.is_end_state():
+            self.tree.set_end_state(self.tree.root_state, True)
+            return
+        self.pondering_stop_event.clear()
+        self.number_of_pondering_simulations = 0
+        self.pondering_thread = threading.Thread(target=self.ponder, daemon=True)
+        self.pondering_thread.start()
+
+    def ponder(self) -> None:
+        """
+        Target of the pondering thread. Runs simulations from the root until stopped,
+        or until max_pondering_simulations is reached
+        """
+        try:
+            while not self.pondering_stop_event.is_set() and (
+                self.max_pondering_simulations is None
+                or self.number_of_pondering_simulations
+                < self.max_pondering_simulations
+            ):
+                self.run_simulation()
+                self.number_of_pondering_simulations += 1
+        except Exception as error:
+            self.pondering_error = error
+
+    def stop_pondering(self) -> int:
+        """
+        Stops the pondering thread (if any) after the simulation it is currently running
+        :return: number of simulations done while pondering
+        """
+        if self.pondering_thread is None:
+            return 0
+        self.pondering_stop_event.set()
+        self.pondering_thread.join()
+        self.pondering_thread = None
+        if self.pondering_error is not None:
+            error, self.pondering_error = self.pondering_error, None
+            raise error
+        if self.verbose:
+            print("pondering simulations", self.number_of_pondering_simulations)
+        return self.number_of_pondering_simulations
+
+    def is_pondering(self) -> bool:
+        return self.pondering_thread is not None
+
     # MAIN ALGORITHM METHODS
     def traverse_tree(self, state: str, depth: int) -> str:
         """
@@ -77,8 +291,10 @@ class MCTS:
             children = self.expand(state)
             return self.choose_random_child(state, children)
         else:
+            if self.progressive_widening:
+                self.widen(state)
             child = self.tree_policy(state)
-            self.state_manager.check_difference_and_perform_action(child)
+            self.perform_tree_move(state, child)
             if self.tree.get_state_number_of_visits(child) == 0:
                 self.tree.set_end_state(child, self.state_manager.is_end_state())
             return self.traverse_tree(child, depth + 1)
@@ -86,66 +302,228 @@ class MCTS:
     def expand(self, state) -> [str]:
         """
         Expanding all child nodes from the input state and adding them to the graph.
+        If prune_dead_cells is set, children placing a piece in a dead cell are left out.
+        With progressive widening only the first children in prior order are added, the rest are kept as
+        unexpanded moves of the node and added by widen as the node gets more visits.
         :param state: state to find all children from
-        :return: list of all child states
+        :return: list of the added child states
+        """
+        with self.measure("expand"):
+            move_indices = StateManager.get_open_cell_indices(state)
+            if self.prune_dead_cells:
+                dead_cells = StateManager.get_dead_cells(state)
+                # Keep all children if every open cell is dead
+                if len(dead_cells) < len(move_indices):
+                    move_indices = StateManager.get_open_cell_indices(
+                        state, excluded_indices=set(dead_cells)
+                    )
+                    self.number_of_pruned_children += len(dead_cells)
+            if self.progressive_widening:
+                self.tree.set_unexpanded_moves(
+                    state, self.sort_moves_by_prior(state, move_indices)
+                )
+                return self.widen(state)
+            return self.add_children(state, move_indices)
+
+    def widen(self, state: str) -> [str]:
+        """
+        Progressive widening: adds children from the unexpanded moves of the state, in prior order, until the
+        state has the number of children allowed by its number of visits
+        :param state: expanded state
+        :return: list of the added child states
+        """
+        unexpanded_moves = self.tree.get_unexpanded_moves(state)
+        if not len(unexpanded_moves):
+            return []
+        allowed_number_of_children = math.ceil(
+            self.widening_constant
+            * (self.tree.get_state_number_of_visits(state) + 1)
+            ** self.widening_exponent
+        )
+        number_of_new_children = max(
+            allowed_number_of_children - self.tree.get_number_of_children(state), 0
+        )
+        if not number_of_new_children:
+            return []
+        self.tree.set_unexpanded_moves(
+            state, unexpanded_moves[number_of_new_children:]
+        )
+        return self.add_children(state, unexpanded_moves[:number_of_new_children])
+
+    def add_children(self, state: str, move_indices) -> [str]:
         """
-        children = StateManager.generate_child_states(state)
-        for child in children:
+        Adds the child states of the moves to the graph
+        :param state: parent state
+        :param move_indices: flattened board indices of the moves
+        :return: list of the added child states
+        """
+        children = [StateManager.get_child_state(state, index) for index in move_indices]
+        self.number_of_expanded_children += len(children)
+        for child, move_index in zip(children, move_indices):
             if child not in self.tree.get_nodes():
                 self.tree.add_state_node(child)
-            self.tree.add_edge(state, child)
+            self.tree.add_edge(state, child, move_index=int(move_index))
         return children
 
+    def sort_moves_by_prior(self, state: str, move_indices: [int]) -> np.ndarray:
+        """
+        :param state: state the moves are made from
+        :param move_indices: flattened board indices of the moves
+        :return: np.array of the move indices, most promising first
+        """
+        move_indices = np.array(move_indices, dtype=np.int16)
+        if self.widening_prior == "actor_net":
+            prior = np.asarray(self.actor_net.predict(state))
+        else:
+            prior = MCTS.get_center_prior(self.state_manager.board_size)
+        return move_indices[np.argsort(-prior[move_indices], kind="stable")]
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_center_prior(board_size: int) -> np.ndarray:
+        """
+        Cheap prior for progressive widening: cells closer to the center of the board first
+        :param board_size: number of rows/cols in the board
+        :return: np.array with the negative hex distance to the center for each cell
+        """
+        center = (board_size - 1) / 2
+        rows, cols = np.divmod(np.arange(board_size ** 2), board_size)
+        row_distance, col_distance = rows - center, cols - center
+        return -(
+            np.abs(row_distance)
+            + np.abs(col_distance)
+            + np.abs(row_distance + col_distance)
+        ) / 2
+
     def simulate(self, state: str):
         """
-        Performs one roll-out using the actor net as policy
+        Performs one roll-out using the actor net, or the rollout net if there is one, as policy
         :return: return 1 if the simulation ends in player "true" winning, -1 otherwise
         """
+        return MCTS.answer_predictions(
+            self.simulate_steps(state), self.get_rollout_net()
+        )
+
+    def simulate_steps(self, state: str):
+        """
+        Generator version of simulate, yielding the states to predict with the actor net or the rollout net
+        """
         if self.state_manager.get_state() != state:
             raise ValueError(
                 "The state manager is not set to the start of the simulation"
             )
+        self.last_rollout_length = 0
         while not self.state_manager.is_end_state():
             if random.random() < self.random_simulation_rate:
-                distribution = self.actor_net.predict(self.state_manager.get_state())
-                chosen_action = self.epsilon_greedy_action_from_distribution(
-                    distribution, self.state_manager.get_state(), epsilon=0.0
-                )
+                with self.measure("simulate_actor_net_step"):
+                    distribution = yield self.state_manager.get_state()
+                    chosen_action = self.epsilon_greedy_action_from_distribution(
+                        distribution, self.state_manager.get_state(), epsilon=0.0
+                    )
+                    self.state_manager.perform_action(chosen_action)
             else:
-                chosen_action = random.choice(
-                    self.state_manager.generate_possible_actions(
-                        self.state_manager.get_state()
+                with self.measure("simulate_random_step"):
+                    chosen_action = random.choice(
+                        self.state_manager.generate_possible_actions(
+                            self.state_manager.get_state()
+                        )
                     )
-                )
-            self.state_manager.perform_action(chosen_action)
+                    self.state_manager.perform_action(chosen_action)
+            self.last_rollout_length += 1
         return MCTS.get_end_state_reward(self.state_manager.current_player())
 
-    def backpropagate(self, state: str, simulation_reward: int):
+    def simulate_leaf_parallel(self, state: str) -> float:
+        """
+        Performs leaf_rollouts roll-outs from the state in one vectorized pass. Continuing a roll-out until the board
+        is full does not change the winner, so every roll-out fills all open cells with alternating pieces, starting
+        with the player to move. Without actor net steps (random_simulation_rate 0) each roll-out is a random order
+        of the open cells, otherwise the roll-outs are played in lockstep, see fill_boards_with_rollout_net.
+        :return: the average reward of the roll-outs, between -1 and 1
+        """
+        if self.state_manager.get_state() != state:
+            raise ValueError(
+                "The state manager is not set to the start of the simulation"
+            )
+        self.last_rollout_length = 0
+        if self.state_manager.is_end_state():
+            return MCTS.get_end_state_reward(self.state_manager.current_player())
+        board, player = StateManager.extract_state(state)
+        cells = np.frombuffer(board.encode(), dtype=np.uint8).astype(np.int8) - ord("0")
+        open_cells = np.flatnonzero(cells == 0)
+        boards = np.tile(cells, (self.leaf_rollouts, 1))
+        if self.random_simulation_rate > 0:
+            self.fill_boards_with_rollout_net(boards, int(player))
+        else:
+            pieces = np.where(
+                np.arange(len(open_cells)) % 2 == 0,
+                int(player),
+                StateManager.get_opposite_player(int(player)),
+            )
+            orders = np.argsort(
+                np.random.random((self.leaf_rollouts, len(open_cells))), axis=1
+            )
+            boards[np.arange(self.leaf_rollouts)[:, None], open_cells[orders]] = pieces
+        board_size = self.state_manager.board_size
+        player_one_wins = StateManager.has_player_one_path(
+            boards.reshape(self.leaf_rollouts, board_size, board_size)
+        )
+        self.last_rollout_length = len(open_cells)
+        return float(np.mean(np.where(player_one_wins, 1.0, -1.0)))
+
+    def fill_boards_with_rollout_net(self, boards: np.ndarray, player: int) -> None:
+        """
+        Plays the roll-outs of simulate_leaf_parallel in lockstep until the boards are full. In every step each
+        roll-out uses the rollout net with probability random_simulation_rate, as in simulate, and the states of all
+        roll-outs using it are predicted with one predict_batch call.
+        :param boards: np.array of shape (number of roll-outs, board_size ** 2), with 0 for open cells, filled in place
+        :param player: the player to move in all the boards
+        """
+        rollouts = np.arange(len(boards))
+        for step in range(np.count_nonzero(boards[0] == 0)):
+            scores = np.random.random(boards.shape)
+            use_net = np.random.random(len(boards)) < self.random_simulation_rate
+            if use_net.any():
+                with self.measure("simulate_actor_net_step"):
+                    states = [
+                        f"{(row.astype(np.uint8) + ord('0')).tobytes().decode()}:{player}"
+                        for row in boards[use_net]
+                    ]
+                    scores[use_net] = self.get_rollout_net().predict_batch(states)
+            # The greedy move of the rollout net, or a random open cell
+            moves = np.argmax(np.where(boards == 0, scores, -1.0), axis=1)
+            boards[rollouts, moves] = player
+            player = StateManager.get_opposite_player(player)
+
+    def backpropagate(self, state: str, simulation_reward: float, weight=1):
         """
         Starts at rollout start state and jumps up in the tree updating the nodes sap and number of visits
         :param state: rollout start state
         :param simulation_reward: reward from simulation
+        :param weight: number of roll-outs the reward is the average of, counted as that many visits
         """
         if state == self.tree.root_state:
-            self.tree.increment_state_number_of_visits(state)
+            self.tree.increment_state_number_of_visits(state, weight)
             return
         parent_state = self.tree.get_parent(state)
 
-        self.tree.increment_state_number_of_visits(state)
-        self.tree.increment_edge_number_of_visits(parent_state, state)
+        self.tree.increment_state_number_of_visits(state, weight)
+        self.tree.increment_edge_number_of_visits(parent_state, state, weight)
         edge_times_enc = self.tree.get_edge_number_of_visits(parent_state, state)
         edge_sap_value = self.tree.get_sap_value(parent_state, state)
         new_sap_value = (
             self.tree.get_sap_value(parent_state, state)
-            + (simulation_reward - edge_sap_value) / edge_times_enc
+            + weight * (simulation_reward - edge_sap_value) / edge_times_enc
         )
         self.tree.set_sap_value(parent_state, state, new_sap_value)
         self.tree.set_active_edge(parent_state, state, False)
 
-        self.backpropagate(parent_state, simulation_reward)
+        self.backpropagate(parent_state, simulation_reward, weight)
 
     # HELPER METHODS
 
+    def get_rollout_net(self):
+        return self.actor_net if self.rollout_net is None else self.rollout_net
+
     def tree_policy(self, state: str) -> str:
         """
         Using the uct score to determine the child state of a input state
@@ -207,7 +585,21 @@ class MCTS:
             state,
             sort_by_function=lambda edge: self.tree.get_edge_number_of_visits(*edge),
         )
-        return self.state_manager.get_action(*sorted_list[0])
+        return self.state_manager.get_action_from_flattened_board_index(
+            self.tree.get_move_index(*sorted_list[0]), state
+        )
+
+    def perform_tree_move(self, parent_state: str, child_state: str) -> None:
+        """
+        Performs the move of the edge between the two states on the state manager, using the move index of the edge
+        :param parent_state: state the state manager is set to
+        :param child_state: child state to move to
+        """
+        self.state_manager.perform_action(
+            self.state_manager.get_action_from_flattened_board_index(
+                self.tree.get_move_index(parent_state, child_state), parent_state
+            )
+        )
 
     def choose_random_child(self, parent_state: str, child_list: [str]) -> str:
         """
@@ -218,7 +610,7 @@ class MCTS:
         :return: chosen child
         """
         child = random.choice(child_list)
-        self.state_manager.check_difference_and_perform_action(child)
+        self.perform_tree_move(parent_state, child)
         self.tree.set_end_state(child, self.state_manager.is_end_state())
         self.tree.set_active_edge(parent_state, child, True)
         return child
@@ -257,40 +649,51 @@ class MCTS:
         """
         return -1 if current_player == 1 else 1
 
-    def get_distribution(self, state: str):
+    def get_visit_counts(self, state: str) -> np.ndarray:
+        """
+        Returns the number of visits of the edges to the child nodes of the input state
+        :param state: state to get the visit counts from
+        :return: np.array of length equal to the total number of positions on the board
+        """
+        visit_counts = np.zeros(self.state_manager.board_size ** 2, dtype=int)
+        for parent, child, edge_data in self.tree.get_outgoing_edges_data(state):
+            visit_counts[edge_data[TreeConstants.MOVE_INDEX]] = edge_data[
+                TreeConstants.NUMBER_OF_VISITS
+            ]
+        return visit_counts
+
+    def get_distribution(self, state: str) -> np.ndarray:
         """
         Returns the distribution of total visits for child nodes of input state
         :param state: state to get distribution from
-        :return: a normalized list of length equal to the total number of positions on the board
-        """
-
-        parent_board, parent_player = StateManager.extract_state(state)
-        child_states = self.tree.get_child_states(state)
-        change_indices_dict = {}
-        total_visits = 0
-        for child in child_states:
-            child_board, child_player = StateManager.extract_state(child)
-            for i in range(len(child_board)):
-                if parent_board[i] != child_board[i]:
-                    child_number_of_visits = self.tree.get_edge_number_of_visits(
-                        state, child
-                    )
-                    change_indices_dict[i] = child_number_of_visits
-                    total_visits += child_number_of_visits
-                    break
-
-        return [
-            change_indices_dict[index] / total_visits
-            if index in change_indices_dict
-            else 0
-            for index in range(self.state_manager.board_size ** 2)
-        ]
+        :return: a normalized np.array of length equal to the total number of positions on the board
+        """
+        visit_counts = self.get_visit_counts(state)
+        total_visits = visit_counts.sum()
+        if not total_visits:
+            raise ValueError(f"No visits to the children of {state}")
+        return visit_counts / total_visits
+
+    def get_opening_book_distribution(self, state: str):
+        """
+        Looks up the input state in the opening book
+        :param state: state to look up
+        :return: the normalized distribution of visits stored in the book, None if there is no (trusted) entry
+        """
+        if self.opening_book is None:
+            return None
+        visit_counts = self.opening_book.get_visit_counts(
+            state, min_visits=self.opening_book_min_visits
+        )
+        if visit_counts is None:
+            return None
+        return visit_counts / visit_counts.sum()
 
     def set_random_simulation_rate(self, new_rate: float):
         self.random_simulation_rate = new_rate
 
     def choose_action_stochastically(self, distribution, state):
-        chosen_index = np.random.choice([i for i in range(len(distribution))], p=distribution)
+        chosen_index = np.random.choice(len(distribution), p=distribution)
         return self.state_manager.get_action_from_flattened_board_index(
             chosen_index, state
         )
@@ -299,10 +702,12 @@ class MCTS:
 class TreeConstants:
     # Node attributes
     IS_END_STATE = "is_end_state"
+    UNEXPANDED_MOVES = "unexpanded_moves"
 
     # Edge attributes
     SAP_VALUE = "sap_value"
     IS_ACTIVE = "is_active"
+    MOVE_INDEX = "move_index"
 
     # Both
     NUMBER_OF_VISITS = "n"
@@ -341,14 +746,35 @@ class StateTree:
     def get_child_states(self, state: str) -> [str]:
         return list(self.graph.successors(state))
 
+    def get_number_of_children(self, state: str) -> int:
+        return self.graph.out_degree(state)
+
+    def get_unexpanded_moves(self, state: str) -> np.ndarray:
+        """
+        :return: flattened board indices of the moves from the state not yet added as children (progressive widening)
+        """
+        return self.graph.nodes[state].get(TreeConstants.UNEXPANDED_MOVES, ())
+
+    def set_unexpanded_moves(self, state: str, move_indices: np.ndarray) -> None:
+        self.graph.nodes[state][TreeConstants.UNEXPANDED_MOVES] = move_indices
+
     def get_state_number_of_visits(self, state: str) -> int:
         return self.graph.nodes[state][TreeConstants.NUMBER_OF_VISITS]
 
-    def increment_state_number_of_visits(self, state: str) -> None:
-        self.graph.nodes[state][TreeConstants.NUMBER_OF_VISITS] += 1
+    def increment_state_number_of_visits(self, state: str, amount=1) -> None:
+        self.graph.nodes[state][TreeConstants.NUMBER_OF_VISITS] += amount
 
     def cut_tree_with_new_root_node(self, state: str) -> None:
+        """
+        Keeps only the sub tree below the input state. If the state is not in the tree, e.g. an opponent move that
+        was never explored while pondering, the tree is reset to only contain the new root
+        :param state: new root state
+        """
         self.set_root_state(state)
+        if state not in self.graph:
+            self.graph = nx.DiGraph()
+            self.add_state_node(state)
+            return
         sub_tree_nodes = nx.bfs_tree(self.graph, state)
         self.graph = nx.DiGraph(self.graph.subgraph(sub_tree_nodes))
 
@@ -369,19 +795,29 @@ class StateTree:
             ]
         return outgoing_edges
 
+    def get_outgoing_edges_data(self, state: str):
+        """
+        :return: iterator over the outgoing edges of the state as (parent, child, edge attribute dict)
+        """
+        return self.graph.out_edges(state, data=True)
+
     def is_end_state(self, state: str) -> bool:
         return self.graph.nodes[state][TreeConstants.IS_END_STATE]
 
     def set_end_state(self, state: str, value: bool) -> None:
         self.graph.nodes[state][TreeConstants.IS_END_STATE] = value
 
-    def add_edge(self, parent_state, child_state):
+    def add_edge(self, parent_state, child_state, move_index=None):
         """
         Adds edge to the DiGraph G with initial sap_value = 0, number of encounters = 0 and flag meaning this was the
             edge used in the latest tree traversal
         :param parent_state: (list representing board state, player to move): ([int], bool)
         :param child_state: (list representing board state, player to move): ([int], bool)
+        :param move_index: flattened board index of the move from parent to child. Found by comparing the states
+            if not given
         """
+        if move_index is None:
+            move_index = StateTree.find_move_index(parent_state, child_state)
         self.graph.add_edge(
             parent_state,
             child_state,
@@ -389,9 +825,24 @@ class StateTree:
                 TreeConstants.SAP_VALUE: 0.0,
                 TreeConstants.NUMBER_OF_VISITS: 0,
                 TreeConstants.IS_ACTIVE: 0,
+                TreeConstants.MOVE_INDEX: move_index,
             }
         )
 
+    @staticmethod
+    def find_move_index(parent_state: str, child_state: str) -> int:
+        for index, (parent_cell, child_cell) in enumerate(
+            zip(parent_state[:-2], child_state[:-2])
+        ):
+            if parent_cell != child_cell:
+                return index
+        raise ValueError(f"No move from {parent_state} to {child_state}")
+
+    def get_move_index(self, parent_state: str, child_state: str) -> int:
+        return self.graph.get_edge_data(parent_state, child_state)[
+            TreeConstants.MOVE_INDEX
+        ]
+
     def get_sap_value(self, parent_state: str, child_state: str) -> float:
         return self.graph.get_edge_data(parent_state, child_state)[
             TreeConstants.SAP_VALUE
@@ -426,11 +877,11 @@ class StateTree:
         ]
 
     def increment_edge_number_of_visits(
-        self, parent_state: str, child_state: str
+        self, parent_state: str, child_state: str, amount=1
     ) -> None:
         self.graph.get_edge_data(parent_state, child_state)[
             TreeConstants.NUMBER_OF_VISITS
-        ] += 1
+        ] += amount
 
     def get_parent(self, state: str) -> str:
         parent_list = list(self.graph.predecessors(state))
@@ -0,0 +1,119 @@
+import glob
+import numpy as np
+
+from hex.StateEncoder import StateEncoder
+
+
+class NumpyANET:
+    """
+    NUMPY ANET
+    Inference only copy of a trained ANET: the Dense layers as NumPy arrays, evaluated with one matrix product and
+    activation per layer. It has the predict method of the ANET without the dispatch overhead of calling the Keras
+    model for one state, and does not import TensorFlow. Training cases given to add_case are ignored.
+    """
+
+    ACTIVATIONS = {
+        "linear": lambda x: x,
+        "relu": lambda x: np.maximum(x, 0.0),
+        "tanh": np.tanh,
+        "sigmoid": lambda x: 1.0 / (1.0 + np.exp(-x)),
+        "softmax": lambda x: NumpyANET.softmax(x),
+    }
+
+    def __init__(
+        self,
+        weights: [np.ndarray],
+        biases: [np.ndarray],
+        activations: [str],
+        episode_number=0,
+    ):
+        """
+        :param weights: kernel of each Dense layer, of shape (input units, output units)
+        :param biases: bias of each Dense layer
+        :param activations: name of the activation function of each Dense layer
+        :param episode_number: number of episodes the model was trained for
+        """
+        for activation in activations:
+            if activation not in NumpyANET.ACTIVATIONS:
+                raise ValueError(f"Unsupported activation function: {activation}")
+        self.weights = [np.asarray(kernel, dtype=np.float32) for kernel in weights]
+        self.biases = [np.asarray(bias, dtype=np.float32) for bias in biases]
+        self.activations = list(activations)
+        self.episode_number = episode_number
+        self.size_of_board = StateEncoder.infer_board_size(self.weights[0].shape[0])
+
+    @staticmethod
+    def softmax(x: np.ndarray) -> np.ndarray:
+        exponentials = np.exp(x - x.max(axis=-1, keepdims=True))
+        return exponentials / exponentials.sum(axis=-1, keepdims=True)
+
+    @staticmethod
+    def from_keras_model(model, episode_number=0):
+        """
+        Copies the weights of a Sequential model of Dense layers
+        :param model: Sequential model of an ANET
+        :param episode_number: number of episodes the model was trained for
+        :return: NumpyANET object computing the same function as the model
+        """
+        weights, biases, activations = [], [], []
+        for layer in model.layers:
+            kernel, bias = layer.get_weights()
+            weights.append(kernel)
+            biases.append(bias)
+            activations.append(layer.get_config()["activation"])
+        return NumpyANET(weights, biases, activations, episode_number=episode_number)
+
+    def forward(self, x: np.ndarray) -> np.ndarray:
+        """
+        :param x: inputs in the network format, np.array of shape (number of inputs, input size)
+        :return: outputs of the network, np.array of shape (number of inputs, board_size ** 2)
+        """
+        for kernel, bias, activation in zip(
+            self.weights, self.biases, self.activations
+        ):
+            x = NumpyANET.ACTIVATIONS[activation](np.dot(x, kernel) + bias)
+        return x
+
+    def predict(self, state: str) -> np.array:
+        input_data = StateEncoder.convert_states_to_network_format([state])
+        return StateEncoder.mask_and_normalize(self.forward(input_data)[0], state)
+
+    def predict_batch(self, states: [str]) -> np.ndarray:
+        """
+        :param states: list of string representations of states
+        :return: np.array with the normalized distribution over the open cells of each state
+        """
+        input_data = StateEncoder.convert_states_to_network_format(states)
+        return StateEncoder.mask_and_normalize_batch(self.forward(input_data), states)
+
+    def add_case(self, state, distribution_of_visit_counts):
+        pass
+
+    def save(self, path: str) -> None:
+        arrays = {"episode_number": np.array(self.episode_number)}
+        for i, (kernel, bias) in enumerate(zip(self.weights, self.biases)):
+            arrays[f"kernel_{i}"] = kernel
+            arrays[f"bias_{i}"] = bias
+        np.savez(path, activations=np.array(self.activations), **arrays)
+
+    @staticmethod
+    def load(path: str):
+        with np.load(path) as arrays:
+            activations = [str(activation) for activation in arrays["activations"]]
+            return NumpyANET(
+                [arrays[f"kernel_{i}"] for i in range(len(activations))],
+                [arrays[f"bias_{i}"] for i in range(len(activations))],
+                activations,
+                episode_number=int(arrays["episode_number"]),
+            )
+
+    @staticmethod
+    def load_models(directory: str):
+        """
+        Loads all exported models in the directory
+        :return: list of NumpyANET objects sorted by the number of episodes trained
+        """
+        return sorted(
+            [NumpyANET.load(path) for path in glob.glob(directory + "/*.npz")],
+            key=lambda model: model.episode_number,
+        )
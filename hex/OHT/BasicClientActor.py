@@ -1,5 +1,6 @@
 from hex.OHT.BasicClientActorAbs import BasicClientActorAbs
-from hex.ANET import ANET
+from hex.NumpyANET import NumpyANET
+from hex.MCTS import MCTS
 from hex.StateManager import StateManager
 
 import math
@@ -7,10 +8,25 @@ import numpy as np
 
 
 class BasicClientActor(BasicClientActorAbs):
-    def __init__(self, model_path: str, IP_address=None, verbose=True):
+    def __init__(
+        self, model_path: str, IP_address=None, verbose=True, mcts_parameters=None
+    ):
+        """
+        :param model_path: path to the trained model, a .npz export is played with NumpyANET without TensorFlow
+        :param mcts_parameters: if given, moves are chosen by MCTS with the model as actor net, pondering on the
+            opponent's time. Otherwise the greedy move of the model is played
+        """
         self.series_id = -1
         BasicClientActorAbs.__init__(self, IP_address, verbose=verbose)
-        self.model = ANET.load_model(model_path)
+        if model_path.endswith(".npz"):
+            self.model = NumpyANET.load(model_path)
+        else:
+            from hex.ANET import ANET
+
+            self.model = ANET.load_model(model_path)
+        self.mcts_parameters = mcts_parameters
+        self.mcts = None
+        self.board_size = None
 
     def handle_get_action(self, state):
         """
@@ -25,9 +41,17 @@ class BasicClientActor(BasicClientActorAbs):
         board = ''.join([str(cell) for cell in state[1:]])
         local_state_rep = f"{board}:{state[0]}"
         state_manager = StateManager(int(math.sqrt(len(board))), state[0])
-        distribution = self.model.predict(local_state_rep)
-        chosen_index = int(np.argmax(distribution))
-        action_string = state_manager.get_action_from_flattened_board_index(chosen_index, local_state_rep)
+        if self.mcts is not None:
+            # Infinite progress makes the MCTS choose the greedy action
+            action_string = self.mcts.run(local_state_rep, progress=math.inf)
+            # Keep searching from the resulting state while the opponent is thinking
+            state_manager.set_state_manager(local_state_rep)
+            state_manager.perform_action(action_string)
+            self.mcts.start_pondering(state_manager.get_state())
+        else:
+            distribution = self.model.predict(local_state_rep)
+            chosen_index = int(np.argmax(distribution))
+            action_string = state_manager.get_action_from_flattened_board_index(chosen_index, local_state_rep)
         return state_manager.check_and_extract_action_string(action_string, check_player_turn=False)[:-1]
 
     def handle_series_start(
@@ -44,6 +68,7 @@ class BasicClientActor(BasicClientActorAbs):
 
         """
         self.series_id = series_id
+        self.board_size = game_params[0]
         #############################
         #
         #
@@ -58,6 +83,12 @@ class BasicClientActor(BasicClientActorAbs):
         :return
         """
         self.starting_player = start_player
+        if self.mcts_parameters is not None:
+            self.mcts = MCTS(
+                StateManager(self.board_size, start_player),
+                self.model,
+                **self.mcts_parameters,
+            )
         #############################
         #
         #
@@ -81,6 +112,8 @@ class BasicClientActor(BasicClientActorAbs):
         #
         #
         ##############################
+        if self.mcts is not None:
+            self.mcts.stop_pondering()
         print("Game over, these are the stats:")
         print("Winner: " + str(winner))
         print("End state: " + str(end_state))
@@ -0,0 +1,193 @@
+import hashlib
+import random
+import numpy as np
+
+from hex.StateManager import StateManager
+from hex.MCTS import MCTS
+
+
+class OpeningBook:
+    """
+    OPENING BOOK
+    Maps opening states to the accumulated root visit counts of earlier searches from that state.
+    Entries are keyed by (board size, canonical state hash), so the symmetric images of a state share one entry
+    stored for the canonical state, and visit counts are mapped to and from it. A saved book is one file: a header,
+    the sorted state hashes and the visit counts of each entry. Loaded books are memory mapped, so a lookup is a
+    binary search in the file.
+    """
+
+    HEADER_DTYPE = np.dtype(
+        [("magic", "S4"), ("board_size", "<u4"), ("number_of_entries", "<u8")]
+    )
+    MAGIC = b"HXOB"
+    HASH_DTYPE = np.dtype("<u8")
+    VISITS_DTYPE = np.dtype("<u4")
+
+    def __init__(self, board_size: int, max_number_of_pieces=4):
+        """
+        :param board_size: number of rows/cols in the board
+        :param max_number_of_pieces: only states with at most this many pieces on the board are added to the book
+        """
+        self.board_size = board_size
+        self.max_number_of_pieces = max_number_of_pieces
+        # Entries added since the book was created/loaded: state hash -> visit counts
+        self.new_entries = {}
+        # Saved entries, memory mapped if the book is loaded from file
+        self.hashes = np.zeros(0, dtype=OpeningBook.HASH_DTYPE)
+        self.visit_counts = np.zeros(
+            (0, board_size ** 2), dtype=OpeningBook.VISITS_DTYPE
+        )
+
+    def __len__(self):
+        return len(self.get_all_hashes())
+
+    @staticmethod
+    def state_hash(state: str) -> np.uint64:
+        """
+        Stable 64 bit hash of a state string (the builtin hash is salted per process)
+        :param state: string representation of state
+        :return: hash of the state as an unsigned 64 bit integer
+        """
+        return np.uint64(
+            int.from_bytes(
+                hashlib.blake2b(state.encode(), digest_size=8).digest(), "little"
+            )
+        )
+
+    def is_opening_state(self, state: str) -> bool:
+        return StateManager.get_number_of_pieces(state) <= self.max_number_of_pieces
+
+    def add(self, state: str, visit_counts) -> bool:
+        """
+        Adds the root visit counts of one search from the input state to the book
+        :param state: root state of the search
+        :param visit_counts: number of visits for each cell of the board from the root state
+        :return: true if the state was added, false if it is not an opening state
+        """
+        if not self.is_opening_state(state):
+            return False
+        visit_counts = np.asarray(visit_counts, dtype=OpeningBook.VISITS_DTYPE)
+        if visit_counts.shape != (self.board_size ** 2,):
+            raise ValueError(
+                f"Visit counts should have length {self.board_size ** 2}, got {visit_counts.shape}"
+            )
+        canonical_state, transform = StateManager.canonicalize(state)
+        visit_counts = StateManager.transform_distribution(visit_counts, transform)
+        key = OpeningBook.state_hash(canonical_state)
+        if key not in self.new_entries:
+            self.new_entries[key] = np.zeros(
+                self.board_size ** 2, dtype=OpeningBook.VISITS_DTYPE
+            )
+        self.new_entries[key] += visit_counts
+        return True
+
+    def get_visit_counts(self, state: str, min_visits=1):
+        """
+        Looks up the visit counts for the input state
+        :param state: string representation of state
+        :param min_visits: minimum total number of visits for the entry to be used
+        :return: np.array of visit counts for each cell, or None if the state is not (well enough) covered by the book
+        """
+        if len(StateManager.extract_state(state)[0]) != self.board_size ** 2:
+            return None
+        canonical_state, transform = StateManager.canonicalize(state)
+        key = OpeningBook.state_hash(canonical_state)
+        visit_counts = self.new_entries.get(key)
+        index = np.searchsorted(self.hashes, key)
+        if index < len(self.hashes) and self.hashes[index] == key:
+            stored_visit_counts = np.array(self.visit_counts[index])
+            visit_counts = (
+                stored_visit_counts
+                if visit_counts is None
+                else stored_visit_counts + visit_counts
+            )
+        if visit_counts is None or visit_counts.sum() < max(min_visits, 1):
+            return None
+        return StateManager.transform_distribution(visit_counts, transform)
+
+    def harvest_self_play(self, actor_net, number_of_games: int, mcts_parameters=None):
+        """
+        Plays the openings of self play games, adding the root visit counts of every search to the book.
+        Moves are chosen stochastically from the visit distributions to spread the games over many openings.
+        :param actor_net: actor net used by the MCTS
+        :param number_of_games: number of openings to play
+        :param mcts_parameters: parameters for the MCTS
+        """
+        mcts_parameters = mcts_parameters if mcts_parameters else {}
+        for i in range(number_of_games):
+            state_manager = StateManager(self.board_size, random.randint(1, 2))
+            mcts = MCTS(state_manager, actor_net, **mcts_parameters)
+            while not state_manager.is_end_state() and self.is_opening_state(
+                state_manager.get_state()
+            ):
+                state = state_manager.get_state()
+                # No progress: always choose stochastically
+                action = mcts.run(state, progress=0)
+                self.add(state, mcts.get_visit_counts(state))
+                state_manager.perform_action(action)
+
+    def get_all_hashes(self) -> np.ndarray:
+        return np.union1d(
+            self.hashes,
+            np.fromiter(
+                self.new_entries.keys(),
+                dtype=OpeningBook.HASH_DTYPE,
+                count=len(self.new_entries),
+            ),
+        )
+
+    def save(self, path: str) -> None:
+        """
+        Writes the loaded and new entries of the book to one file sorted on the state hashes
+        :param path: path of the book file
+        """
+        hashes = self.get_all_hashes()
+        visit_counts = np.zeros(
+            (len(hashes), self.board_size ** 2), dtype=OpeningBook.VISITS_DTYPE
+        )
+        if len(self.hashes):
+            visit_counts[np.searchsorted(hashes, self.hashes)] += self.visit_counts
+        for key, new_visit_counts in self.new_entries.items():
+            visit_counts[np.searchsorted(hashes, key)] += new_visit_counts
+        # Release the memory map before the file is possibly overwritten
+        self.hashes, self.visit_counts, self.new_entries = hashes, visit_counts, {}
+        header = np.array(
+            [(OpeningBook.MAGIC, self.board_size, len(hashes))],
+            dtype=OpeningBook.HEADER_DTYPE,
+        )
+        with open(path, "wb") as file:
+            header.tofile(file)
+            hashes.astype(OpeningBook.HASH_DTYPE).tofile(file)
+            visit_counts.tofile(file)
+
+    @staticmethod
+    def load(path: str, max_number_of_pieces=4):
+        """
+        Loads a book file memory mapped
+        :param path: path of the book file
+        :param max_number_of_pieces: used for entries added after loading
+        :return: OpeningBook object
+        """
+        header = np.fromfile(path, dtype=OpeningBook.HEADER_DTYPE, count=1)[0]
+        if header["magic"] != OpeningBook.MAGIC:
+            raise ValueError(f"{path} is not an opening book file")
+        board_size = int(header["board_size"])
+        number_of_entries = int(header["number_of_entries"])
+        book = OpeningBook(board_size, max_number_of_pieces=max_number_of_pieces)
+        if number_of_entries:
+            offset = OpeningBook.HEADER_DTYPE.itemsize
+            book.hashes = np.memmap(
+                path,
+                dtype=OpeningBook.HASH_DTYPE,
+                mode="r",
+                offset=offset,
+                shape=(number_of_entries,),
+            )
+            book.visit_counts = np.memmap(
+                path,
+                dtype=OpeningBook.VISITS_DTYPE,
+                mode="r",
+                offset=offset + number_of_entries * OpeningBook.HASH_DTYPE.itemsize,
+                shape=(number_of_entries, board_size ** 2),
+            )
+        return book
@@ -0,0 +1,192 @@
+import math
+import random
+import numpy as np
+
+from hex.SumTree import SumTree
+
+
+class ReplayBuffer:
+    """
+    REPLAY BUFFER
+    Training cases of the ANET in two preallocated float32 arrays, used as a ring: the oldest case is at the start
+    index and the cases follow in the order they were added. When the buffer is full, adding a case evicts a random
+    case among the oldest ones, at a random position in [1, floor(max_size * cutoff_rate)] counted from the oldest,
+    as the list based buffer did, and at most max_size - 1. Instead of shifting the older cases like deleting from a list, the oldest case is
+    moved into the slot of the evicted case and the start moves one slot, so adding a case copies at most one case.
+    In prioritized mode, cases are sampled with probability proportional to (loss + priority_epsilon) ** alpha of
+    their last observed loss, kept in a SumTree over the slots. New cases get the highest priority so far, and the
+    importance weights (size * probability) ** -beta, divided by their maximum, correct the bias of the sampling.
+    In deduplicating mode, a case with the same network input as a case in the buffer is merged into it: the target
+    becomes the running average of the distributions added for the input, and no case is evicted.
+    """
+
+    def __init__(
+        self,
+        input_size: int,
+        output_size: int,
+        max_size: int,
+        cutoff_rate: float,
+        prioritized=False,
+        alpha=0.6,
+        beta=0.4,
+        priority_epsilon=0.01,
+        deduplicate=False,
+    ):
+        """
+        :param input_size: length of the network format of a state
+        :param output_size: length of a distribution, board_size ** 2
+        :param max_size: number of cases kept
+        :param cutoff_rate: the evicted case is among the oldest max_size * cutoff_rate cases
+        :param prioritized: if true, sample_prioritized samples the cases by their last observed loss
+        :param alpha: how much the loss decides the priority, 0 is uniform sampling
+        :param beta: how much the importance weights correct for the prioritized sampling, 1 is fully
+        :param priority_epsilon: added to the loss so that every case can be sampled
+        :param deduplicate: if true, cases with the same network input are merged
+        """
+        self.max_size = max_size
+        self.cutoff_rate = cutoff_rate
+        self.inputs = np.zeros((max_size, input_size), dtype=np.float32)
+        self.targets = np.zeros((max_size, output_size), dtype=np.float32)
+        self.start = 0
+        self.size = 0
+        self.prioritized = prioritized
+        self.alpha = alpha
+        self.beta = beta
+        self.priority_epsilon = priority_epsilon
+        self.priorities = SumTree(max_size) if prioritized else None
+        self.max_priority = 1.0
+        self.deduplicate = deduplicate
+        # Key of the network input of each slot, the slot of each key, and the number of cases merged in each slot
+        self.keys = [None] * max_size
+        self.slot_of_key = {}
+        self.counts = np.zeros(max_size, dtype=np.int64)
+        self.cases_added = 0
+        self.cases_merged = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def get_slots(self, positions) -> np.ndarray:
+        """
+        :param positions: positions counted from the oldest case
+        :return: the indices of the cases in the arrays
+        """
+        return (self.start + np.asarray(positions)) % self.max_size
+
+    def add(self, network_input, distribution) -> None:
+        """
+        Adds a case, evicting one of the oldest cases if the buffer is full
+        :param network_input: the state in the network format
+        :param distribution: the target distribution
+        """
+        self.cases_added += 1
+        if self.deduplicate:
+            key = np.asarray(network_input, dtype=np.float32).tobytes()
+            if key in self.slot_of_key:
+                self.merge(self.slot_of_key[key], distribution)
+                return
+        if self.size == self.max_size:
+            # Position max_size would be the oldest case again, after the start moves
+            position = random.randint(
+                1, min(math.floor(self.max_size * self.cutoff_rate), self.max_size - 1)
+            )
+            self.move(0, position)
+            self.start = (self.start + 1) % self.max_size
+            self.size -= 1
+        slot = (self.start + self.size) % self.max_size
+        self.inputs[slot] = network_input
+        self.targets[slot] = distribution
+        if self.prioritized:
+            self.priorities.update(slot, self.max_priority)
+        if self.deduplicate:
+            self.keys[slot] = key
+            self.slot_of_key[key] = slot
+            self.counts[slot] = 1
+        self.size += 1
+
+    def merge(self, slot: int, distribution) -> None:
+        """
+        Updates the target of the case in the slot to the running average of the distributions added for it
+        """
+        self.counts[slot] += 1
+        self.targets[slot] += (
+            np.asarray(distribution, dtype=np.float32) - self.targets[slot]
+        ) / self.counts[slot]
+        self.cases_merged += 1
+        if self.prioritized:
+            # The target changed, so the loss of the case is not known
+            self.priorities.update(slot, self.max_priority)
+
+    def move(self, from_position: int, to_position: int) -> None:
+        from_slot = self.get_slots(from_position)
+        to_slot = self.get_slots(to_position)
+        self.inputs[to_slot] = self.inputs[from_slot]
+        self.targets[to_slot] = self.targets[from_slot]
+        if self.prioritized:
+            self.priorities.update(to_slot, self.priorities.get(from_slot))
+            self.priorities.update(from_slot, 0.0)
+        if self.deduplicate:
+            del self.slot_of_key[self.keys[to_slot]]
+            self.keys[to_slot] = self.keys[from_slot]
+            self.slot_of_key[self.keys[to_slot]] = to_slot
+            self.counts[to_slot] = self.counts[from_slot]
+
+    def get_cases(self, positions) -> (np.ndarray, np.ndarray):
+        """
+        :param positions: positions counted from the oldest case
+        :return: a tuple: (`inputs`, `targets`) of the cases
+        """
+        slots = self.get_slots(positions)
+        return self.inputs[slots], self.targets[slots]
+
+    def get_all_cases(self) -> (np.ndarray, np.ndarray):
+        """
+        :return: a tuple: (`inputs`, `targets`) of all the cases, from the oldest to the newest
+        """
+        return self.get_cases(np.arange(self.size))
+
+    def sample(self, batch_size: int) -> (np.ndarray, np.ndarray):
+        """
+        :return: a tuple: (`inputs`, `targets`) of batch_size random cases. If the buffer is smaller than the batch
+            size, all the cases are returned
+        """
+        if self.size < batch_size:
+            return self.get_all_cases()
+        return self.get_cases(random.sample(range(self.size), batch_size))
+
+    def sample_prioritized(
+        self, batch_size: int
+    ) -> (np.ndarray, np.ndarray, np.ndarray, np.ndarray):
+        """
+        :return: a tuple: (`inputs`, `targets`, `slots`, `importance weights`) of batch_size cases sampled by
+            priority, or as many as there are cases. The slots are given to update_priorities after training
+        """
+        slots = self.priorities.sample(min(batch_size, self.size))
+        probabilities = self.priorities.get(slots) / self.priorities.total()
+        weights = (self.size * probabilities) ** -self.beta
+        return (
+            self.inputs[slots],
+            self.targets[slots],
+            slots,
+            (weights / weights.max()).astype(np.float32),
+        )
+
+    def update_priorities(self, slots: np.ndarray, losses: np.ndarray) -> None:
+        """
+        :param slots: slots of sampled cases, from sample_prioritized
+        :param losses: the loss of the network on each of the cases
+        """
+        for slot, loss in zip(slots, losses):
+            priority = (float(loss) + self.priority_epsilon) ** self.alpha
+            self.priorities.update(slot, priority)
+            self.max_priority = max(self.max_priority, priority)
+
+    def get_deduplication_stats(self) -> dict:
+        return {
+            "size": self.size,
+            "added": self.cases_added,
+            "merged": self.cases_merged,
+            "dedup_ratio": self.cases_merged / self.cases_added
+            if self.cases_added
+            else 0.0,
+        }
@@ -0,0 +1,104 @@
+import numpy as np
+
+from hex.StateEncoder import StateEncoder
+
+
+class RolloutPolicy:
+    """
+    ROLLOUT POLICY
+    Small linear softmax policy on the same input format as the ANET, distilled from the ANET after each training
+    round. The MCTS uses it for the roll-outs while the ANET is kept for the training cases, so the cost of a
+    roll-out stays low as the ANET grows. With the initial zero weights it is a uniform random policy.
+    """
+
+    def __init__(self, size_of_board, learning_rate=0.5, epochs=30, batch_size=64):
+        """
+        :param size_of_board: number of rows/cols in the board
+        :param learning_rate: step size of the gradient descent in distill
+        :param epochs: number of passes over the cases in distill
+        :param batch_size: number of cases in each gradient step
+        """
+        self.size_of_board = size_of_board
+        self.learning_rate = learning_rate
+        self.epochs = epochs
+        self.batch_size = batch_size
+        input_size = StateEncoder.get_input_size(size_of_board)
+        self.weights = np.zeros((input_size, size_of_board ** 2), dtype=np.float32)
+        self.bias = np.zeros(size_of_board ** 2, dtype=np.float32)
+
+    @staticmethod
+    def get_open_cells_mask(x: np.ndarray) -> np.ndarray:
+        """
+        :param x: cases in the network format, np.array of shape (number of cases, input size)
+        :return: boolean np.array of shape (number of cases, board_size ** 2), true for open cells
+        """
+        return (x[:, 10::2] + x[:, 11::2]) == 0
+
+    def get_distributions(self, x: np.ndarray) -> np.ndarray:
+        """
+        :param x: cases in the network format, np.array of shape (number of cases, input size)
+        :return: distributions over the open cells of each case
+        """
+        logits = (x @ self.weights + self.bias).astype(np.float64)
+        logits = np.where(self.get_open_cells_mask(x), logits, -np.inf)
+        logits -= logits.max(axis=1, keepdims=True)
+        exponentials = np.exp(logits)
+        return exponentials / exponentials.sum(axis=1, keepdims=True)
+
+    def predict(self, state: str) -> np.array:
+        """
+        :param state: string representation of state
+        :return: distribution over the cells of the board, zero for taken cells
+        """
+        x = StateEncoder.convert_states_to_network_format([state])
+        return self.get_distributions(x)[0]
+
+    def predict_batch(self, states: [str]) -> np.ndarray:
+        """
+        :param states: list of string representations of states
+        :return: np.array with the distribution over the cells of each state, zero for taken cells
+        """
+        return self.get_distributions(
+            StateEncoder.convert_states_to_network_format(states)
+        )
+
+    def fit(self, x: np.ndarray, y: np.ndarray) -> float:
+        """
+        Minimizes the cross entropy between the policy and the target distributions with mini-batch gradient descent.
+        The targets are restricted to the open cells and normalized.
+        :param x: cases in the network format, np.array of shape (number of cases, input size)
+        :param y: target distributions, np.array of shape (number of cases, board_size ** 2)
+        :return: the cross entropy of the policy on the cases after fitting
+        """
+        x = np.asarray(x, dtype=np.float32)
+        open_cells = self.get_open_cells_mask(x)
+        y = np.where(open_cells, y, 0.0)
+        mass = y.sum(axis=1, keepdims=True)
+        uniform = open_cells / open_cells.sum(axis=1, keepdims=True)
+        y = np.where(mass > 0, y / np.maximum(mass, 1e-12), uniform).astype(np.float32)
+        for epoch in range(self.epochs):
+            order = np.random.permutation(len(x))
+            for start in range(0, len(x), self.batch_size):
+                batch = order[start : start + self.batch_size]
+                gradient = self.get_distributions(x[batch]) - y[batch]
+                self.weights -= (
+                    self.learning_rate * x[batch].T @ gradient / len(batch)
+                )
+                self.bias -= self.learning_rate * gradient.mean(axis=0)
+        distributions = self.get_distributions(x)
+        return float(
+            -np.mean(
+                np.sum(y * np.log(np.where(open_cells, distributions, 1.0)), axis=1)
+            )
+        )
+
+    def distill(self, actor_net) -> float:
+        """
+        Fits the policy to the predictions of the actor net on the states in its replay buffer
+        :param actor_net: the ANET to distill
+        :return: the cross entropy between the policy and the actor net after fitting
+        """
+        if not actor_net.replay_buffer:
+            return 0.0
+        x, y = actor_net.replay_buffer.get_all_cases()
+        return self.fit(x, np.array(actor_net.model(x)))
@@ -0,0 +1,131 @@
+import json
+import time
+from contextlib import contextmanager
+
+
+class SearchStatistics:
+    """
+    SEARCH STATISTICS
+    Counters and timers for the phases of the MCTS. The counters of a move are collected until end_move is called,
+    the move records of a game are aggregated by end_game.
+    Timed phases: traverse_tree (including expand), expand, simulate_random_step, simulate_actor_net_step,
+    simulate_leaf_parallel, backpropagate, cut_tree_with_new_root_node and set_state_manager (resetting to the root
+    after each simulation).
+    """
+
+    def __init__(self):
+        self.move_records = []
+        self.reset_move_counters()
+
+    def reset_move_counters(self) -> None:
+        self.times = {}
+        self.counts = {}
+        self.number_of_simulations = 0
+        self.max_depth = 0
+        self.rollout_lengths = []
+
+    @contextmanager
+    def measure(self, phase: str):
+        """
+        Times the code in the with block, adding the time and one call to the phase
+        :param phase: name of the phase
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start_time)
+
+    def add_time(self, phase: str, seconds: float) -> None:
+        self.times[phase] = self.times.get(phase, 0.0) + seconds
+        self.counts[phase] = self.counts.get(phase, 0) + 1
+
+    def record_simulation(self, depth: int, rollout_length: int) -> None:
+        """
+        :param depth: depth in the tree of the state the rollout started from
+        :param rollout_length: number of moves in the rollout
+        """
+        self.number_of_simulations += 1
+        self.max_depth = max(self.max_depth, depth)
+        self.rollout_lengths.append(rollout_length)
+
+    def end_move(self, tree_size: int) -> dict:
+        """
+        Stores the counters of the current move as a move record and resets them
+        :param tree_size: number of nodes in the tree after the move
+        :return: the move record
+        """
+        record = {
+            "simulations": self.number_of_simulations,
+            "times": self.times,
+            "counts": self.counts,
+            "tree_size": tree_size,
+            "max_depth": self.max_depth,
+            "average_rollout_length": (
+                sum(self.rollout_lengths) / len(self.rollout_lengths)
+                if self.rollout_lengths
+                else 0.0
+            ),
+            "max_rollout_length": max(self.rollout_lengths, default=0),
+        }
+        self.move_records.append(record)
+        self.reset_move_counters()
+        return record
+
+    def end_game(self) -> (dict, [dict]):
+        """
+        Aggregates the move records of the game and starts on a new game
+        :return: a tuple: (`game record`, `move records`)
+        """
+        move_records, self.move_records = self.move_records, []
+        times = {}
+        counts = {}
+        for record in move_records:
+            for phase, seconds in record["times"].items():
+                times[phase] = times.get(phase, 0.0) + seconds
+                counts[phase] = counts.get(phase, 0) + record["counts"][phase]
+        number_of_simulations = sum(record["simulations"] for record in move_records)
+        game_record = {
+            "moves": len(move_records),
+            "simulations": number_of_simulations,
+            "times": times,
+            "counts": counts,
+            "max_tree_size": max(
+                (record["tree_size"] for record in move_records), default=0
+            ),
+            "max_depth": max((record["max_depth"] for record in move_records), default=0),
+            "average_rollout_length": (
+                sum(
+                    record["average_rollout_length"] * record["simulations"]
+                    for record in move_records
+                )
+                / number_of_simulations
+                if number_of_simulations
+                else 0.0
+            ),
+            "max_rollout_length": max(
+                (record["max_rollout_length"] for record in move_records), default=0
+            ),
+        }
+        return game_record, move_records
+
+    def dump_game(self, path: str, game_number: int) -> dict:
+        """
+        Ends the game and appends its move records and the game record to a JSON lines file
+        :param path: path to the JSON lines file
+        :param game_number: number of the game, added to every line
+        :return: the game record
+        """
+        game_record, move_records = self.end_game()
+        with open(path, "a") as file:
+            for move_number, record in enumerate(move_records, start=1):
+                file.write(
+                    json.dumps(
+                        {"type": "move", "game": game_number, "move": move_number, **record}
+                    )
+                    + "\n"
+                )
+            file.write(
+                json.dumps({"type": "game", "game": game_number, **game_record}) + "\n"
+            )
+        return game_record
@@ -0,0 +1,244 @@
+import math
+import os
+import random
+import numpy as np
+
+from hex.MCTS import MCTS
+from hex.NumpyANET import NumpyANET
+from hex.SimulationBudget import SimulationBudget
+from hex.StateManager import StateManager
+
+
+"""
+SELF PLAY WORKERS. Games played in other processes than the training, with NumPy copies of the actor net, so that
+nothing here imports TensorFlow, and games played in steps to advance many of them together.
+"""
+
+
+class CaseCollector:
+    """
+    Training cases added by the searches through add_case, kept to be sent to the learner. Used by the actor nets
+    of searches in other processes than the training.
+    """
+
+    def __init__(self):
+        self.cases = []
+
+    def add_case(self, state: str, distribution) -> None:
+        self.cases.append((state, np.array(distribution)))
+
+    def take_cases(self) -> [tuple]:
+        """
+        :return: the cases added since the last call, as (`state`, `distribution`) tuples
+        """
+        cases, self.cases = self.cases, []
+        return cases
+
+
+class SelfPlayActorNet(CaseCollector):
+    """
+    Actor net of a self play worker: the predictions of the weights published by the learner, loaded again when a
+    new version is published, and the training cases of the searches kept to be sent to the learner
+    """
+
+    def __init__(self, weights_path: str, published_version=None):
+        """
+        :param weights_path: path of the weights published by the learner, see publish_weights
+        :param published_version: shared multiprocessing.Value with the version of the published weights. If not
+            given, the weights are loaded once
+        """
+        super().__init__()
+        self.weights_path = weights_path
+        self.published_version = published_version
+        self.numpy_actor_net = None
+        self.weights_version = None
+        self.load_published_weights()
+
+    def load_published_weights(self) -> bool:
+        """
+        :return: true if new weights were loaded
+        """
+        # The version is read before the weights, so weights published while loading are loaded the next time
+        version = (
+            self.published_version.value if self.published_version is not None else 0
+        )
+        if version == self.weights_version:
+            return False
+        self.numpy_actor_net = NumpyANET.load(self.weights_path)
+        self.weights_version = version
+        return True
+
+    def predict(self, state: str) -> np.ndarray:
+        return self.numpy_actor_net.predict(state)
+
+    def predict_batch(self, states: [str]) -> np.ndarray:
+        return self.numpy_actor_net.predict_batch(states)
+
+
+def publish_weights(
+    numpy_actor_net: NumpyANET, weights_path: str, published_version=None
+) -> None:
+    """
+    Saves the weights for the workers. The file is replaced in one step, so a worker never reads a partial file.
+    :param published_version: if given, shared multiprocessing.Value with the version of the published weights,
+        increased after the file is replaced
+    """
+    temporary_path = weights_path[: -len(".npz")] + "_publishing.npz"
+    numpy_actor_net.save(temporary_path)
+    os.replace(temporary_path, weights_path)
+    if published_version is not None:
+        with published_version.get_lock():
+            published_version.value += 1
+
+
+def play_game(
+    game_number: int,
+    number_of_games: int,
+    board_size: int,
+    starting_player: int,
+    actor_net,
+    mcts_parameters: dict,
+    simulation_budget=None,
+    rollout_net=None,
+) -> int:
+    """
+    Plays a self play game as GameSimulator.run does
+    :param game_number: number of the game, from 1, deciding the random simulation rate and the greediness
+    :param number_of_games: number of games in the run
+    :param rollout_net: if given, the policy of the roll-outs instead of the actor net
+    :return: the winning player
+    """
+    return MCTS.answer_predictions(
+        play_game_steps(
+            game_number,
+            number_of_games,
+            board_size,
+            starting_player,
+            actor_net,
+            mcts_parameters,
+            simulation_budget,
+            rollout_net,
+        ),
+        actor_net if rollout_net is None else rollout_net,
+    )
+
+
+def play_game_steps(
+    game_number: int,
+    number_of_games: int,
+    board_size: int,
+    starting_player: int,
+    actor_net,
+    mcts_parameters: dict,
+    simulation_budget=None,
+    rollout_net=None,
+):
+    """
+    Generator version of play_game: yields the states the roll-outs need the predictions of, see MCTS.run_steps
+    :return: the winning player, as the value of the StopIteration
+    """
+    state_manager = StateManager(board_size, starting_player)
+    mcts = MCTS(
+        state_manager,
+        actor_net,
+        random_simulation_rate=math.tanh(game_number / number_of_games) * 1.2,
+        simulation_budget=simulation_budget,
+        rollout_net=rollout_net,
+        **mcts_parameters,
+    )
+    if simulation_budget:
+        simulation_budget.start_game()
+    while not state_manager.is_end_state():
+        action = yield from mcts.run_steps(
+            state_manager.get_state(), game_number / number_of_games
+        )
+        state_manager.perform_action(action)
+    if simulation_budget:
+        simulation_budget.end_game()
+    return StateManager.get_opposite_player(state_manager.current_player())
+
+
+def play_pool_game(
+    weights_path: str,
+    game_number: int,
+    number_of_games: int,
+    board_size: int,
+    starting_player: int,
+    mcts_parameters: dict,
+    simulation_budget_parameters,
+    seed: int,
+) -> (int, int, int, [tuple]):
+    """
+    Plays one game with the published weights, as a task of a process pool
+    :param simulation_budget_parameters: if given, the parameters of a SimulationBudget for the game
+    :param seed: seed of the random generators for the game
+    :return: a tuple: (`game_number`, `starting_player`, `winner`, `cases`)
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    actor_net = SelfPlayActorNet(weights_path)
+    winner = play_game(
+        game_number,
+        number_of_games,
+        board_size,
+        starting_player,
+        actor_net,
+        mcts_parameters,
+        SimulationBudget(**simulation_budget_parameters)
+        if simulation_budget_parameters
+        else None,
+    )
+    return game_number, starting_player, winner, actor_net.take_cases()
+
+
+def run_self_play_worker(
+    weights_path: str,
+    published_version,
+    game_counter,
+    starting_players: [int],
+    board_size: int,
+    mcts_parameters: dict,
+    simulation_budget_parameters,
+    results,
+    seed: int,
+) -> None:
+    """
+    Plays games until all the games of the run are taken, with the latest published weights at the start of each
+    game. Meant as the target of a process.
+    :param weights_path: path of the weights published by the learner, see publish_weights
+    :param published_version: shared multiprocessing.Value with the version of the published weights
+    :param game_counter: shared multiprocessing.Value with the number of games taken by the workers
+    :param starting_players: the starting player of each game of the run
+    :param simulation_budget_parameters: if given, the parameters of a SimulationBudget for each game
+    :param results: queue getting a (`game_number`, `starting_player`, `winner`, `cases`) tuple for each game, and
+        None when the worker is done
+    :param seed: seed of the random generators of the worker
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    actor_net = SelfPlayActorNet(weights_path, published_version)
+    simulation_budget = (
+        SimulationBudget(**simulation_budget_parameters)
+        if simulation_budget_parameters
+        else None
+    )
+    number_of_games = len(starting_players)
+    while True:
+        with game_counter.get_lock():
+            game_counter.value += 1
+            game_number = game_counter.value
+        if game_number > number_of_games:
+            break
+        actor_net.load_published_weights()
+        starting_player = starting_players[game_number - 1]
+        winner = play_game(
+            game_number,
+            number_of_games,
+            board_size,
+            starting_player,
+            actor_net,
+            mcts_parameters,
+            simulation_budget,
+        )
+        results.put((game_number, starting_player, winner, actor_net.take_cases()))
+    results.put(None)
@@ -0,0 +1,144 @@
+import json
+import math
+import numpy as np
+
+from hex.StateManager import StateManager
+
+
+class SimulationBudget:
+    """
+    SIMULATION BUDGET
+    Spreads a total number of simulations over the moves of a game. Every move gets an allowance from the remaining
+    budget, and the search stops early once the visit distribution of the root has converged: when the most visited
+    move can no longer be overtaken, or when the distribution is both sharp (low entropy) and has a clear leader.
+    Simulations not used are left for the later moves, and with carry_over also for the next games of a batch.
+    """
+
+    def __init__(
+        self,
+        simulations_per_game: int,
+        min_simulations=10,
+        batch_size=10,
+        max_share_factor=3.0,
+        entropy_threshold=0.5,
+        margin_threshold=0.3,
+        carry_over=False,
+        log_path=None,
+    ):
+        """
+        :param simulations_per_game: total number of simulations for a game
+        :param min_simulations: number of simulations before the search may stop early
+        :param batch_size: number of simulations between each convergence check
+        :param max_share_factor: a move gets at most this many times its fair share of the remaining budget
+        :param entropy_threshold: the root distribution is sharp when its entropy, normalized by the entropy of a
+            uniform distribution over the open cells, is below this threshold
+        :param margin_threshold: the root distribution has a clear leader when the difference between the shares
+            of visits of the two most visited moves is above this threshold
+        :param carry_over: if true, simulations not used in a game are added to the budget of the next game
+        :param log_path: if given, the move records of each game are appended to this JSON lines file
+        """
+        self.simulations_per_game = simulations_per_game
+        self.min_simulations = min_simulations
+        self.batch_size = batch_size
+        self.max_share_factor = max_share_factor
+        self.entropy_threshold = entropy_threshold
+        self.margin_threshold = margin_threshold
+        self.carry_over = carry_over
+        self.log_path = log_path
+        self.remaining_simulations = 0
+        self.number_of_games = 0
+        self.move_records = []
+
+    def start_game(self) -> None:
+        if self.carry_over:
+            self.remaining_simulations += self.simulations_per_game
+        else:
+            self.remaining_simulations = self.simulations_per_game
+        self.move_records = []
+
+    def allocate(self, state: str) -> int:
+        """
+        :param state: root state of the search
+        :return: the maximum number of simulations for the search from the state
+        """
+        open_cells = len(StateManager.get_open_cell_indices(state))
+        if open_cells == 1:
+            # Forced move: one simulation to get a distribution
+            return 1
+        # Fair share if the remaining budget is spread over the remaining moves, about half of the open cells
+        expected_remaining_moves = max(math.ceil(open_cells / 2), 1)
+        fair_share = self.remaining_simulations / expected_remaining_moves
+        allowance = min(
+            int(fair_share * self.max_share_factor), self.remaining_simulations
+        )
+        return max(allowance, 1)
+
+    def has_converged(
+        self, visit_counts: np.ndarray, simulations_left: int, number_of_moves: int
+    ) -> str:
+        """
+        :param visit_counts: visits for each cell from the root state
+        :param simulations_left: number of simulations left of the allowance for the move
+        :param number_of_moves: number of legal moves from the root state
+        :return: the reason the search can stop, an empty string if it should continue
+        """
+        total_visits = visit_counts.sum()
+        if total_visits < self.min_simulations:
+            return ""
+        top_two = np.sort(visit_counts)[-2:]
+        if top_two[1] - top_two[0] > simulations_left:
+            return "decided"
+        distribution = visit_counts[visit_counts > 0] / total_visits
+        entropy = -np.sum(distribution * np.log(distribution)) / math.log(
+            max(number_of_moves, 2)
+        )
+        margin = (top_two[1] - top_two[0]) / total_visits
+        if entropy < self.entropy_threshold and margin > self.margin_threshold:
+            return "converged"
+        return ""
+
+    def spend(
+        self, state: str, allowance: int, number_of_simulations: int, reason: str
+    ) -> None:
+        """
+        Subtracts the simulations of a search from the budget and records how they were spent
+        :param state: root state of the search
+        :param allowance: the allowance of the search
+        :param number_of_simulations: number of simulations done
+        :param reason: why the search stopped
+        """
+        self.remaining_simulations = max(
+            self.remaining_simulations - number_of_simulations, 0
+        )
+        self.move_records.append(
+            {
+                "open_cells": len(StateManager.get_open_cell_indices(state)),
+                "allowance": allowance,
+                "simulations": number_of_simulations,
+                "stopped": reason if reason else "allowance",
+            }
+        )
+
+    def end_game(self) -> dict:
+        """
+        Summarizes the game, appending the move records to the log file if there is one
+        :return: summary of how the budget of the game was spent
+        """
+        self.number_of_games += 1
+        simulations = [record["simulations"] for record in self.move_records]
+        summary = {
+            "game": self.number_of_games,
+            "moves": len(self.move_records),
+            "simulations": sum(simulations),
+            "max_simulations_per_move": max(simulations, default=0),
+            "stopped_early": sum(
+                record["stopped"] != "allowance" for record in self.move_records
+            ),
+            "remaining_simulations": self.remaining_simulations,
+        }
+        if self.log_path:
+            with open(self.log_path, "a") as file:
+                file.write(
+                    json.dumps({**summary, "move_records": self.move_records}) + "\n"
+                )
+        return summary
@@ -0,0 +1,173 @@
+import math
+import numpy as np
+from functools import lru_cache
+
+from hex.StateManager import StateManager
+
+
+class StateEncoder:
+    """
+    STATE ENCODER
+    Input format of the networks and masking of their output, shared by the ANET and the NumPy inference classes.
+    Nothing here depends on TensorFlow, so inference only processes can use it without importing it.
+    The input starts with five bits for player 1 and five bits for player 2 being the current player, followed by
+    two bits for each cell: `1 0` for a piece of player 1, `0 1` for a piece of player 2 and `0 0` for an open cell.
+    """
+
+    PLAYER_BITS = 10
+    # Bits for each byte of the state string: the cells and the player, looked up with np.frombuffer on the bytes
+    CELL_BITS_TABLE = np.zeros((256, 2), dtype=np.float32)
+    CELL_BITS_TABLE[ord("1")] = [1, 0]
+    CELL_BITS_TABLE[ord("2")] = [0, 1]
+    PLAYER_BITS_TABLE = np.zeros((256, PLAYER_BITS), dtype=np.float32)
+    PLAYER_BITS_TABLE[ord("1"), :5] = 1
+    PLAYER_BITS_TABLE[ord("2"), 5:] = 1
+
+    @staticmethod
+    def get_input_size(board_size: int) -> int:
+        return (board_size ** 2) * 2 + StateEncoder.PLAYER_BITS
+
+    @staticmethod
+    def infer_board_size(input_size: int) -> int:
+        return int(math.sqrt((input_size - StateEncoder.PLAYER_BITS) / 2))
+
+    @staticmethod
+    def convert_state_to_network_format(state: str) -> [int]:
+        board_str, player_str = StateManager.extract_state(state)
+        board_nn_representation = [int(player_str == "1")] * 5 + [
+            int(player_str == "2")
+        ] * 5
+        for cell_value in board_str:
+            board_nn_representation.append(int(cell_value == "1"))
+            board_nn_representation.append(int(cell_value == "2"))
+        return board_nn_representation
+
+    @staticmethod
+    def convert_states_to_network_format(states: [str], out=None) -> np.ndarray:
+        """
+        Vectorized version of convert_state_to_network_format: the bytes of all the states are looked up in the bit
+        tables in one pass. The states must have the same board size.
+        :param states: list of string representations of states
+        :param out: optional preallocated float32 array of shape (number of states, input size) to write to
+        :return: np.array of shape (number of states, input size) with the network format of each state
+        """
+        if len(states) == 0:
+            return np.empty((0, 0), dtype=np.float32) if out is None else out
+        state_length = len(states[0])
+        state_bytes = np.frombuffer("".join(states).encode(), dtype=np.uint8).reshape(
+            len(states), state_length
+        )
+        number_of_cells = state_length - 2
+        if out is None:
+            out = np.empty(
+                (len(states), StateEncoder.PLAYER_BITS + 2 * number_of_cells),
+                dtype=np.float32,
+            )
+        out[:, : StateEncoder.PLAYER_BITS] = np.take(
+            StateEncoder.PLAYER_BITS_TABLE, state_bytes[:, -1], axis=0
+        )
+        out[:, StateEncoder.PLAYER_BITS :] = np.take(
+            StateEncoder.CELL_BITS_TABLE, state_bytes[:, :number_of_cells], axis=0
+        ).reshape(len(states), 2 * number_of_cells)
+        return out
+
+    @staticmethod
+    def mask_and_normalize(distribution, state: str) -> np.ndarray:
+        """
+        Filters out the taken cells of the board from the output of a network. If the network gives no mass to any
+        open cell, the distribution is uniform over the open cells.
+        :param distribution: output of the network for the state
+        :param state: string representation of state
+        :return: the distribution over the open cells, normalized
+        """
+        open_cells = np.frombuffer(state[:-2].encode(), dtype=np.uint8) == ord("0")
+        masked_distribution = np.asarray(distribution, dtype=np.float64) * open_cells
+        mass = masked_distribution.sum()
+        if not mass > 0 or not np.isfinite(mass):
+            return open_cells / open_cells.sum()
+        return masked_distribution / mass
+
+    @staticmethod
+    def mask_and_normalize_batch(distributions, states: [str]) -> np.ndarray:
+        """
+        Filters out the taken cells of the boards from the outputs of a network for many states at once.
+        A state where the network gives no mass to any open cell gets a uniform distribution over its open cells.
+        :param distributions: outputs of the network, of shape (number of states, board_size ** 2)
+        :param states: list of string representations of the states
+        :return: np.array with the distribution over the open cells of each state, normalized
+        """
+        boards = "".join([StateManager.extract_state(state)[0] for state in states])
+        open_cells = (np.frombuffer(boards.encode(), dtype=np.uint8) == ord("0")).reshape(
+            len(states), -1
+        )
+        masked_distributions = np.asarray(distributions, dtype=np.float64) * open_cells
+        mass = masked_distributions.sum(axis=1, keepdims=True)
+        no_mass = (mass[:, 0] <= 0) | ~np.isfinite(mass[:, 0])
+        if no_mass.any():
+            masked_distributions[no_mass] = open_cells[no_mass]
+            mass[no_mass] = open_cells[no_mass].sum(axis=1, keepdims=True)
+        return masked_distributions / mass
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_symmetry_permutations(board_size: int) -> (np.ndarray, np.ndarray):
+        """
+        Index arrays of the four symmetric cases of a state, one for each of the StateManager.SYMMETRY_TRANSFORMS.
+        The transforms that transpose the board swap the colors and the current player as well.
+        Case c of an encoded state x is x[input_permutations[c]], and of a distribution d is
+        d[distribution_permutations[c]].
+        :return: a tuple: (`input_permutations`, `distribution_permutations`) of shapes (4, input size) and
+            (4, board_size ** 2)
+        """
+        distribution_permutations = np.array(
+            [
+                StateManager.get_symmetry_permutation(board_size, transform)
+                for transform in StateManager.SYMMETRY_TRANSFORMS
+            ]
+        )
+        players = np.arange(StateEncoder.PLAYER_BITS)
+        swapped_players = np.roll(players, StateEncoder.PLAYER_BITS // 2)
+        input_permutations = []
+        for transform, cell_permutation in zip(
+            StateManager.SYMMETRY_TRANSFORMS, distribution_permutations
+        ):
+            swap_colors = StateManager.transform_swaps_colors(transform)
+            cell_bits = 2 * cell_permutation[:, None] + (
+                [1, 0] if swap_colors else [0, 1]
+            )
+            input_permutations.append(
+                np.concatenate(
+                    [
+                        swapped_players if swap_colors else players,
+                        StateEncoder.PLAYER_BITS + cell_bits.ravel(),
+                    ]
+                )
+            )
+        input_permutations = np.array(input_permutations)
+        input_permutations.flags.writeable = False
+        distribution_permutations.flags.writeable = False
+        return input_permutations, distribution_permutations
+
+    @staticmethod
+    def generate_symmetric_cases(
+        network_inputs: np.ndarray, distributions: np.ndarray
+    ) -> (np.ndarray, np.ndarray):
+        """
+        The four symmetric cases of each training case, see get_symmetry_permutations
+        :param network_inputs: np.array of encoded states, of shape (number of cases, input size)
+        :param distributions: np.array of target distributions, of shape (number of cases, board_size ** 2)
+        :return: a tuple: (`network_inputs`, `distributions`) with the four cases of each case after each other
+        """
+        network_inputs = np.asarray(network_inputs)
+        distributions = np.asarray(distributions)
+        board_size = StateEncoder.infer_board_size(network_inputs.shape[1])
+        (
+            input_permutations,
+            distribution_permutations,
+        ) = StateEncoder.get_symmetry_permutations(board_size)
+        return (
+            network_inputs[:, input_permutations].reshape(-1, network_inputs.shape[1]),
+            distributions[:, distribution_permutations].reshape(
+                -1, distributions.shape[1]
+            ),
+        )
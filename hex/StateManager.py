@@ -1,6 +1,7 @@
 import networkx as nx
 import math
 import numpy as np
+from functools import lru_cache
 
 from libs.board import Board
 from libs.helpers import board_visualize_in_console
@@ -13,6 +14,26 @@ class StateManager(Board):
     All communication with the outside is done with string representations ´board_string:current_player´ ex: 0201:2
     """
 
+    # Symmetries of the hex board. Mirroring in the main diagonal turns rows into columns, so the colors of the
+    # players are swapped as well. Every transform is its own inverse.
+    IDENTITY = 0
+    ROTATE_180 = 1
+    TRANSPOSE_SWAP_COLORS = 2
+    ANTI_TRANSPOSE_SWAP_COLORS = 3
+    SYMMETRY_TRANSFORMS = (
+        IDENTITY,
+        ROTATE_180,
+        TRANSPOSE_SWAP_COLORS,
+        ANTI_TRANSPOSE_SWAP_COLORS,
+    )
+    SWAP_COLORS_TABLE = str.maketrans("12", "21")
+
+    # Values used for neighbor positions outside the board in the dead cell patterns. Off board positions beyond
+    # a row edge belong to player 1, beyond a column edge to player 2, and beyond a corner to neither of them.
+    PLAYER1_EDGE = -1
+    PLAYER2_EDGE = -2
+    CORNER = -3
+
     def __init__(self, board_size: int, starting_player: int) -> None:
         """
         Constructor of StateManager. Inherits from the Board class.
@@ -242,6 +263,40 @@ class StateManager(Board):
                 )
         return children
 
+    @staticmethod
+    def get_number_of_pieces(state: str) -> int:
+        """
+        :param state: string representing state of game
+        :return: number of pieces on the board
+        """
+        board, player = StateManager.extract_state(state)
+        return len(board) - board.count("0")
+
+    @staticmethod
+    def get_open_cell_indices(state: str, excluded_indices=()) -> [int]:
+        """
+        :param state: string representing state of game
+        :param excluded_indices: flattened board indices to leave out
+        :return: flattened board indices of the open cells, in the same order as generate_child_states
+        """
+        board, player = StateManager.extract_state(state)
+        return [
+            index
+            for index, cell_value in enumerate(board)
+            if cell_value == "0" and index not in excluded_indices
+        ]
+
+    @staticmethod
+    def get_child_state(state: str, index: int) -> str:
+        """
+        :param state: string representing state of game
+        :param index: flattened board index of an open cell
+        :return: the child state after the current player places a piece in the cell
+        """
+        board, player = StateManager.extract_state(state)
+        next_player = StateManager.get_opposite_player(int(player))
+        return f"{board[:index]}{player}{board[index+1:]}:{next_player}"
+
     def get_player_sides(self, player: int) -> ([str], [str]):
         """
         Returns the player nodes (action strings) at each end of the board where the players have to connect a path.
@@ -373,6 +428,199 @@ class StateManager(Board):
         """
         return state[index] == "1" or state[index] == "2"
 
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_symmetry_permutation(board_size: int, transform: int) -> np.ndarray:
+        """
+        Index permutation of a symmetry transform, precomputed per board size.
+        The transformed board is `board[permutation]`, and since every transform is its own inverse,
+        `permutation[index]` is also where the cell at index ends up.
+        :param board_size: number of rows/cols in the board
+        :param transform: one of the SYMMETRY_TRANSFORMS
+        :return: np.array of flattened board indices
+        """
+        indices = np.arange(board_size ** 2)
+        transposed_indices = indices.reshape(board_size, board_size).T.flatten()
+        permutation = {
+            StateManager.IDENTITY: indices,
+            StateManager.ROTATE_180: indices[::-1],
+            StateManager.TRANSPOSE_SWAP_COLORS: transposed_indices,
+            StateManager.ANTI_TRANSPOSE_SWAP_COLORS: transposed_indices[::-1],
+        }.get(transform)
+        if permutation is None:
+            raise ValueError(f"Unknown symmetry transform: {transform}")
+        permutation.flags.writeable = False
+        return permutation
+
+    @staticmethod
+    def transform_swaps_colors(transform: int) -> bool:
+        return transform in (
+            StateManager.TRANSPOSE_SWAP_COLORS,
+            StateManager.ANTI_TRANSPOSE_SWAP_COLORS,
+        )
+
+    @staticmethod
+    def transform_state(state: str, transform: int) -> str:
+        """
+        Applies a symmetry transform to the input state
+        :param state: string representation of state
+        :param transform: one of the SYMMETRY_TRANSFORMS
+        :return: the transformed state
+        """
+        board, player = StateManager.extract_state(state)
+        board_size = int(math.sqrt(len(board)))
+        permutation = StateManager.get_symmetry_permutation(board_size, transform)
+        transformed_board = "".join([board[index] for index in permutation])
+        if StateManager.transform_swaps_colors(transform):
+            return f"{transformed_board}:{player}".translate(
+                StateManager.SWAP_COLORS_TABLE
+            )
+        return f"{transformed_board}:{player}"
+
+    @staticmethod
+    def transform_index(index: int, transform: int, board_size: int) -> int:
+        """
+        :return: the flattened board index the input index is moved to by the transform
+        """
+        return int(StateManager.get_symmetry_permutation(board_size, transform)[index])
+
+    @staticmethod
+    def transform_distribution(distribution, transform: int) -> np.ndarray:
+        """
+        Moves the values of a distribution over the board cells along with the cells of a symmetry transform
+        :param distribution: array like with one value for each cell of the board
+        :param transform: one of the SYMMETRY_TRANSFORMS
+        :return: transformed distribution as np.array
+        """
+        distribution = np.asarray(distribution)
+        board_size = int(math.sqrt(len(distribution)))
+        return distribution[StateManager.get_symmetry_permutation(board_size, transform)]
+
+    @staticmethod
+    def canonicalize(state: str) -> (str, int):
+        """
+        Maps the input state to the representative of its symmetry class, the lexicographically smallest image.
+        Results for the canonical state are mapped back with the returned transform, as it is its own inverse.
+        :param state: string representation of state
+        :return: a tuple: (`canonical state`, `transform used to get it`)
+        """
+        return min(
+            (StateManager.transform_state(state, transform), transform)
+            for transform in StateManager.SYMMETRY_TRANSFORMS
+        )
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_circular_neighbors(board_size: int) -> np.ndarray:
+        """
+        Precomputes the six neighbors of every cell for the dead cell patterns, in circular order so that
+        consecutive neighbors are adjacent to each other. Positions outside the board are given as
+        PLAYER1_EDGE, PLAYER2_EDGE or CORNER.
+        :param board_size: number of rows/cols in the board
+        :return: np.array of shape (board_size ** 2, 6)
+        """
+        neighbors = np.zeros((board_size ** 2, 6), dtype=int)
+        for index in range(board_size ** 2):
+            r, c = index // board_size, index % board_size
+            positions = [
+                (r - 1, c),
+                (r - 1, c + 1),
+                (r, c + 1),
+                (r + 1, c),
+                (r + 1, c - 1),
+                (r, c - 1),
+            ]
+            for i, (row, col) in enumerate(positions):
+                row_inside = 0 <= row < board_size
+                col_inside = 0 <= col < board_size
+                if row_inside and col_inside:
+                    neighbors[index, i] = row * board_size + col
+                elif col_inside:
+                    neighbors[index, i] = StateManager.PLAYER1_EDGE
+                elif row_inside:
+                    neighbors[index, i] = StateManager.PLAYER2_EDGE
+                else:
+                    neighbors[index, i] = StateManager.CORNER
+        neighbors.flags.writeable = False
+        return neighbors
+
+    @staticmethod
+    def get_dead_cells(state: str) -> [int]:
+        """
+        Finds open cells whose color can not change the outcome of the game, using local patterns on the six
+        neighbors of the cell (the edges count as pieces of the player they belong to):
+            - four consecutive neighbors of the same player: they are already connected, and the two other
+              neighbors are adjacent to that group and to each other, so a piece in the cell connects nothing new
+            - all six neighbors are taken, by one arc of each player: a piece of either player only touches
+              pieces that are already connected
+        A piece in a dead cell is a wasted move, so dead cells never have to be played.
+        :param state: string representation of state
+        :return: list of flattened board indices of the dead cells
+        """
+        board, player = StateManager.extract_state(state)
+        board_size = int(math.sqrt(len(board)))
+        if board_size < 2:
+            return []
+        edge_colors = {
+            StateManager.PLAYER1_EDGE: "1",
+            StateManager.PLAYER2_EDGE: "2",
+            StateManager.CORNER: "x",
+        }
+        dead_cells = []
+        for index, neighbors in enumerate(
+            StateManager.get_circular_neighbors(board_size)
+        ):
+            if board[index] != "0":
+                continue
+            colors = "".join(
+                [
+                    board[neighbor] if neighbor >= 0 else edge_colors[neighbor]
+                    for neighbor in neighbors
+                ]
+            )
+            if StateManager.is_dead_cell_pattern(colors):
+                dead_cells.append(index)
+        return dead_cells
+
+    @staticmethod
+    def is_dead_cell_pattern(colors: str) -> bool:
+        """
+        :param colors: colors of the six neighbors in circular order, `1`, `2`, `0` for open and `x` for unknown
+        :return: true if the neighbors make the cell dead
+        """
+        doubled_colors = colors + colors
+        if "1111" in doubled_colors or "2222" in doubled_colors:
+            return True
+        if "0" in colors or "x" in colors:
+            return False
+        # Number of color changes around the cell: two means one arc of each color
+        return sum(colors[i] != colors[i - 1] for i in range(6)) <= 2
+
+    @staticmethod
+    def has_player_one_path(boards: np.ndarray) -> np.ndarray:
+        """
+        Checks many boards at once with a vectorized flood fill from the first row through the pieces of player 1,
+        spreading to the six neighbors of the reached cells until nothing changes.
+        A full board always has exactly one winner, so for full boards this also decides if player 2 won.
+        :param boards: np.array of shape (number of boards, board_size, board_size) with 1 for pieces of player 1
+        :return: boolean np.array with one value per board, true if player 1 has a path from the first to the last row
+        """
+        pieces = boards == 1
+        reached = np.zeros_like(pieces)
+        reached[:, 0, :] = pieces[:, 0, :]
+        while True:
+            spread = reached.copy()
+            spread[:, 1:, :] |= reached[:, :-1, :]
+            spread[:, 1:, :-1] |= reached[:, :-1, 1:]
+            spread[:, :, 1:] |= reached[:, :, :-1]
+            spread[:, :, :-1] |= reached[:, :, 1:]
+            spread[:, :-1, 1:] |= reached[:, 1:, :-1]
+            spread[:, :-1, :] |= reached[:, 1:, :]
+            spread &= pieces
+            if np.array_equal(spread, reached):
+                return reached[:, -1, :].any(axis=1)
+            reached = spread
+
     def visualize_state(self, state=None):
         """
         Use the GameVisualizer to view the input game state
@@ -0,0 +1,58 @@
+import numpy as np
+
+
+class SumTree:
+    """
+    SUM TREE
+    Binary tree in an array where every node holds the sum of the priorities of the leaves below it, for sampling
+    leaves with probability proportional to their priority and updating a priority in O(log n).
+    The root is at index 1, the children of node i at 2i and 2i + 1, and the leaf of item i at number_of_leaves + i,
+    where the number of leaves is the capacity rounded up to a power of two so that the leaves are in item order.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.number_of_leaves = 1 << max(capacity - 1, 0).bit_length()
+        self.tree = np.zeros(2 * self.number_of_leaves, dtype=np.float64)
+
+    def total(self) -> float:
+        return self.tree[1]
+
+    def get(self, indices) -> np.ndarray:
+        return self.tree[self.number_of_leaves + np.asarray(indices)]
+
+    def update(self, index: int, priority: float) -> None:
+        node = self.number_of_leaves + index
+        change = priority - self.tree[node]
+        while node >= 1:
+            self.tree[node] += change
+            node //= 2
+
+    def find(self, values: np.ndarray) -> np.ndarray:
+        """
+        Descends from the root for all the values at once
+        :param values: np.array of values in [0, total)
+        :return: the item of each value, the item whose leaf covers it in the cumulative sum of the priorities
+        """
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=int)
+        internal = nodes < self.number_of_leaves
+        while internal.any():
+            left = 2 * nodes[internal]
+            # Rounding errors must not lead to a subtree without priority
+            go_right = (values[internal] >= self.tree[left]) & (self.tree[left + 1] > 0)
+            values[internal] -= np.where(go_right, self.tree[left], 0.0)
+            nodes[internal] = left + go_right
+            internal = nodes < self.number_of_leaves
+        return nodes - self.number_of_leaves
+
+    def sample(self, number_of_items: int) -> np.ndarray:
+        """
+        Stratified sampling: one item from each of number_of_items equal parts of the total priority
+        :return: np.array with the sampled items
+        """
+        segment = self.total() / number_of_items
+        values = (
+            np.arange(number_of_items) + np.random.random(number_of_items)
+        ) * segment
+        return self.find(np.minimum(values, np.nextafter(self.total(), 0)))
@@ -1,16 +1,24 @@
 import numpy as np
 from hex.StateManager import StateManager
-from hex.ANET import ANET
+from hex.NumpyANET import NumpyANET
 from prettytable import PrettyTable
 import matplotlib.pyplot as plt
 
 
 class TOPP:
-    def __init__(self, path: str, verbose=False):
+    def __init__(self, path: str, verbose=False, use_numpy_models=False):
+        """
+        :param path: directory of the trained models
+        :param use_numpy_models: if true, the .npz exports of the models are played with NumpyANET, and TensorFlow
+            is not imported
+        """
+        if use_numpy_models:
+            self.models = NumpyANET.load_models(path)
+        else:
+            from hex.ANET import ANET
 
-        self.models = ANET.load_models(path)
-        self.state_manager = None
-        self.board_size = ANET.infer_board_size_from_model(self.models[0].model)
+            self.models = ANET.load_models(path)
+        self.board_size = self.models[0].size_of_board
         self.verbose = verbose
 
     def play(self, num_games_per_match):
@@ -36,7 +44,8 @@ class TOPP:
     def play_match(self, num_games_per_match, player1, player2):
         """
         Runs num_games_per_match games between player1 and player2 where the greedy action is chosen.
-        Players start every other game.
+        Players start every other game. The games are played in lockstep: in every round, the states of all the
+        games where one of the models is to move are predicted with one predict_batch call.
         :param num_games_per_match: number of games to be played between two models
         :param player1: Keras NN trained on x number of episodes
         :param player2: Keras NN trained on y number of episodes
@@ -44,44 +53,53 @@ class TOPP:
         """
         wins_p1 = 0
         wins_p2 = 0
-        starting_player = 1
-        for i in range(0, num_games_per_match):
-            self.state_manager = StateManager(
-                board_size=self.board_size, starting_player=starting_player
-            )
-            while not self.state_manager.is_end_state():
-                current_player = self.state_manager.current_player()
-                model = player1 if current_player == 1 else player2
-                state = self.state_manager.get_state()
-                if self.verbose:
-                    print(self.state_manager.pretty_state_string())
-                distribution = model.predict(state)
-                if self.verbose:
-                    for k in range(0, self.board_size):
-                        print(
-                            [
-                                distribution[j]
-                                for j in range(
-                                    self.board_size * k,
-                                    self.board_size * k + self.board_size,
-                                )
-                            ]
-                        )
-                argmax_distribution_index = int(
-                    np.argmax(distribution)
-                )  # Greedy best from distribution
-                action = self.state_manager.get_action_from_flattened_board_index(
-                    argmax_distribution_index, state
-                )
-                self.state_manager.perform_action(action)
-            if current_player == 1:
-                wins_p1 += 1
-            else:
-                wins_p2 += 1
-            starting_player = 1 if starting_player == 2 else 2
-
+        state_managers = [
+            StateManager(board_size=self.board_size, starting_player=1 + i % 2)
+            for i in range(0, num_games_per_match)
+        ]
+        while state_managers:
+            for current_player, model in [(1, player1), (2, player2)]:
+                games = [
+                    state_manager
+                    for state_manager in state_managers
+                    if state_manager.current_player() == current_player
+                ]
+                if not games:
+                    continue
+                states = [state_manager.get_state() for state_manager in games]
+                distributions = model.predict_batch(states)
+                for state_manager, state, distribution in zip(
+                    games, states, distributions
+                ):
+                    if self.verbose:
+                        self.print_distribution(state_manager, distribution)
+                    argmax_distribution_index = int(
+                        np.argmax(distribution)
+                    )  # Greedy best from distribution
+                    action = state_manager.get_action_from_flattened_board_index(
+                        argmax_distribution_index, state
+                    )
+                    state_manager.perform_action(action)
+                    if state_manager.is_end_state():
+                        if current_player == 1:
+                            wins_p1 += 1
+                        else:
+                            wins_p2 += 1
+                        state_managers.remove(state_manager)
         return wins_p1, wins_p2
 
+    def print_distribution(self, state_manager: StateManager, distribution):
+        print(state_manager.pretty_state_string())
+        for k in range(0, self.board_size):
+            print(
+                [
+                    distribution[j]
+                    for j in range(
+                        self.board_size * k, self.board_size * k + self.board_size,
+                    )
+                ]
+            )
+
     def display_result(self, score_matrix):
         """
         Displays the score_matrix as a table
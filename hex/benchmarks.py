@@ -0,0 +1,628 @@
+import random
+import numpy as np
+
+from hex.MCTS import MCTS
+from hex.StateManager import StateManager
+from hex.SimulationBudget import SimulationBudget
+from hex.StateEncoder import StateEncoder
+from hex.ReplayBuffer import ReplayBuffer
+from libs.helpers import Timer
+
+
+"""
+FILE FOR BENCHMARKS OF THE HEX ENGINE. None of them need a trained model.
+"""
+
+
+class UniformActorNet:
+    """
+    Stand in for the ANET in benchmarks: uniform distribution over the open cells, and no training cases are kept
+    """
+
+    def predict(self, state: str) -> np.array:
+        board, player = StateManager.extract_state(state)
+        distribution = np.array([float(cell == "0") for cell in board])
+        return distribution / distribution.sum()
+
+    def predict_batch(self, states: [str]) -> np.ndarray:
+        return np.array([self.predict(state) for state in states])
+
+    def add_case(self, state, distribution):
+        pass
+
+
+class CaseCollectingActorNet(UniformActorNet):
+    """
+    Uniform actor net that keeps the training cases of the searches
+    """
+
+    def __init__(self):
+        self.cases = []
+
+    def add_case(self, state, distribution):
+        self.cases.append((state, distribution))
+
+
+def play_self_play_game(board_size: int, mcts_parameters: dict) -> MCTS:
+    """
+    Plays one self play game with a uniform actor net
+    :return: the MCTS object used in the game
+    """
+    state_manager = StateManager(board_size, 1)
+    mcts = MCTS(state_manager, UniformActorNet(), **mcts_parameters)
+    while not state_manager.is_end_state():
+        action = mcts.run(state_manager.get_state(), progress=1)
+        state_manager.perform_action(action)
+    return mcts
+
+
+def benchmark_dead_cell_pruning(
+    board_size=5, number_of_games=20, number_of_simulations=100
+):
+    """
+    Counts the children expanded in self play games with and without dead cell pruning
+    """
+    print(
+        f"Dead cell pruning, {board_size}x{board_size}, "
+        f"{number_of_simulations} simulations per move"
+    )
+    for prune_dead_cells in [False, True]:
+        random.seed(0)
+        np.random.seed(0)
+        expanded_children = 0
+        pruned_children = 0
+        timer = Timer(start=True)
+        for i in range(number_of_games):
+            mcts = play_self_play_game(
+                board_size,
+                {
+                    "number_of_simulations": number_of_simulations,
+                    "max_tree_height": board_size ** 2,
+                    "random_simulation_rate": 0,
+                    "prune_dead_cells": prune_dead_cells,
+                },
+            )
+            expanded_children += mcts.number_of_expanded_children
+            pruned_children += mcts.number_of_pruned_children
+        timer.stop()
+        print(
+            f"prune_dead_cells={prune_dead_cells}: {expanded_children / number_of_games:.0f} children expanded "
+            f"and {pruned_children / number_of_games:.0f} pruned per game, "
+            f"{timer.time() / number_of_games:.3f} s per game"
+        )
+
+
+def benchmark_progressive_widening(
+    board_size=7, number_of_moves=10, number_of_simulations=300
+):
+    """
+    Compares the size of the tree and the time per move with and without progressive widening
+    """
+    print(
+        f"Progressive widening, {board_size}x{board_size}, "
+        f"{number_of_simulations} simulations per move"
+    )
+    for progressive_widening in [False, True]:
+        random.seed(0)
+        np.random.seed(0)
+        state_manager = StateManager(board_size, 1)
+        mcts = MCTS(
+            state_manager,
+            UniformActorNet(),
+            number_of_simulations=number_of_simulations,
+            max_tree_height=board_size ** 2,
+            random_simulation_rate=0,
+            progressive_widening=progressive_widening,
+        )
+        number_of_nodes = 0
+        timer = Timer(start=True)
+        for i in range(number_of_moves):
+            action = mcts.run(state_manager.get_state(), progress=1)
+            number_of_nodes += len(mcts.tree.get_nodes())
+            state_manager.perform_action(action)
+        timer.stop()
+        print(
+            f"progressive_widening={progressive_widening}: "
+            f"{number_of_nodes / number_of_moves:.0f} nodes in the tree and "
+            f"{timer.time() / number_of_moves:.3f} s per move"
+        )
+
+
+def benchmark_simulation_budget(
+    board_size=5, number_of_games=10, number_of_simulations=100
+):
+    """
+    Compares a fixed number of simulations per move with a simulation budget per game
+    of the same size as the fixed searches would use on half of the board
+    """
+    simulations_per_game = number_of_simulations * board_size ** 2 // 2
+    print(
+        f"Simulation budget, {board_size}x{board_size}, {number_of_simulations} "
+        f"simulations per move against a budget of {simulations_per_game} per game"
+    )
+    for use_budget in [False, True]:
+        random.seed(0)
+        np.random.seed(0)
+        simulation_budget = (
+            SimulationBudget(simulations_per_game) if use_budget else None
+        )
+        moves = 0
+        timer = Timer(start=True)
+        for i in range(number_of_games):
+            if simulation_budget:
+                simulation_budget.start_game()
+            state_manager = StateManager(board_size, 1)
+            mcts = MCTS(
+                state_manager,
+                UniformActorNet(),
+                number_of_simulations=number_of_simulations,
+                max_tree_height=board_size ** 2,
+                random_simulation_rate=0,
+                simulation_budget=simulation_budget,
+            )
+            while not state_manager.is_end_state():
+                state_manager.perform_action(
+                    mcts.run(state_manager.get_state(), progress=1)
+                )
+                moves += 1
+            if simulation_budget:
+                summary = simulation_budget.end_game()
+                print(
+                    f"  game {i + 1}: {summary['simulations']} simulations in "
+                    f"{summary['moves']} moves, {summary['stopped_early']} stopped early"
+                )
+        timer.stop()
+        print(
+            f"simulation budget={use_budget}: {moves / number_of_games:.1f} moves and "
+            f"{timer.time() / number_of_games:.3f} s per game"
+        )
+
+
+def estimate_position_value(mcts: MCTS, state: str, seconds: float) -> (float, int):
+    """
+    Averages roll-outs from the state until the time is used, with the roll-out method of the MCTS
+    :return: a tuple: (`average reward`, `number of roll-outs`)
+    """
+    total_reward = 0.0
+    number_of_rollouts = 0
+    timer = Timer(start=True)
+    while True:
+        mcts.state_manager.set_state_manager(state)
+        if mcts.leaf_rollouts > 1:
+            total_reward += mcts.simulate_leaf_parallel(state) * mcts.leaf_rollouts
+        else:
+            total_reward += mcts.simulate(state)
+        number_of_rollouts += mcts.leaf_rollouts
+        timer.stop()
+        if timer.time() >= seconds:
+            return total_reward / number_of_rollouts, number_of_rollouts
+
+
+def benchmark_leaf_parallel_rollouts(
+    board_size=7,
+    leaf_rollouts=(1, 8, 32),
+    number_of_estimates=20,
+    seconds_per_estimate=0.1,
+    number_of_simulations=100,
+):
+    """
+    Compares sequential roll-outs with leaf parallel roll-outs: the number of roll-outs per second and the spread
+    of value estimates of the empty board made with the same amount of time, and the number of simulations per
+    second of a search
+    """
+    print(
+        f"Leaf parallel roll-outs, {board_size}x{board_size}, "
+        f"{seconds_per_estimate} s per value estimate"
+    )
+    state = StateManager(board_size, 1).get_state()
+    for rollouts in leaf_rollouts:
+        random.seed(0)
+        np.random.seed(0)
+        state_manager = StateManager(board_size, 1)
+        mcts = MCTS(
+            state_manager,
+            UniformActorNet(),
+            number_of_simulations=number_of_simulations,
+            max_tree_height=board_size ** 2,
+            random_simulation_rate=0,
+            leaf_rollouts=rollouts,
+        )
+        estimates = []
+        number_of_rollouts = 0
+        for i in range(number_of_estimates):
+            estimate, n = estimate_position_value(mcts, state, seconds_per_estimate)
+            estimates.append(estimate)
+            number_of_rollouts += n
+        timer = Timer(start=True)
+        mcts.run(state_manager.get_state(), progress=1)
+        timer.stop()
+        print(
+            f"leaf_rollouts={rollouts}: "
+            f"{number_of_rollouts / (number_of_estimates * seconds_per_estimate):.0f} roll-outs per second, "
+            f"estimate {np.mean(estimates):.3f} with standard deviation {np.std(estimates):.4f}, "
+            f"{number_of_simulations / timer.time():.0f} simulations per second in a search"
+        )
+
+
+def random_states(board_size: int, number_of_states: int) -> [str]:
+    """
+    :return: states with a random number of pieces in random cells, not necessarily reachable in a game
+    """
+    states = []
+    for i in range(number_of_states):
+        cells = np.random.choice(["0", "1", "2"], size=board_size ** 2)
+        states.append(f"{''.join(cells)}:{random.choice(['1', '2'])}")
+    return states
+
+
+def benchmark_state_encoding(board_size=7, number_of_states=2000):
+    """
+    Compares the list based network format of one state at a time with the vectorized encoder, for one state at a
+    time and for all the states in one call
+    """
+    print(f"State encoding, {board_size}x{board_size}, {number_of_states} states")
+    random.seed(0)
+    np.random.seed(0)
+    states = random_states(board_size, number_of_states)
+    out = np.empty(
+        (number_of_states, StateEncoder.get_input_size(board_size)), dtype=np.float32
+    )
+    encoders = {
+        "list per state": lambda: [
+            np.array([StateEncoder.convert_state_to_network_format(state)])
+            for state in states
+        ],
+        "vectorized per state": lambda: [
+            StateEncoder.convert_states_to_network_format([state]) for state in states
+        ],
+        "vectorized batch": lambda: StateEncoder.convert_states_to_network_format(
+            states, out=out
+        ),
+    }
+    for name, encode in encoders.items():
+        times = []
+        for repetition in range(3):
+            timer = Timer(start=True)
+            encode()
+            timer.stop()
+            times.append(timer.time())
+        print(f"{name}: {min(times) / number_of_states * 1e6:.1f} us per state")
+
+
+def mask_and_normalize_with_loop(distribution: np.ndarray, state: str) -> np.ndarray:
+    """
+    The masking of taken cells as it was done before StateEncoder.mask_and_normalize, for comparison
+    """
+    net_distribution = []
+    for index, share_of_distribution in np.ndenumerate(distribution):
+        if StateManager.index_cell_is_occupied(index[0], state):
+            net_distribution.append(0.0)
+        else:
+            net_distribution.append(float(share_of_distribution))
+    return np.array(net_distribution) / sum(net_distribution)
+
+
+def gen_cases_with_strings(state: str, dist: np.ndarray, board_size: int) -> list:
+    """
+    The symmetric cases of a training case as ANET.gen_cases made them before
+    StateEncoder.generate_symmetric_cases, from the state string, for comparison
+    :return: list of (`state`, `distribution`) tuples
+    """
+    generated_cases = [(state, dist)]
+    state_180 = "".join(reversed(state[:-2])) + state[-2:]
+    generated_cases.append((state_180, dist[::-1]))
+    board_90 = np.zeros(board_size ** 2, dtype=int)
+    dist_90 = np.zeros(board_size ** 2)
+    for row in range(0, board_size):
+        for col in range(0, board_size):
+            flatten_position_board = row * board_size + col
+            flatten_position_new_board = col * board_size + row
+            if state[flatten_position_board] == "0":
+                board_90[flatten_position_new_board] = state[flatten_position_board]
+            else:
+                board_90[flatten_position_new_board] = (
+                    "1" if state[flatten_position_board] == "2" else "2"
+                )
+            dist_90[flatten_position_new_board] = dist[flatten_position_board]
+    player_str = "1" if state[-1] == "2" else "2"
+    state_90 = "".join(board_90.astype(str)) + ":" + player_str
+    generated_cases.append((state_90, list(dist_90)))
+    state_270 = "".join(reversed(state_90[:-2])) + state_90[-2:]
+    generated_cases.append((state_270, list(dist_90[::-1])))
+    return generated_cases
+
+
+def benchmark_symmetric_cases(board_size=7, number_of_states=2000):
+    """
+    Compares the symmetric training cases made from state strings, and then encoded, with permutations of the
+    encoded cases, for one case at a time and for all the cases in one call
+    """
+    print(f"Symmetric cases, {board_size}x{board_size}, {number_of_states} states")
+    random.seed(0)
+    np.random.seed(0)
+    states = random_states(board_size, number_of_states)
+    distributions = np.random.dirichlet(np.ones(board_size ** 2), size=number_of_states)
+    network_inputs = StateEncoder.convert_states_to_network_format(states)
+    generators = {
+        "strings per case": lambda: [
+            StateEncoder.convert_states_to_network_format(
+                [case[0] for case in gen_cases_with_strings(state, distribution, board_size)]
+            )
+            for state, distribution in zip(states, distributions)
+        ],
+        "permutations per case": lambda: [
+            StateEncoder.generate_symmetric_cases(
+                StateEncoder.convert_states_to_network_format([state]), [distribution]
+            )
+            for state, distribution in zip(states, distributions)
+        ],
+        "permutations batch": lambda: StateEncoder.generate_symmetric_cases(
+            network_inputs, distributions
+        ),
+    }
+    for name, generate in generators.items():
+        timer = Timer(start=True)
+        generate()
+        timer.stop()
+        print(f"{name}: {timer.time() / number_of_states * 1e6:.1f} us per case")
+
+
+def benchmark_masking(board_size=7, number_of_states=2000):
+    """
+    Compares the masking and renormalization of network outputs with a loop over the cells, with arrays for one
+    state at a time, and for all the states in one call
+    """
+    print(f"Masking, {board_size}x{board_size}, {number_of_states} states")
+    random.seed(0)
+    np.random.seed(0)
+    states = random_states(board_size, number_of_states)
+    distributions = np.random.dirichlet(
+        np.ones(board_size ** 2), size=number_of_states
+    ).astype(np.float32)
+    maskers = {
+        "loop per state": lambda: [
+            mask_and_normalize_with_loop(distribution, state)
+            for distribution, state in zip(distributions, states)
+        ],
+        "arrays per state": lambda: [
+            StateEncoder.mask_and_normalize(distribution, state)
+            for distribution, state in zip(distributions, states)
+        ],
+        "arrays batch": lambda: StateEncoder.mask_and_normalize_batch(
+            distributions, states
+        ),
+    }
+    for name, mask in maskers.items():
+        timer = Timer(start=True)
+        mask()
+        timer.stop()
+        print(f"{name}: {timer.time() / number_of_states * 1e6:.1f} us per state")
+
+
+def play_against_random_player(
+    actor_net, board_size: int, number_of_games: int
+) -> float:
+    """
+    Plays greedy moves of the actor net against a player choosing uniformly among the open cells, alternating the
+    starting player
+    :return: share of the games won by the actor net
+    """
+    wins = 0
+    for i in range(number_of_games):
+        state_manager = StateManager(board_size, 1 + i % 2)
+        while not state_manager.is_end_state():
+            current_player = state_manager.current_player()
+            state = state_manager.get_state()
+            if current_player == 1:
+                index = int(np.argmax(actor_net.predict(state)))
+            else:
+                board, player = StateManager.extract_state(state)
+                index = random.choice(
+                    [j for j, cell in enumerate(board) if cell == "0"]
+                )
+            state_manager.perform_action(
+                state_manager.get_action_from_flattened_board_index(index, state)
+            )
+        wins += current_player == 1
+    return wins / number_of_games
+
+
+def benchmark_prioritized_replay(
+    board_size=4,
+    number_of_games=40,
+    number_of_simulations=200,
+    target_win_rate=0.9,
+    max_training_steps=200,
+    evaluation_interval=5,
+    number_of_evaluation_games=100,
+):
+    """
+    Compares uniform and prioritized sampling of the replay buffer: the training steps and the wall time of the
+    training until the greedy actor net wins target_win_rate of its games against a random player. The training
+    cases come from the same self play games with a uniform actor net in both runs.
+    """
+    from hex.ANET import ANET
+    import tempfile
+
+    print(
+        f"Prioritized replay, {board_size}x{board_size}, {number_of_games} self play games, "
+        f"target win rate {target_win_rate} against a random player"
+    )
+    random.seed(0)
+    np.random.seed(0)
+    collector = CaseCollectingActorNet()
+    for i in range(number_of_games):
+        state_manager = StateManager(board_size, 1 + i % 2)
+        mcts = MCTS(
+            state_manager,
+            collector,
+            number_of_simulations=number_of_simulations,
+            max_tree_height=board_size ** 2,
+            random_simulation_rate=0,
+        )
+        while not state_manager.is_end_state():
+            state_manager.perform_action(
+                mcts.run(state_manager.get_state(), progress=0.5)
+            )
+    for prioritized in [False, True]:
+        random.seed(0)
+        np.random.seed(0)
+        with tempfile.TemporaryDirectory() as directory:
+            actor_net = ANET(
+                board_size,
+                buffer_batch_size=64,
+                max_size_buffer=len(collector.cases) * 4,
+                epochs=1,
+                verbose=0,
+                save_directory=directory,
+                hidden_layers_structure=[64],
+                learning_rate=0.05,
+                prioritized_replay=prioritized,
+            )
+            for state, distribution in collector.cases:
+                actor_net.add_case(state, distribution)
+            timer = Timer()
+            win_rate = 0.0
+            steps = 0
+            while steps < max_training_steps and win_rate < target_win_rate:
+                timer.start()
+                actor_net.train()
+                timer.stop(add=True)
+                steps += 1
+                if steps % evaluation_interval == 0:
+                    win_rate = play_against_random_player(
+                        actor_net.to_numpy(), board_size, number_of_evaluation_games
+                    )
+        print(
+            f"prioritized={prioritized}: win rate {win_rate:.2f} after {steps} training steps "
+            f"and {timer.cumulative:.1f} s of training"
+        )
+
+
+def benchmark_replay_deduplication(
+    board_size=4, number_of_games=100, number_of_simulations=50, max_size_buffer=1000
+):
+    """
+    Compares the number of different positions kept in replay buffers of the same size with and without
+    deduplication, filled with the symmetric cases of the same self play games
+    """
+    print(
+        f"Replay deduplication, {board_size}x{board_size}, {number_of_games} self play games, "
+        f"buffer of {max_size_buffer} cases"
+    )
+    random.seed(0)
+    np.random.seed(0)
+    collector = CaseCollectingActorNet()
+    for i in range(number_of_games):
+        state_manager = StateManager(board_size, 1 + i % 2)
+        mcts = MCTS(
+            state_manager,
+            collector,
+            number_of_simulations=number_of_simulations,
+            max_tree_height=board_size ** 2,
+            random_simulation_rate=0,
+        )
+        while not state_manager.is_end_state():
+            state_manager.perform_action(
+                mcts.run(state_manager.get_state(), progress=0.5)
+            )
+    network_inputs, distributions = StateEncoder.generate_symmetric_cases(
+        StateEncoder.convert_states_to_network_format(
+            [case[0] for case in collector.cases]
+        ),
+        np.array([case[1] for case in collector.cases]),
+    )
+    for deduplicate in [False, True]:
+        random.seed(0)
+        replay_buffer = ReplayBuffer(
+            network_inputs.shape[1],
+            board_size ** 2,
+            max_size_buffer,
+            0.3,
+            deduplicate=deduplicate,
+        )
+        for network_input, distribution in zip(network_inputs, distributions):
+            replay_buffer.add(network_input, distribution)
+        x, y = replay_buffer.get_all_cases()
+        stats = replay_buffer.get_deduplication_stats()
+        print(
+            f"deduplicate={deduplicate}: {len(np.unique(x, axis=0))} different positions among "
+            f"{len(x)} cases, {stats['merged']} of {stats['added']} cases merged"
+        )
+
+
+def benchmark_inference_server(
+    board_size=7, number_of_clients=8, predictions_per_client=200, max_latency=0.002
+):
+    """
+    Compares threads calling the Keras model of an ANET directly with the same threads as clients of an
+    InferenceServer holding the model, with predictions of single states as in the roll-outs
+    """
+    from hex.ANET import ANET
+    from hex.InferenceServer import InferenceServer
+    import tempfile
+    import threading
+
+    print(
+        f"Inference server, {board_size}x{board_size}, {number_of_clients} clients, "
+        f"{predictions_per_client} predictions each"
+    )
+    random.seed(0)
+    np.random.seed(0)
+    states = random_states(board_size, predictions_per_client)
+    with tempfile.TemporaryDirectory() as directory:
+        actor_net = ANET(board_size, verbose=0, save_directory=directory)
+        actor_net.save_model(0)
+
+        def predict_states(net):
+            for state in states:
+                net.predict(state)
+
+        def run_threads(nets) -> float:
+            threads = [
+                threading.Thread(target=predict_states, args=(net,)) for net in nets
+            ]
+            timer = Timer(start=True)
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            timer.stop()
+            return timer.time()
+
+        time_of_direct_calls = run_threads([actor_net] * number_of_clients)
+        server = InferenceServer(
+            f"{directory}/model_0.h5", number_of_clients, max_latency=max_latency
+        )
+        # Waiting for the server to load the model
+        server.clients[0].predict(states[0])
+        time_with_server = run_threads(server.clients)
+        stats = server.clients[0].get_stats()
+        server.stop()
+    number_of_predictions = number_of_clients * predictions_per_client
+    print(
+        f"direct calls: {number_of_predictions / time_of_direct_calls:.0f} predictions per second"
+    )
+    print(
+        f"inference server: {number_of_predictions / time_with_server:.0f} predictions per second, "
+        f"batch sizes {stats['batch_size_histogram']}, queue latency median "
+        f"{stats['queue_latency_median'] * 1e3:.2f} ms and p95 {stats['queue_latency_p95'] * 1e3:.2f} ms"
+    )
+
+
+def main():
+    benchmark_dead_cell_pruning(board_size=4)
+    benchmark_dead_cell_pruning(board_size=5)
+    benchmark_progressive_widening(board_size=7)
+    benchmark_simulation_budget(board_size=5)
+    benchmark_leaf_parallel_rollouts(board_size=7)
+    benchmark_state_encoding(board_size=7)
+    benchmark_masking(board_size=7)
+    benchmark_symmetric_cases(board_size=7)
+    benchmark_prioritized_replay(board_size=4)
+    benchmark_replay_deduplication(board_size=4)
+    benchmark_inference_server(board_size=7)
+
+
+if __name__ == "__main__":
+    main()
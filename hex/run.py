@@ -12,6 +12,9 @@ G = 10  # number of games in a batch
 P = StartingPlayerOptions.P2  # starting-player option
 verbose = True
 save_interval = 10  # number of games between each time we save a model
+async_workers = 0  # self play processes playing while the network trains, 0 to play and train in turns
+num_workers = 0  # games played at the same time in a process pool, 0 to play one game at a time
+lockstep_games = 0  # games advanced together in this process with batched network calls, 0 for one at a time
 
 # SETTINGS FOR HEX
 k = 3  # board size kxk, 3 <= k <= 10
@@ -27,6 +30,8 @@ actor_net_parameters = {
     "learning_rate": 0.005,
     "optimizer": optimizers.SGD,  # Adadelta/SGD
     "activation_function": "tanh",  # relu/sigmoid/linear/tanh
+    "prediction_cache_size": 10000,  # number of predictions kept between training rounds, 0 for no cache
+    "deduplicate_replay": True,  # merge cases of the same position instead of adding them again
 }
 mcts_parameters = {
     "max_tree_height": 12,
@@ -34,31 +39,47 @@ mcts_parameters = {
     "number_of_simulations": 1,  # number of simulations (and hence roll-outs) per actual game move
     "verbose": verbose,
 }
+# Directory of the case store getting all the training cases of the run, None to not store them. A store only takes
+# cases of one board size and number of simulations, so each setting gets its own directory
+cases_directory = f"cases/{k}x{k}_sim_{mcts_parameters['number_of_simulations']}"
+# Small policy for the roll-outs distilled from the ANET after each game, None to use the ANET. Must be None with
+# async_workers or num_workers, as the games are played in other processes
+rollout_policy_parameters = {
+    "learning_rate": 0.5,
+    "epochs": 30,
+}
 
-training_timer = Timer(start=True)
+if __name__ == "__main__":
+    # The self play processes of the asynchronous mode import this file, and must not start a run
+    training_timer = Timer(start=True)
 
-# TRAIN AGAINST SELF
-game = GameSimulator(
-    G,
-    P,
-    verbose,
-    k,
-    print_parameters=True,
-    save_interval=save_interval,
-    actor_net_parameters=actor_net_parameters,
-    mcts_parameters=mcts_parameters
-)
+    # TRAIN AGAINST SELF
+    game = GameSimulator(
+        G,
+        P,
+        verbose,
+        k,
+        print_parameters=True,
+        save_interval=save_interval,
+        actor_net_parameters=actor_net_parameters,
+        mcts_parameters=mcts_parameters,
+        rollout_policy_parameters=rollout_policy_parameters,
+        async_workers=async_workers,
+        num_workers=num_workers,
+        lockstep_games=lockstep_games,
+        cases_directory=cases_directory,
+    )
 
-game.run()
+    game.run()
 
-training_timer.stop()
-print(f"Training time elapsed: {training_timer.time_str()}")
+    training_timer.stop()
+    print(f"Training time elapsed: {training_timer.time_str()}")
 
-"""
-TOPP parameters
-"""
-num_games_per_match = 2
+    """
+    TOPP parameters
+    """
+    num_games_per_match = 2
 
-# TOPP
-turnament = TOPP('trained_models')
-turnament.play(num_games_per_match)
+    # TOPP
+    turnament = TOPP('trained_models')
+    turnament.play(num_games_per_match)
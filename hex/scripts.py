@@ -1,8 +1,11 @@
 from hex.GameVisualizer import GameVisualizer
 from hex.ANET import ANET
 import matplotlib.pyplot as plt
+import os
+import glob
 
 from hex.TOPP import TOPP
+from hex.OpeningBook import OpeningBook
 
 
 def model_match(models_directory, player1, player2, starting_player=1):
@@ -47,6 +50,38 @@ def play_TOPP():
     tournament.play(2)
 
 
+def build_opening_book(
+    model_path, book_path, number_of_games, mcts_parameters, max_number_of_pieces=4
+):
+    """
+    Harvests the root visit counts of self play openings into the opening book at book_path, adding to the
+    book if it already exists. The book is used by passing it as `opening_book` in the mcts parameters.
+    """
+    actor_net = ANET.load_model(model_path)
+    if os.path.exists(book_path):
+        book = OpeningBook.load(book_path, max_number_of_pieces=max_number_of_pieces)
+    else:
+        book = OpeningBook(
+            actor_net.size_of_board, max_number_of_pieces=max_number_of_pieces
+        )
+    book.harvest_self_play(actor_net, number_of_games, mcts_parameters)
+    book.save(book_path)
+    print(f"Opening book {book_path} has {len(book)} states")
+    return book
+
+
+def export_models_to_numpy(models_directory="trained_models"):
+    """
+    Exports every saved Keras model in the directory to a .npz file next to it, for inference with NumpyANET,
+    e.g. in TOPP(models_directory, use_numpy_models=True) or the OHT client
+    """
+    for model_path in glob.glob(models_directory + "/*.h5"):
+        path = ANET.load_model(model_path).export_numpy_model(
+            model_path[: -len(".h5")] + ".npz"
+        )
+        print(f"Exported {model_path} to {path}")
+
+
 def main():
     # train_from_cases_and_show_loss()
     #model_match("/Users/svoss/KODE/AI-Prog/runs/jens_reccomend/trained_models", None, 32, starting_player=1)
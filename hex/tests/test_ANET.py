@@ -0,0 +1,149 @@
+import tempfile
+import unittest
+import numpy as np
+
+from hex.ANET import ANET
+from hex.CaseStore import CaseStore
+
+
+class TestANET(unittest.TestCase):
+    def setUp(self) -> None:
+        np.random.seed(40)
+        self.directory = tempfile.TemporaryDirectory()
+        self.actor_net = ANET(
+            3,
+            save_directory=self.directory.name,
+            verbose=0,
+            epochs=1,
+            hidden_layers_structure=[8],
+            prediction_cache_size=2,
+        )
+        self.states = ["000000000:1", "100000000:2", "120000000:1"]
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_prediction_cache(self):
+        distribution = self.actor_net.predict(self.states[0])
+        # Changing the returned distribution does not change the cache
+        distribution[0] = 1
+        np.testing.assert_allclose(
+            self.actor_net.predict(self.states[0]),
+            ANET.predict_and_normalize(self.actor_net.model, self.states[0]),
+        )
+        self.actor_net.predict(self.states[1])
+        # The least recently used state is evicted
+        self.actor_net.predict(self.states[0])
+        self.actor_net.predict(self.states[2])
+        self.assertSequenceEqual(
+            list(self.actor_net.prediction_cache), [self.states[0], self.states[2]]
+        )
+        stats = self.actor_net.get_prediction_cache_stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 3)
+        self.assertEqual(stats["evictions"], 1)
+
+    def test_predict_batch_uses_cache(self):
+        self.actor_net.predict(self.states[1])
+        distributions = self.actor_net.predict_batch(self.states)
+        for state, distribution in zip(self.states, distributions):
+            np.testing.assert_allclose(
+                distribution,
+                ANET.predict_and_normalize(self.actor_net.model, state),
+                atol=1e-6,
+            )
+        self.assertEqual(self.actor_net.cache_hits, 1)
+        self.assertEqual(len(self.actor_net.prediction_cache), 2)
+
+    def test_training_empties_cache(self):
+        self.actor_net.add_case(self.states[0], [0, 0, 0, 0, 1, 0, 0, 0, 0])
+        self.actor_net.predict(self.states[0])
+        self.actor_net.train()
+        self.assertEqual(len(self.actor_net.prediction_cache), 0)
+        np.testing.assert_allclose(
+            self.actor_net.predict(self.states[0]),
+            ANET.predict_and_normalize(self.actor_net.model, self.states[0]),
+        )
+
+    def test_prioritized_replay_training(self):
+        actor_net = ANET(
+            3,
+            save_directory=self.directory.name,
+            verbose=0,
+            epochs=1,
+            hidden_layers_structure=[8],
+            prioritized_replay=True,
+        )
+        actor_net.add_case(self.states[0], [0, 0, 0, 0, 1, 0, 0, 0, 0])
+        actor_net.add_case(self.states[1], [0, 0.5, 0, 0, 0.5, 0, 0, 0, 0])
+        actor_net.train()
+        # The priorities of the cases are set from the losses after the training step
+        x, y = actor_net.replay_buffer.get_all_cases()
+        slots = actor_net.replay_buffer.get_slots(range(len(x)))
+        expected_priorities = (actor_net.get_case_losses(x, y) + 0.01) ** 0.6
+        np.testing.assert_allclose(
+            actor_net.replay_buffer.priorities.get(slots),
+            expected_priorities,
+            rtol=1e-5,
+        )
+
+    def test_train_network_from_case_store(self):
+        case_store = CaseStore(self.directory.name, 3, shard_size=8)
+        self.actor_net.case_store = case_store
+        self.actor_net.add_case(self.states[0], [0, 0, 0, 0, 1, 0, 0, 0, 0])
+        self.actor_net.add_case(self.states[1], [0, 0.5, 0, 0, 0.5, 0, 0, 0, 0])
+        self.actor_net.add_case(self.states[2], [0, 0, 0, 0, 0, 0, 0, 0, 1])
+        case_store.flush()
+        np.testing.assert_array_equal(
+            case_store.get_shard(0)[0],
+            self.actor_net.replay_buffer.get_all_cases()[0][:8],
+        )
+        anet, history = ANET.train_network_from_cases(
+            self.directory.name,
+            {"save_directory": self.directory.name, "verbose": 0, "epochs": 2},
+            batch_size=4,
+        )
+        self.assertEqual(anet.size_of_board, 3)
+        self.assertEqual(len(history.history["loss"]), 2)
+        self.assertEqual(len(history.history["val_loss"]), 2)
+
+    def test_data_pipeline(self):
+        actor_net = ANET(
+            3,
+            save_directory=self.directory.name,
+            verbose=0,
+            epochs=2,
+            hidden_layers_structure=[8],
+            data_pipeline=True,
+            validation_refresh_interval=2,
+        )
+        for state in self.states:
+            actor_net.add_case(state, [0, 0, 0, 0, 0, 0, 0, 0, 1])
+        history = actor_net.train()
+        self.assertEqual(len(history.history["val_loss"]), 2)
+        # The validation cases are kept for validation_refresh_interval rounds
+        validation_dataset = actor_net.validation_dataset
+        actor_net.train()
+        self.assertIs(actor_net.validation_dataset, validation_dataset)
+        actor_net.train()
+        self.assertIsNot(actor_net.validation_dataset, validation_dataset)
+
+    def test_train_network_from_case_store_with_data_pipeline(self):
+        case_store = CaseStore(self.directory.name, 3, shard_size=8)
+        self.actor_net.case_store = case_store
+        for state in self.states:
+            self.actor_net.add_case(state, [0, 0, 0, 0, 0, 0, 0, 0, 1])
+        case_store.flush()
+        anet, history = ANET.train_network_from_cases(
+            self.directory.name,
+            {
+                "save_directory": self.directory.name,
+                "verbose": 0,
+                "epochs": 2,
+                "data_pipeline": True,
+            },
+            batch_size=4,
+        )
+        self.assertTrue(anet.data_pipeline)
+        self.assertEqual(len(history.history["loss"]), 2)
+        self.assertEqual(len(history.history["val_loss"]), 2)
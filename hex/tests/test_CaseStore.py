@@ -0,0 +1,84 @@
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+
+from hex.CaseStore import CaseStore
+
+
+class TestCaseStore(unittest.TestCase):
+    def setUp(self) -> None:
+        np.random.seed(45)
+        self.directory = tempfile.TemporaryDirectory()
+        self.case_store = CaseStore(
+            self.directory.name, 3, simulations=100, shard_size=10
+        )
+        # Four cases in each of seven games, numbered by the first input bit
+        for game in range(1, 8):
+            self.case_store.start_game(game)
+            numbers = np.arange(4 * (game - 1), 4 * game)
+            self.case_store.add(
+                np.repeat(numbers[:, None], 28, axis=1),
+                np.repeat(-numbers[:, None], 9, axis=1),
+            )
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_shards_and_manifest(self):
+        # Only full shards are written before flushing
+        self.assertEqual(len(self.case_store), 20)
+        self.case_store.flush()
+        with open(os.path.join(self.directory.name, "manifest.json")) as file:
+            manifest = json.load(file)
+        self.assertEqual(manifest["board_size"], 3)
+        self.assertEqual(manifest["simulations"], 100)
+        self.assertSequenceEqual(
+            [
+                (shard["number_of_cases"], shard["first_game"], shard["last_game"])
+                for shard in manifest["shards"]
+            ],
+            [(10, 1, 3), (10, 3, 5), (8, 6, 7)],
+        )
+        x, y = self.case_store.get_shard(1)
+        self.assertIsInstance(x, np.memmap)
+        np.testing.assert_array_equal(x[:, 0], np.arange(10, 20))
+        # Reopening the store appends to it
+        case_store = CaseStore.load(self.directory.name)
+        case_store.start_game(8)
+        case_store.add(np.ones((10, 28)), np.ones((10, 9)))
+        self.assertEqual(len(case_store), 38)
+        self.assertEqual(len(CaseStore.load(self.directory.name)), 38)
+        with self.assertRaises(ValueError):
+            CaseStore(self.directory.name, 4)
+        with self.assertRaises(ValueError):
+            CaseStore(self.directory.name, 3, simulations=50)
+
+    def test_generate_batches(self):
+        self.case_store.flush()
+        training_batches = list(
+            self.case_store.generate_batches(4, validation_split=0.2, repeat=False)
+        )
+        validation_batches = list(
+            self.case_store.generate_batches(
+                4, validation_split=0.2, validation=True, repeat=False
+            )
+        )
+        self.assertEqual(
+            len(training_batches), self.case_store.get_number_of_batches(4, 0.2)
+        )
+        self.assertEqual(
+            len(validation_batches),
+            self.case_store.get_number_of_batches(4, 0.2, validation=True),
+        )
+        training_numbers = np.concatenate([x[:, 0] for x, y in training_batches])
+        validation_numbers = np.concatenate([x[:, 0] for x, y in validation_batches])
+        # Every case once, the last fifth of each shard for validation
+        self.assertSequenceEqual(sorted(validation_numbers), [8, 9, 18, 19, 27])
+        self.assertSequenceEqual(
+            sorted(np.concatenate([training_numbers, validation_numbers])),
+            list(range(28)),
+        )
+        for x, y in training_batches:
+            np.testing.assert_array_equal(x[:, 0], -y[:, 0])
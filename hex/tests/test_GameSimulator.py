@@ -0,0 +1,148 @@
+import os
+import random
+import tempfile
+import unittest
+import numpy as np
+
+from hex.GameSimulator import GameSimulator, StartingPlayerOptions
+from hex.CaseStore import CaseStore
+from hex.SelfPlayWorker import play_game_steps
+
+
+class BatchSizeRecordingNet:
+    def __init__(self, actor_net):
+        self.actor_net = actor_net
+        self.batch_sizes = []
+
+    def predict_batch(self, states):
+        self.batch_sizes.append(len(states))
+        return self.actor_net.predict_batch(states)
+
+
+class TestGameSimulator(unittest.TestCase):
+    def setUp(self) -> None:
+        random.seed(49)
+        np.random.seed(49)
+        self.directory = tempfile.TemporaryDirectory()
+        # The loss graphs are saved in the working directory
+        self.working_directory = os.getcwd()
+        os.chdir(self.directory.name)
+        self.game_simulator = GameSimulator(
+            4,
+            StartingPlayerOptions.ALTERNATING,
+            False,
+            3,
+            save_interval=2,
+            actor_net_parameters={
+                "verbose": 0,
+                "epochs": 1,
+                "hidden_layers_structure": [8],
+                "save_directory": os.path.join(self.directory.name, "models"),
+            },
+            mcts_parameters={"number_of_simulations": 10, "max_tree_height": 9},
+            cases_directory=os.path.join(self.directory.name, "cases"),
+            lockstep_games=3,
+        )
+
+    def tearDown(self) -> None:
+        os.chdir(self.working_directory)
+        self.directory.cleanup()
+
+    def test_lockstep_games(self):
+        self.game_simulator.run()
+        self.assertEqual(self.game_simulator.winner_stats.sum(), 4)
+        # Every move of the games is a training case, with its four symmetric cases
+        case_store = CaseStore.load(os.path.join(self.directory.name, "cases"))
+        self.assertEqual(
+            len(case_store), len(self.game_simulator.actor_network.replay_buffer)
+        )
+        self.assertSequenceEqual(
+            sorted(os.listdir(os.path.join(self.directory.name, "models"))),
+            ["model_0.h5", "model_2.h5", "model_4.h5"],
+        )
+
+    def test_unsupported_options_of_lockstep_mode(self):
+        with self.assertRaises(ValueError):
+            GameSimulator(
+                2,
+                StartingPlayerOptions.P1,
+                False,
+                3,
+                search_statistics_path="statistics.jsonl",
+                lockstep_games=2,
+            )
+        with self.assertRaises(ValueError):
+            GameSimulator(
+                2, StartingPlayerOptions.P1, False, 3, num_workers=2, lockstep_games=2
+            )
+
+    def test_rollout_policy_is_distilled_in_lockstep(self):
+        game_simulator = GameSimulator(
+            2,
+            StartingPlayerOptions.P1,
+            False,
+            3,
+            actor_net_parameters={
+                "verbose": 0,
+                "epochs": 1,
+                "hidden_layers_structure": [8],
+                "save_directory": os.path.join(self.directory.name, "models"),
+            },
+            mcts_parameters={"number_of_simulations": 10, "max_tree_height": 9},
+            rollout_policy_parameters={"epochs": 1},
+            lockstep_games=2,
+        )
+        game_simulator.run()
+        self.assertTrue(game_simulator.rollout_policy.weights.any())
+
+    def test_failing_async_worker_stops_the_run(self):
+        game_simulator = GameSimulator(
+            2,
+            StartingPlayerOptions.P1,
+            False,
+            3,
+            actor_net_parameters={
+                "verbose": 0,
+                "save_directory": os.path.join(self.directory.name, "models"),
+            },
+            mcts_parameters={"unknown_parameter": 1},
+            async_workers=1,
+        )
+        with self.assertRaises(RuntimeError):
+            game_simulator.run()
+
+    def test_unsupported_options_of_self_play_workers(self):
+        with self.assertRaises(ValueError):
+            GameSimulator(
+                2,
+                StartingPlayerOptions.P1,
+                False,
+                3,
+                rollout_policy_parameters={},
+                async_workers=1,
+            )
+        with self.assertRaises(ValueError):
+            GameSimulator(
+                2, StartingPlayerOptions.P1, False, 3, numpy_rollouts=True, num_workers=2
+            )
+
+    def test_play_in_lockstep(self):
+        games = {
+            i: play_game_steps(
+                i,
+                4,
+                3,
+                starting_player,
+                self.game_simulator.actor_network,
+                {"number_of_simulations": 10, "max_tree_height": 9},
+            )
+            for i, starting_player in [(1, 1), (2, 2), (3, 1)]
+        }
+        net = BatchSizeRecordingNet(self.game_simulator.actor_network)
+        winners = self.game_simulator.play_in_lockstep(games, net)
+        self.assertSequenceEqual(sorted(winners), [1, 2, 3])
+        # The requests of the games are predicted together until games end
+        self.assertEqual(max(net.batch_sizes), 3)
+        self.assertSequenceEqual(
+            net.batch_sizes, sorted(net.batch_sizes, reverse=True)
+        )
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import threading
+import unittest
+import numpy as np
+
+from hex.InferenceServer import InferenceServer
+from hex.SelfPlayWorker import play_game
+from hex.benchmarks import random_states
+from hex.tests.test_SelfPlayWorker import random_numpy_actor_net
+
+
+class TestInferenceServer(unittest.TestCase):
+    def setUp(self) -> None:
+        np.random.seed(50)
+        self.directory = tempfile.TemporaryDirectory()
+        self.model_path = os.path.join(self.directory.name, "model_0.npz")
+        self.numpy_actor_net = random_numpy_actor_net(3, 0)
+        self.numpy_actor_net.save(self.model_path)
+        self.server = InferenceServer(self.model_path, 3, max_latency=0.05)
+
+    def tearDown(self) -> None:
+        self.server.stop()
+        self.directory.cleanup()
+
+    def test_predictions(self):
+        client = self.server.clients[0]
+        states = random_states(3, 10)
+        np.testing.assert_allclose(
+            client.predict_batch(states),
+            self.numpy_actor_net.predict_batch(states),
+            rtol=1e-6,
+        )
+        np.testing.assert_allclose(
+            client.predict(states[0]),
+            self.numpy_actor_net.predict(states[0]),
+            rtol=1e-6,
+        )
+        stats = client.get_stats()
+        self.assertEqual(stats["predictions"], 11)
+        self.assertEqual(stats["batch_size_histogram"], {1: 1, 10: 1})
+
+    def test_requests_of_clients_are_batched(self):
+        # With a long max latency, the requests are only answered when all the open clients are waiting
+        self.server.clients[2].close()
+        winners = []
+        threads = [
+            threading.Thread(
+                target=lambda client: winners.append(
+                    play_game(
+                        1,
+                        1,
+                        3,
+                        1,
+                        client,
+                        {"number_of_simulations": 5, "max_tree_height": 9},
+                    )
+                ),
+                args=(client,),
+            )
+            for client in self.server.clients[:2]
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(winners), 2)
+        for client in self.server.clients[:2]:
+            self.assertGreater(len(client.take_cases()), 0)
+        stats = self.server.clients[0].get_stats()
+        self.assertGreater(stats["batch_size_histogram"].get(2, 0), 0)
+        self.assertGreaterEqual(
+            stats["queue_latency_max"], stats["queue_latency_median"]
+        )
@@ -1,7 +1,10 @@
+import random
 import unittest
+import numpy as np
 
-from hex.MCTS import MCTS
+from hex.MCTS import MCTS, StateTree
 from hex.StateManager import StateManager
+from hex.SearchStatistics import SearchStatistics
 
 
 class TestConstants:
@@ -12,6 +15,28 @@ class TestConstants:
 class MockActorNet:
     def __init__(self):
         self.prediction = 0
+        self.cases = []
+
+    def add_case(self, state, distribution):
+        self.cases.append((state, distribution))
+
+
+class FirstOpenCellActorNet(MockActorNet):
+    def __init__(self):
+        super().__init__()
+        self.batch_sizes = []
+
+    def predict(self, state):
+        distribution = np.zeros(len(state) - 2)
+        distribution[state.index("0")] = 1
+        return distribution
+
+    def predict_batch(self, states):
+        self.batch_sizes.append(len(states))
+        distributions = np.zeros((len(states), len(states[0]) - 2))
+        for i, state in enumerate(states):
+            distributions[i, state.index("0")] = 1
+        return distributions
 
 
 class TestMCTS(unittest.TestCase):
@@ -34,18 +59,226 @@ class TestMCTS(unittest.TestCase):
             self.mcts.tree.add_edge(init_state, child)
 
     def test_get_distribution(self):
-        self.mcts.tree.increment_state_number_of_visits(self.visited_state)
-        distribution = self.mcts.get_distribution(self.state_manager.get_state())
+        init_state = self.state_manager.get_state()
+        self.mcts.tree.increment_edge_number_of_visits(init_state, self.visited_state)
+        distribution = self.mcts.get_distribution(init_state)
         # If there is only one visited state it should have the whole distribution
         self.assertEqual(distribution[self.changed_index], 1)
         # Adding more runs will change the distribution
         second_changed_index = 8
         for i in range(3):
-            self.mcts.tree.increment_state_number_of_visits(self.root_child_states[second_changed_index])
-        distribution = self.mcts.get_distribution(self.state_manager.get_state())
+            self.mcts.tree.increment_edge_number_of_visits(
+                init_state, self.root_child_states[second_changed_index]
+            )
+        distribution = self.mcts.get_distribution(init_state)
         self.assertEqual(distribution[self.changed_index], 0.25)
         self.assertEqual(distribution[second_changed_index], 0.75)
 
+    def test_get_distribution_without_visits(self):
+        with self.assertRaises(ValueError):
+            self.mcts.get_distribution(self.state_manager.get_state())
+
+    def test_move_index_of_edges(self):
+        init_state = self.state_manager.get_state()
+        # The edges of setUp are added without a move index, which is found by comparing the states
+        self.assertEqual(
+            self.mcts.tree.get_move_index(init_state, self.visited_state),
+            self.changed_index,
+        )
+        with self.assertRaises(ValueError):
+            StateTree.find_move_index(init_state, init_state)
+        child_state = StateManager.get_child_state(self.visited_state, 5)
+        self.mcts.tree.add_state_node(child_state)
+        self.mcts.tree.add_edge(self.visited_state, child_state, move_index=5)
+        self.assertEqual(
+            self.mcts.tree.get_move_index(self.visited_state, child_state), 5
+        )
+
+    def test_get_visit_counts(self):
+        init_state = self.state_manager.get_state()
+        for index, visits in [(2, 1), (self.changed_index, 4), (15, 2)]:
+            self.mcts.tree.increment_edge_number_of_visits(
+                init_state, self.root_child_states[index], amount=visits
+            )
+        expected_visit_counts = np.zeros(TestConstants.K ** 2, dtype=int)
+        expected_visit_counts[[2, self.changed_index, 15]] = [1, 4, 2]
+        np.testing.assert_array_equal(
+            self.mcts.get_visit_counts(init_state), expected_visit_counts
+        )
+
+    def test_perform_tree_move(self):
+        init_state = self.state_manager.get_state()
+        # The search plays on its own state manager
+        self.mcts.perform_tree_move(init_state, self.visited_state)
+        self.assertEqual(self.mcts.state_manager.get_state(), self.visited_state)
+
+    def test_pondering_keeps_visits_of_opponent_reply(self):
+        mcts = MCTS(
+            self.state_manager,
+            self.a_net,
+            number_of_simulations=5,
+            random_simulation_rate=0,
+            max_pondering_simulations=200,
+        )
+        our_state = self.root_child_states[0]
+        mcts.start_pondering(our_state)
+        self.assertEqual(mcts.tree.root_state, our_state)
+        mcts.pondering_thread.join()
+        self.assertEqual(mcts.stop_pondering(), 200)
+        self.assertFalse(mcts.is_pondering())
+        # The opponent replies with the most visited answer from pondering
+        opponent_state = max(
+            mcts.tree.get_child_states(our_state),
+            key=lambda child: mcts.tree.get_state_number_of_visits(child),
+        )
+        visits_before = mcts.tree.get_state_number_of_visits(opponent_state)
+        self.assertGreater(visits_before, 0)
+        mcts.run(opponent_state, progress=1)
+        self.assertEqual(mcts.tree.root_state, opponent_state)
+        self.assertEqual(
+            mcts.tree.get_state_number_of_visits(opponent_state), visits_before + 5
+        )
+        self.assertNotIn(our_state, mcts.tree.get_nodes())
+
+    def test_run_from_state_outside_tree(self):
+        mcts = MCTS(
+            self.state_manager,
+            self.a_net,
+            number_of_simulations=3,
+            random_simulation_rate=0,
+        )
+        unexplored_state = "12" + "0" * (TestConstants.K ** 2 - 2) + ":1"
+        mcts.run(unexplored_state, progress=1)
+        self.assertEqual(mcts.tree.root_state, unexplored_state)
+        self.assertEqual(mcts.tree.get_state_number_of_visits(unexplored_state), 3)
+
+    def test_progressive_widening(self):
+        mcts = MCTS(
+            self.state_manager,
+            self.a_net,
+            number_of_simulations=24,
+            random_simulation_rate=0,
+            progressive_widening=True,
+        )
+        init_state = StateManager(TestConstants.K, 1).get_state()
+        mcts.run(init_state, progress=1)
+        # 24 simulations after the root expansion allows 5 children
+        self.assertEqual(mcts.tree.get_number_of_children(init_state), 5)
+        self.assertEqual(len(mcts.tree.get_unexpanded_moves(init_state)), 11)
+        # The cells closest to the center are introduced first
+        center_children = {
+            StateManager.get_child_state(init_state, index) for index in [6, 9]
+        }
+        self.assertTrue(
+            center_children.issubset(mcts.tree.get_child_states(init_state))
+        )
+        # Eventually every move is considered
+        mcts.number_of_simulations = 300
+        mcts.run(init_state, progress=1)
+        self.assertEqual(
+            mcts.tree.get_number_of_children(init_state), TestConstants.K ** 2
+        )
+
+    def test_search_statistics(self):
+        statistics = SearchStatistics()
+        mcts = MCTS(
+            self.state_manager,
+            self.a_net,
+            number_of_simulations=20,
+            random_simulation_rate=0,
+            search_statistics=statistics,
+        )
+        state_manager = StateManager(TestConstants.K, 1)
+        for i in range(2):
+            state_manager.perform_action(
+                mcts.run(state_manager.get_state(), progress=1)
+            )
+        game_record, move_records = statistics.end_game()
+        self.assertEqual(len(move_records), 2)
+        self.assertEqual(move_records[0]["simulations"], 20)
+        self.assertEqual(move_records[0]["counts"]["traverse_tree"], 20)
+        self.assertEqual(move_records[0]["counts"]["backpropagate"], 20)
+        self.assertNotIn("simulate_actor_net_step", move_records[0]["counts"])
+        self.assertGreater(move_records[0]["max_depth"], 0)
+        self.assertGreater(move_records[0]["average_rollout_length"], 0)
+        self.assertEqual(
+            move_records[1]["tree_size"], len(mcts.tree.get_nodes())
+        )
+        self.assertEqual(game_record["simulations"], 40)
+        self.assertEqual(game_record["counts"]["cut_tree_with_new_root_node"], 2)
+        self.assertEqual(statistics.move_records, [])
 
+    def test_leaf_parallel_rollouts(self):
+        mcts = MCTS(
+            self.state_manager,
+            self.a_net,
+            number_of_simulations=10,
+            random_simulation_rate=0,
+            leaf_rollouts=8,
+        )
+        init_state = self.state_manager.get_state()
+        mcts.run(init_state, progress=1)
+        # Every simulation counts as leaf_rollouts visits
+        self.assertEqual(mcts.tree.get_state_number_of_visits(init_state), 80)
+        self.assertEqual(mcts.get_visit_counts(init_state).sum(), 80)
+        for parent, child, edge_data in mcts.tree.get_outgoing_edges_data(init_state):
+            self.assertLessEqual(abs(mcts.tree.get_sap_value(parent, child)), 1)
+        # Player 1 has already won: every roll-out gives the end state reward
+        won_state = "0100010001000100:2"
+        mcts.state_manager.set_state_manager(won_state)
+        self.assertEqual(mcts.simulate_leaf_parallel(won_state), 1)
+        self.assertEqual(mcts.last_rollout_length, 0)
+        # The reward is the average of eight wins or losses, and every roll-out fills the open cells
+        state = "2220000000000000:1"
+        mcts.state_manager.set_state_manager(state)
+        reward = mcts.simulate_leaf_parallel(state)
+        self.assertIn(reward * 8, range(-8, 9, 2))
+        self.assertEqual(mcts.last_rollout_length, 13)
 
+    def test_leaf_parallel_rollouts_with_rollout_net(self):
+        rollout_net = FirstOpenCellActorNet()
+        mcts = MCTS(
+            self.state_manager,
+            self.a_net,
+            random_simulation_rate=1,
+            leaf_rollouts=8,
+            rollout_net=rollout_net,
+        )
+        # Filling the open cells from the first one: player 1 gets the first column, and player 2 can not connect
+        state = "0000000000000000:1"
+        mcts.state_manager.set_state_manager(state)
+        self.assertEqual(mcts.simulate_leaf_parallel(state), 1)
+        # One batch of all the roll-outs for every move
+        self.assertSequenceEqual(rollout_net.batch_sizes, [8] * 16)
 
+    def test_run_steps(self):
+        state = "0000000000000000:1"
+        results = []
+        for use_steps in [False, True]:
+            random.seed(49)
+            actor_net = FirstOpenCellActorNet()
+            mcts = MCTS(
+                StateManager(4, 1),
+                actor_net,
+                random_simulation_rate=0.5,
+                number_of_simulations=20,
+                max_tree_height=16,
+            )
+            if use_steps:
+                steps = mcts.run_steps(state, progress=1)
+                requested_states = []
+                try:
+                    requested_state = next(steps)
+                    while True:
+                        requested_states.append(requested_state)
+                        requested_state = steps.send(
+                            actor_net.predict_batch([requested_state])[0]
+                        )
+                except StopIteration as stop:
+                    action = stop.value
+                self.assertGreater(len(requested_states), 0)
+            else:
+                action = mcts.run(state, progress=1)
+            results.append((action, list(actor_net.cases[0][1])))
+        # The generator gives the same search as run
+        self.assertEqual(results[0], results[1])
@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+
+from hex.ANET import ANET
+from hex.NumpyANET import NumpyANET
+from hex.StateManager import StateManager
+from hex.TOPP import TOPP
+
+
+class TestNumpyANET(unittest.TestCase):
+    def setUp(self) -> None:
+        np.random.seed(36)
+        self.directory = tempfile.TemporaryDirectory()
+        self.actor_net = ANET(
+            4,
+            save_directory=self.directory.name,
+            verbose=0,
+            hidden_layers_structure=[16],
+            activation_function="tanh",
+        )
+        self.actor_net.model.set_weights(
+            [
+                np.random.normal(0, 0.5, weights.shape)
+                for weights in self.actor_net.model.get_weights()
+            ]
+        )
+        self.states = ["0000000000000000:1", "1000020000100002:1", "0120000000000000:2"]
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_same_predictions_as_keras_model(self):
+        numpy_actor_net = self.actor_net.to_numpy()
+        self.assertEqual(numpy_actor_net.size_of_board, 4)
+        self.assertSequenceEqual(
+            numpy_actor_net.activations, ["tanh", "tanh", "softmax"]
+        )
+        for state in self.states:
+            np.testing.assert_allclose(
+                numpy_actor_net.predict(state), self.actor_net.predict(state), atol=1e-6
+            )
+
+    def test_export_and_load(self):
+        self.actor_net.episode_number = 7
+        path = self.actor_net.export_numpy_model()
+        self.assertEqual(path, os.path.join(self.directory.name, "model_7.npz"))
+        models = NumpyANET.load_models(self.directory.name)
+        self.assertEqual(len(models), 1)
+        self.assertEqual(models[0].episode_number, 7)
+        for state in self.states:
+            distribution = models[0].predict(state)
+            np.testing.assert_allclose(
+                distribution, self.actor_net.predict(state), atol=1e-6
+            )
+            # Taken cells are masked out
+            self.assertEqual(distribution[0] == 0, state[0] != "0")
+        ANET.delete_models(self.directory.name)
+        self.assertEqual(NumpyANET.load_models(self.directory.name), [])
+
+    def test_predict_batch(self):
+        numpy_actor_net = self.actor_net.to_numpy()
+        keras_distributions = self.actor_net.predict_batch(self.states)
+        numpy_distributions = numpy_actor_net.predict_batch(self.states)
+        for i, state in enumerate(self.states):
+            np.testing.assert_allclose(
+                keras_distributions[i], self.actor_net.predict(state), atol=1e-6
+            )
+            np.testing.assert_allclose(
+                numpy_distributions[i], numpy_actor_net.predict(state), atol=1e-12
+            )
+        self.assertEqual(self.actor_net.predict_batch([]).shape, (0, 16))
+
+    def test_topp_lockstep_games(self):
+        self.actor_net.episode_number = 0
+        self.actor_net.export_numpy_model()
+        self.actor_net.model.set_weights(
+            [
+                np.random.normal(0, 0.5, weights.shape)
+                for weights in self.actor_net.model.get_weights()
+            ]
+        )
+        self.actor_net.episode_number = 1
+        self.actor_net.export_numpy_model()
+        tournament = TOPP(self.directory.name, use_numpy_models=True)
+        player1, player2 = tournament.models
+        # The same wins as greedy games played one at a time
+        expected_wins = [0, 0]
+        for starting_player in [1, 2, 1]:
+            state_manager = StateManager(4, starting_player)
+            while not state_manager.is_end_state():
+                current_player = state_manager.current_player()
+                model = player1 if current_player == 1 else player2
+                state = state_manager.get_state()
+                state_manager.perform_action(
+                    state_manager.get_action_from_flattened_board_index(
+                        int(np.argmax(model.predict(state))), state
+                    )
+                )
+            expected_wins[current_player - 1] += 1
+        self.assertSequenceEqual(
+            tournament.play_match(3, player1, player2), expected_wins
+        )
+
+    def test_unsupported_activation(self):
+        with self.assertRaises(ValueError):
+            NumpyANET([np.zeros((42, 16))], [np.zeros(16)], ["elu"])
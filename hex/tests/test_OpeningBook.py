@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+from hex.OpeningBook import OpeningBook
+from hex.MCTS import MCTS
+from hex.StateManager import StateManager
+from hex.tests.test_MCTS import MockActorNet
+
+
+class TestOpeningBook(unittest.TestCase):
+    def setUp(self) -> None:
+        self.book = OpeningBook(3, max_number_of_pieces=1)
+        self.empty_state = StateManager(3, 1).get_state()
+        self.visit_counts = [0, 1, 0, 0, 6, 0, 0, 1, 0]
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "book.bin")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_add_and_save(self):
+        self.assertTrue(self.book.add(self.empty_state, self.visit_counts))
+        # Only opening states are added
+        self.assertFalse(self.book.add("110000000:1", self.visit_counts))
+        self.book.save(self.path)
+        book = OpeningBook.load(self.path)
+        self.assertEqual(book.board_size, 3)
+        self.assertEqual(len(book), 1)
+        self.assertSequenceEqual(
+            list(book.get_visit_counts(self.empty_state)), self.visit_counts
+        )
+        # Visits are accumulated over searches and saves
+        book.add(self.empty_state, self.visit_counts)
+        self.assertEqual(book.get_visit_counts(self.empty_state).sum(), 16)
+        book.save(self.path)
+        book = OpeningBook.load(self.path)
+        self.assertEqual(book.get_visit_counts(self.empty_state)[4], 12)
+        self.assertIsNone(book.get_visit_counts(self.empty_state, min_visits=17))
+        self.assertIsNone(book.get_visit_counts("100000000:2"))
+
+    def test_symmetric_states_share_entry(self):
+        state = "010000000:2"
+        visit_counts = [1, 0, 2, 3, 0, 0, 0, 0, 0]
+        self.book.add(state, visit_counts)
+        rotated_state = StateManager.transform_state(state, StateManager.ROTATE_180)
+        self.assertSequenceEqual(
+            list(self.book.get_visit_counts(rotated_state)), visit_counts[::-1]
+        )
+        self.book.add(rotated_state, visit_counts[::-1])
+        self.assertEqual(len(self.book), 1)
+        self.assertSequenceEqual(
+            list(self.book.get_visit_counts(state)), [2 * n for n in visit_counts]
+        )
+
+    def test_mcts_plays_from_book(self):
+        self.book.add(self.empty_state, self.visit_counts)
+        a_net = MockActorNet()
+        mcts = MCTS(
+            StateManager(3, 1),
+            a_net,
+            number_of_simulations=5,
+            opening_book=self.book,
+            opening_book_min_visits=8,
+        )
+        action = mcts.run(self.empty_state, progress=100)
+        self.assertEqual(action, "1,1:1")
+        # No search is done for book moves
+        self.assertEqual(mcts.tree.get_state_number_of_visits(self.empty_state), 0)
+        self.assertEqual(a_net.cases[0][1][4], 0.75)
@@ -0,0 +1,121 @@
+import random
+import unittest
+import numpy as np
+
+from hex.ReplayBuffer import ReplayBuffer
+
+
+class TestReplayBuffer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.buffer = ReplayBuffer(3, 2, max_size=10, cutoff_rate=0.5)
+
+    def add_numbered_case(self, number: int) -> None:
+        self.buffer.add([number] * 3, [number, -number])
+
+    def test_eviction_among_oldest_cases(self):
+        random.seed(41)
+        for number in range(10):
+            self.add_numbered_case(number)
+        for number in range(10, 60):
+            cases_before = set(self.buffer.get_all_cases()[0][:, 0])
+            oldest_cases = list(self.buffer.get_all_cases()[0][:6, 0])
+            self.add_numbered_case(number)
+            x, y = self.buffer.get_all_cases()
+            self.assertEqual(len(self.buffer), 10)
+            self.assertEqual(x.dtype, np.float32)
+            np.testing.assert_array_equal(x[:, 0], -y[:, 1])
+            # The newest case is last, and the evicted case was at position 1 to 5 from the oldest
+            self.assertEqual(x[-1, 0], number)
+            (evicted,) = cases_before - set(x[:, 0])
+            self.assertIn(evicted, oldest_cases[1:6])
+
+    def test_sample(self):
+        for number in range(4):
+            self.add_numbered_case(number)
+        # Smaller than the batch size: all the cases
+        x, y = self.buffer.sample(5)
+        self.assertSequenceEqual(list(x[:, 0]), [0, 1, 2, 3])
+        for number in range(4, 30):
+            self.add_numbered_case(number)
+        x, y = self.buffer.sample(5)
+        self.assertEqual(x.shape, (5, 3))
+        self.assertEqual(len(set(x[:, 0])), 5)
+        np.testing.assert_array_equal(x[:, 0], y[:, 0])
+
+    def test_prioritized_sampling(self):
+        np.random.seed(42)
+        random.seed(42)
+        self.buffer = ReplayBuffer(
+            3, 2, max_size=10, cutoff_rate=0.5, prioritized=True
+        )
+        for number in range(10):
+            self.add_numbered_case(number)
+        # New cases get the highest priority, so the first sampling is uniform
+        x, y, slots, weights = self.buffer.sample_prioritized(10)
+        np.testing.assert_array_equal(x[:, 0], np.arange(10))
+        np.testing.assert_array_equal(weights, np.ones(10))
+        losses = np.full(10, 0.01)
+        losses[3] = 10.0
+        self.buffer.update_priorities(slots, losses)
+        x, y, slots, weights = self.buffer.sample_prioritized(10)
+        self.assertGreater(list(x[:, 0]).count(3), 5)
+        # The case with the high loss has the lowest importance weight
+        self.assertEqual(weights[x[:, 0] == 3].max(), weights.min())
+        self.assertEqual(weights.max(), 1.0)
+        # A new case gets the highest priority, and evicted cases have no priority left
+        for number in range(10, 30):
+            self.add_numbered_case(number)
+            self.assertAlmostEqual(
+                self.buffer.priorities.total(),
+                self.buffer.priorities.get(self.buffer.get_slots(range(10))).sum(),
+            )
+        self.assertEqual(
+            self.buffer.priorities.get(self.buffer.get_slots(9)),
+            self.buffer.max_priority,
+        )
+
+    def test_deduplication(self):
+        random.seed(44)
+        self.buffer = ReplayBuffer(
+            3, 2, max_size=10, cutoff_rate=0.5, deduplicate=True
+        )
+        self.buffer.add([1, 1, 1], [1, 0])
+        self.buffer.add([2, 2, 2], [0, 1])
+        self.buffer.add([1, 1, 1], [0, 1])
+        self.buffer.add([1, 1, 1], [0, 1])
+        x, y = self.buffer.get_all_cases()
+        np.testing.assert_array_equal(x[:, 0], [1, 2])
+        # Running average of the distributions of the merged cases
+        np.testing.assert_allclose(y[0], [1 / 3, 2 / 3])
+        stats = self.buffer.get_deduplication_stats()
+        self.assertEqual(stats["merged"], 2)
+        self.assertEqual(stats["dedup_ratio"], 0.5)
+        # Evicted cases are no longer merged into, and moved cases still are
+        for number in range(3, 40):
+            self.add_numbered_case(number)
+            self.add_numbered_case(number)
+            x, y = self.buffer.get_all_cases()
+            self.assertEqual(len(set(x[:, 0])), len(x))
+            self.assertEqual(
+                {key: slot for slot, key in enumerate(self.buffer.keys) if key},
+                self.buffer.slot_of_key,
+            )
+        for number in x[:, 0]:
+            self.add_numbered_case(int(number))
+        self.assertEqual(len(self.buffer), 10)
+        self.assertSequenceEqual(
+            list(self.buffer.get_all_cases()[0][:, 0]), list(x[:, 0])
+        )
+
+    def test_deduplication_with_eviction_among_all_cases(self):
+        random.seed(44)
+        self.buffer = ReplayBuffer(3, 2, max_size=4, cutoff_rate=1.0, deduplicate=True)
+        for number in range(1, 100):
+            self.add_numbered_case(number)
+            # Every key maps to the slot holding its case
+            self.assertEqual(
+                {key: slot for slot, key in enumerate(self.buffer.keys) if key},
+                self.buffer.slot_of_key,
+            )
+        x, y = self.buffer.get_all_cases()
+        self.assertEqual(len(set(x[:, 0])), 4)
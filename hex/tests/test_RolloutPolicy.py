@@ -0,0 +1,65 @@
+import tempfile
+import unittest
+import numpy as np
+
+from hex.ANET import ANET
+from hex.MCTS import MCTS
+from hex.RolloutPolicy import RolloutPolicy
+from hex.StateManager import StateManager
+from hex.tests.test_MCTS import MockActorNet
+
+
+class TestRolloutPolicy(unittest.TestCase):
+    def setUp(self) -> None:
+        np.random.seed(35)
+        self.policy = RolloutPolicy(3)
+        self.state = "100020000:1"
+
+    def test_initial_policy_is_uniform(self):
+        distribution = self.policy.predict(self.state)
+        self.assertEqual(distribution[0], 0)
+        self.assertEqual(distribution[4], 0)
+        self.assertAlmostEqual(distribution[1], 1 / 7)
+        self.assertAlmostEqual(distribution.sum(), 1)
+
+    def test_fit(self):
+        states = ["000000000:1", self.state, "000010000:2"]
+        x = np.array([ANET.convert_state_to_network_format(s) for s in states])
+        # All the mass on the cell 2,2, and on a taken cell for the second state
+        y = np.zeros((3, 9))
+        y[:, 8] = 1
+        y[1, 4] = 3
+        loss = self.policy.fit(x, y)
+        self.assertLess(loss, 0.5)
+        for state in states:
+            distribution = self.policy.predict(state)
+            self.assertEqual(np.argmax(distribution), 8)
+            self.assertAlmostEqual(
+                distribution[StateManager.get_open_cell_indices(state)].sum(), 1
+            )
+
+    def test_distill(self):
+        with tempfile.TemporaryDirectory() as directory:
+            actor_net = ANET(
+                3, save_directory=directory, verbose=0, hidden_layers_structure=[8]
+            )
+            self.assertEqual(self.policy.distill(actor_net), 0.0)
+            actor_net.add_case(self.state, [0, 0.5, 0.5, 0, 0, 0, 0, 0, 0])
+            loss = self.policy.distill(actor_net)
+            self.assertGreater(loss, 0)
+            np.testing.assert_allclose(
+                self.policy.predict(self.state), actor_net.predict(self.state), atol=0.05
+            )
+
+    def test_mcts_uses_rollout_net(self):
+        self.policy.bias[8] = 100
+        mcts = MCTS(
+            StateManager(3, 1),
+            MockActorNet(),
+            random_simulation_rate=1,
+            rollout_net=self.policy,
+        )
+        # The mock actor net has no predict method: the roll-out only uses the rollout policy
+        mcts.state_manager.set_state_manager(self.state)
+        mcts.simulate(self.state)
+        self.assertEqual(mcts.state_manager.get_state()[8], "1")
@@ -0,0 +1,102 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+import numpy as np
+
+from hex.NumpyANET import NumpyANET
+from hex.SelfPlayWorker import (
+    SelfPlayActorNet,
+    publish_weights,
+    run_self_play_worker,
+    play_pool_game,
+)
+
+
+def random_numpy_actor_net(board_size: int, episode_number: int) -> NumpyANET:
+    input_size = board_size ** 2 * 2 + 10
+    return NumpyANET(
+        [
+            np.random.normal(0, 0.5, (input_size, 8)),
+            np.random.normal(0, 0.5, (8, board_size ** 2)),
+        ],
+        [np.zeros(8), np.zeros(board_size ** 2)],
+        ["tanh", "softmax"],
+        episode_number=episode_number,
+    )
+
+
+class TestSelfPlayWorker(unittest.TestCase):
+    def setUp(self) -> None:
+        np.random.seed(47)
+        self.directory = tempfile.TemporaryDirectory()
+        self.weights_path = os.path.join(self.directory.name, "actor_net.npz")
+        publish_weights(random_numpy_actor_net(3, 0), self.weights_path)
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_published_weights_are_loaded(self):
+        published_version = multiprocessing.Value("i", 0)
+        actor_net = SelfPlayActorNet(self.weights_path, published_version)
+        self.assertEqual(actor_net.numpy_actor_net.episode_number, 0)
+        self.assertFalse(actor_net.load_published_weights())
+        new_actor_net = random_numpy_actor_net(3, 1)
+        publish_weights(new_actor_net, self.weights_path, published_version)
+        self.assertEqual(published_version.value, 1)
+        self.assertTrue(actor_net.load_published_weights())
+        self.assertEqual(actor_net.numpy_actor_net.episode_number, 1)
+        np.testing.assert_allclose(
+            actor_net.predict("000000000:1"), new_actor_net.predict("000000000:1")
+        )
+        self.assertSequenceEqual(os.listdir(self.directory.name), ["actor_net.npz"])
+
+    def test_worker_plays_all_games(self):
+        results = multiprocessing.Queue()
+        game_counter = multiprocessing.Value("i", 0)
+        run_self_play_worker(
+            self.weights_path,
+            multiprocessing.Value("i", 0),
+            game_counter,
+            [1, 2, 1],
+            3,
+            {"number_of_simulations": 5, "max_tree_height": 9},
+            None,
+            results,
+            seed=47,
+        )
+        game_results = [results.get(timeout=10) for i in range(4)]
+        self.assertIsNone(game_results[-1])
+        self.assertSequenceEqual(
+            [(result[0], result[1]) for result in game_results[:-1]],
+            [(1, 1), (2, 2), (3, 1)],
+        )
+        for game_number, starting_player, winner, cases in game_results[:-1]:
+            self.assertIn(winner, [1, 2])
+            # One case for each move, with the starting player to move first
+            self.assertTrue(cases[0][0].endswith(f":{starting_player}"))
+            for state, distribution in cases:
+                self.assertEqual(len(distribution), 9)
+        self.assertEqual(game_counter.value, 4)
+
+    def test_pool_game_is_reproducible(self):
+        arguments = (
+            self.weights_path,
+            2,
+            10,
+            3,
+            2,
+            {"number_of_simulations": 5, "max_tree_height": 9},
+            {"simulations_per_game": 30},
+            47,
+        )
+        game_number, starting_player, winner, cases = play_pool_game(*arguments)
+        self.assertEqual((game_number, starting_player), (2, 2))
+        self.assertTrue(cases[0][0].endswith(":2"))
+        # The same seed plays the same game
+        same_game = play_pool_game(*arguments)
+        self.assertEqual(same_game[2], winner)
+        self.assertSequenceEqual(
+            [state for state, distribution in same_game[3]],
+            [state for state, distribution in cases],
+        )
@@ -0,0 +1,55 @@
+import random
+import unittest
+import numpy as np
+
+from hex.MCTS import MCTS
+from hex.SimulationBudget import SimulationBudget
+from hex.StateManager import StateManager
+from hex.tests.test_MCTS import MockActorNet
+
+
+class TestSimulationBudget(unittest.TestCase):
+    def setUp(self) -> None:
+        random.seed(33)
+        np.random.seed(33)
+        self.budget = SimulationBudget(200, min_simulations=10, batch_size=10)
+        self.budget.start_game()
+
+    def test_allocate(self):
+        empty_state = StateManager(4, 1).get_state()
+        # 16 open cells: fair share of 200 / 8 moves, times the share factor
+        self.assertEqual(self.budget.allocate(empty_state), 75)
+        self.assertEqual(self.budget.allocate("1" * 15 + "0:2"), 1)
+
+    def test_has_converged(self):
+        visit_counts = np.zeros(16, dtype=int)
+        visit_counts[:4] = [3, 2, 2, 2]
+        # Too few simulations
+        self.assertEqual(self.budget.has_converged(visit_counts, 50, 16), "")
+        visit_counts[:4] = [30, 2, 2, 2]
+        # The leader can not be overtaken in the simulations left
+        self.assertEqual(self.budget.has_converged(visit_counts, 20, 16), "decided")
+        self.assertEqual(self.budget.has_converged(visit_counts, 50, 16), "converged")
+        visit_counts[:4] = [10, 9, 9, 8]
+        self.assertEqual(self.budget.has_converged(visit_counts, 50, 16), "")
+
+    def test_mcts_spends_budget(self):
+        mcts = MCTS(
+            StateManager(4, 1),
+            MockActorNet(),
+            random_simulation_rate=0,
+            simulation_budget=self.budget,
+        )
+        state_manager = StateManager(4, 1)
+        while not state_manager.is_end_state():
+            state_manager.perform_action(
+                mcts.run(state_manager.get_state(), progress=1)
+            )
+        summary = self.budget.end_game()
+        self.assertEqual(summary["moves"], len(self.budget.move_records))
+        self.assertLessEqual(summary["simulations"], 200)
+        self.assertEqual(
+            summary["remaining_simulations"], 200 - summary["simulations"]
+        )
+        for record in self.budget.move_records:
+            self.assertLessEqual(record["simulations"], record["allowance"])
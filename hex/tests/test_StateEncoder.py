@@ -0,0 +1,106 @@
+import random
+import unittest
+import numpy as np
+
+from hex.StateEncoder import StateEncoder
+from hex.benchmarks import (
+    random_states,
+    mask_and_normalize_with_loop,
+    gen_cases_with_strings,
+)
+
+
+class TestStateEncoder(unittest.TestCase):
+    def setUp(self) -> None:
+        random.seed(38)
+        np.random.seed(38)
+
+    def test_network_format(self):
+        self.assertEqual(StateEncoder.get_input_size(4), 42)
+        self.assertEqual(StateEncoder.infer_board_size(42), 4)
+        self.assertSequenceEqual(
+            StateEncoder.convert_state_to_network_format("1020:2"),
+            [0] * 5 + [1] * 5 + [1, 0, 0, 0, 0, 1, 0, 0],
+        )
+
+    def test_vectorized_encoding(self):
+        for board_size in [3, 7, 10]:
+            states = random_states(board_size, 50)
+            expected = np.array(
+                [StateEncoder.convert_state_to_network_format(state) for state in states]
+            )
+            encoded = StateEncoder.convert_states_to_network_format(states)
+            self.assertEqual(encoded.dtype, np.float32)
+            np.testing.assert_array_equal(encoded, expected)
+            # Writing to a preallocated array
+            out = np.full(expected.shape, -1, dtype=np.float32)
+            self.assertIs(
+                StateEncoder.convert_states_to_network_format(states, out=out), out
+            )
+            np.testing.assert_array_equal(out, expected)
+        self.assertEqual(StateEncoder.convert_states_to_network_format([]).shape[0], 0)
+
+    def test_mask_and_normalize(self):
+        self.assertSequenceEqual(
+            list(StateEncoder.mask_and_normalize([0.1, 0.3, 0.2, 0.2], "1020:2")),
+            [0, 0.6, 0, 0.4],
+        )
+
+    def test_mask_and_normalize_batch(self):
+        states = random_states(5, 50)
+        distributions = np.random.dirichlet(np.ones(25), size=50)
+        masked_distributions = StateEncoder.mask_and_normalize_batch(
+            distributions, states
+        )
+        for distribution, masked_distribution, state in zip(
+            distributions, masked_distributions, states
+        ):
+            expected = mask_and_normalize_with_loop(distribution, state)
+            np.testing.assert_allclose(masked_distribution, expected)
+            np.testing.assert_allclose(
+                StateEncoder.mask_and_normalize(distribution, state), expected
+            )
+
+    def test_no_mass_on_open_cells(self):
+        # All the mass on taken cells, and an output that is not a number
+        distributions = [[0.5, 0, 0.5, 0], [np.nan, 0.5, 0.5, 0]]
+        states = ["1020:2", "1000:2"]
+        expected = [[0, 0.5, 0, 0.5], [0, 1 / 3, 1 / 3, 1 / 3]]
+        np.testing.assert_allclose(
+            StateEncoder.mask_and_normalize_batch(distributions, states), expected
+        )
+        for distribution, state, expected_distribution in zip(
+            distributions, states, expected
+        ):
+            np.testing.assert_allclose(
+                StateEncoder.mask_and_normalize(distribution, state),
+                expected_distribution,
+            )
+
+    def test_symmetric_cases(self):
+        for board_size in [3, 4, 7]:
+            states = random_states(board_size, 20)
+            distributions = np.random.dirichlet(np.ones(board_size ** 2), size=20)
+            network_inputs = StateEncoder.convert_states_to_network_format(states)
+            (
+                network_inputs,
+                generated_distributions,
+            ) = StateEncoder.generate_symmetric_cases(network_inputs, distributions)
+            self.assertEqual(
+                network_inputs.shape, (80, StateEncoder.get_input_size(board_size))
+            )
+            # The same cases in the same order as made from the state strings
+            expected_cases = [
+                case
+                for state, distribution in zip(states, distributions)
+                for case in gen_cases_with_strings(state, distribution, board_size)
+            ]
+            np.testing.assert_array_equal(
+                network_inputs,
+                StateEncoder.convert_states_to_network_format(
+                    [case[0] for case in expected_cases]
+                ),
+            )
+            np.testing.assert_array_equal(
+                generated_distributions, [case[1] for case in expected_cases]
+            )
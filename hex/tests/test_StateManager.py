@@ -1,5 +1,6 @@
 import unittest
 import networkx as nx
+import numpy as np
 
 from hex.StateManager import StateManager
 
@@ -140,6 +141,34 @@ class TestBigStateManager(unittest.TestCase):
         )
 
 
+    def test_canonicalize(self):
+        state = "12" + "0" * 60 + "21:1"
+        images = [
+            StateManager.transform_state(state, transform)
+            for transform in StateManager.SYMMETRY_TRANSFORMS
+        ]
+        self.assertEqual(images[StateManager.ROTATE_180], "12" + "0" * 60 + "21:1")
+        self.assertEqual(
+            images[StateManager.TRANSPOSE_SWAP_COLORS],
+            "2" + "0" * 7 + "1" + "0" * 46 + "1" + "0" * 7 + "2:2",
+        )
+        canonical_state, transform = StateManager.canonicalize(state)
+        for image in images:
+            self.assertEqual(StateManager.canonicalize(image)[0], canonical_state)
+        # The transform maps the canonical state back to the input state
+        self.assertEqual(
+            StateManager.transform_state(canonical_state, transform), state
+        )
+        # Indices follow the pieces
+        for transform in StateManager.SYMMETRY_TRANSFORMS:
+            image = StateManager.transform_state(state, transform)
+            moved_index = StateManager.transform_index(1, transform, 8)
+            self.assertEqual(
+                image[moved_index],
+                "1" if StateManager.transform_swaps_colors(transform) else "2",
+            )
+
+
 class TestSmallStateManager(unittest.TestCase):
     def setUp(self) -> None:
         self.state_manager = StateManager(3, 1)
@@ -152,3 +181,26 @@ class TestSmallStateManager(unittest.TestCase):
         self.state_manager.set_state_manager(end_state_p1)
         self.assertFalse(self.state_manager.is_end_state())
 
+    def test_has_player_one_path(self):
+        boards = np.array(
+            [
+                # Path along the hex diagonal: 0,2 -> 1,1 -> 2,0
+                [2, 2, 1, 2, 1, 2, 1, 2, 2],
+                # Not connected: 0,0 and 1,1 are not neighbors
+                [1, 2, 2, 2, 1, 1, 2, 2, 1],
+                # Open cells break the path
+                [1, 0, 0, 1, 0, 0, 0, 0, 1],
+            ]
+        ).reshape(3, 3, 3)
+        self.assertSequenceEqual(
+            list(StateManager.has_player_one_path(boards)), [True, False, False]
+        )
+        for board in boards:
+            self.state_manager.set_state_manager(
+                "".join(str(cell) for cell in board.flatten()) + ":2"
+            )
+            self.assertEqual(
+                StateManager.has_player_one_path(board[np.newaxis])[0],
+                self.state_manager.is_end_state(),
+            )
+
@@ -0,0 +1,30 @@
+import unittest
+import numpy as np
+
+from hex.SumTree import SumTree
+
+
+class TestSumTree(unittest.TestCase):
+    def setUp(self) -> None:
+        np.random.seed(42)
+        self.tree = SumTree(5)
+        for index, priority in enumerate([1.0, 0.0, 3.0, 2.0, 4.0]):
+            self.tree.update(index, priority)
+
+    def test_update(self):
+        self.assertEqual(self.tree.total(), 10.0)
+        self.tree.update(2, 0.5)
+        self.assertEqual(self.tree.total(), 7.5)
+        np.testing.assert_array_equal(self.tree.get([0, 2, 4]), [1.0, 0.5, 4.0])
+
+    def test_find(self):
+        # Cumulative sums: [0, 1) -> 0, [1, 4) -> 2, [4, 6) -> 3, [6, 10) -> 4
+        np.testing.assert_array_equal(
+            self.tree.find([0.0, 0.99, 1.0, 3.99, 4.0, 6.0, 9.99]),
+            [0, 0, 2, 2, 3, 4, 4],
+        )
+
+    def test_sample_proportional_to_priority(self):
+        counts = np.bincount(self.tree.sample(10000), minlength=5)
+        self.assertEqual(counts[1], 0)
+        np.testing.assert_allclose(counts / 10000, [0.1, 0, 0.3, 0.2, 0.4], atol=0.01)
@@ -0,0 +1,167 @@
+import random
+import unittest
+
+from hex.MCTS import MCTS
+from hex.StateManager import StateManager
+from hex.tests.test_MCTS import MockActorNet
+
+
+def has_connection(board: str, board_size: int, player: str) -> bool:
+    """
+    Checks if the player has a path between its two sides of the board
+    """
+    if player == "1":
+        start = [col for col in range(board_size) if board[col] == player]
+    else:
+        start = [
+            row * board_size
+            for row in range(board_size)
+            if board[row * board_size] == player
+        ]
+    visited = set(start)
+    stack = list(start)
+    while stack:
+        index = stack.pop()
+        row, col = divmod(index, board_size)
+        if (player == "1" and row == board_size - 1) or (
+            player == "2" and col == board_size - 1
+        ):
+            return True
+        for r, c in [
+            (row - 1, col),
+            (row - 1, col + 1),
+            (row, col - 1),
+            (row, col + 1),
+            (row + 1, col - 1),
+            (row + 1, col),
+        ]:
+            neighbor = r * board_size + c
+            if (
+                0 <= r < board_size
+                and 0 <= c < board_size
+                and neighbor not in visited
+                and board[neighbor] == player
+            ):
+                visited.add(neighbor)
+                stack.append(neighbor)
+    return False
+
+
+def winner(state: str, board_size: int, memo: dict, excluded_moves=()) -> str:
+    """
+    Exhaustive search of the game from the input state
+    :param excluded_moves: cells the player to move may not play in the input state
+    :return: the winning player with perfect play
+    """
+    if not excluded_moves and state in memo:
+        return memo[state]
+    board, player = StateManager.extract_state(state)
+    opponent = "1" if player == "2" else "2"
+    if has_connection(board, board_size, opponent):
+        result = opponent
+    else:
+        result = opponent
+        for index, cell in enumerate(board):
+            if cell == "0" and index not in excluded_moves:
+                child_board = f"{board[:index]}{player}{board[index + 1:]}"
+                if has_connection(child_board, board_size, player) or (
+                    winner(f"{child_board}:{opponent}", board_size, memo) == player
+                ):
+                    result = player
+                    break
+    if not excluded_moves:
+        memo[state] = result
+    return result
+
+
+def random_position(board_size: int, number_of_pieces: int) -> str:
+    """
+    :return: a random state with the given number of pieces where none of the players have won
+    """
+    while True:
+        cells = ["0"] * board_size ** 2
+        indices = random.sample(range(board_size ** 2), number_of_pieces)
+        for i, index in enumerate(indices):
+            cells[index] = "1" if i % 2 == 0 else "2"
+        board = "".join(cells)
+        if not has_connection(board, board_size, "1") and not has_connection(
+            board, board_size, "2"
+        ):
+            return f"{board}:{random.choice(['1', '2'])}"
+
+
+class TestDeadCells(unittest.TestCase):
+    def setUp(self) -> None:
+        random.seed(29)
+        self.memo = {3: {}, 4: {}}
+
+    def test_dead_cell_patterns(self):
+        # The cell at 1,1 surrounded by pieces of player 1
+        self.assertIn(4, StateManager.get_dead_cells("111101111:2"))
+        # Four consecutive neighbors of player 2
+        self.assertIn(4, StateManager.get_dead_cells("022002020:1"))
+        # One arc of each player
+        self.assertIn(4, StateManager.get_dead_cells("012102120:1"))
+        # Open neighbors and two arcs of each player are not dead
+        self.assertSequenceEqual(StateManager.get_dead_cells("000000000:1"), [])
+        self.assertNotIn(4, StateManager.get_dead_cells("012201120:1"))
+        # Edges count as pieces: a corner cell next to two pieces of player 1
+        self.assertIn(0, StateManager.get_dead_cells("010100000:2"))
+
+    def assert_dead_cells_do_not_change_outcome(self, board_size, number_of_pieces):
+        memo = self.memo[board_size]
+        found_dead_cells = 0
+        for i in range(150):
+            state = random_position(board_size, number_of_pieces)
+            board, player = StateManager.extract_state(state)
+            dead_cells = StateManager.get_dead_cells(state)
+            found_dead_cells += len(dead_cells)
+            for index in dead_cells:
+                # The outcome is the same whichever player holds the cell
+                outcomes = {
+                    winner(
+                        f"{board[:index]}{piece}{board[index + 1:]}:{player}",
+                        board_size,
+                        memo,
+                    )
+                    for piece in "12"
+                }
+                self.assertEqual(len(outcomes), 1, f"{state} {index}")
+            open_cells = board.count("0")
+            if dead_cells and len(dead_cells) < open_cells:
+                # Leaving out the dead cells does not change the value of the position
+                self.assertEqual(
+                    winner(state, board_size, memo),
+                    winner(state, board_size, memo, excluded_moves=set(dead_cells)),
+                    state,
+                )
+        self.assertGreater(found_dead_cells, 0)
+
+    def test_dead_cells_3x3(self):
+        for number_of_pieces in range(3, 7):
+            self.assert_dead_cells_do_not_change_outcome(3, number_of_pieces)
+
+    def test_dead_cells_4x4(self):
+        for number_of_pieces in range(7, 12):
+            self.assert_dead_cells_do_not_change_outcome(4, number_of_pieces)
+
+    def test_mcts_prunes_dead_cells(self):
+        state = "111101111:2"
+        mcts = MCTS(
+            StateManager(3, 2),
+            MockActorNet(),
+            random_simulation_rate=0,
+            prune_dead_cells=True,
+        )
+        # The corner cell next to two pieces of player 1 is dead
+        self.assertSequenceEqual(
+            mcts.expand("010100000:2"),
+            [
+                child
+                for child in StateManager.generate_child_states("010100000:2")
+                if child[0] == "0"
+            ],
+        )
+        self.assertEqual(mcts.number_of_pruned_children, 1)
+        # All open cells dead: no pruning
+        self.assertEqual(len(mcts.expand(state)), 1)